@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Concurrency benchmark: blocking pymongo calls vs. db.run_db offload.
+
+Simulates a worker serving many concurrent requests where a small share of
+queries are slow. Queries are modelled with time.sleep (which, like a
+pymongo socket read, releases the GIL), so no MongoDB server is needed.
+
+    python benchmarks/bench_concurrency.py --requests 400 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+
+from db import run_db  # noqa: E402
+
+
+def simulated_query(duration):
+    time.sleep(duration)
+    return duration
+
+
+async def blocking_handler(duration):
+    # What the routes did before: a sync pymongo call inside async def
+    return simulated_query(duration)
+
+
+async def offloaded_handler(duration):
+    return await run_db(simulated_query, duration)
+
+
+async def run_load(handler, durations, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    # Every request arrives at once, so latency includes time spent queued
+    # behind other requests (a blocking handler also stalls the queue)
+    started = time.perf_counter()
+
+    async def one(duration):
+        async with semaphore:
+            await handler(duration)
+        latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one(d) for d in durations))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(durations),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(durations) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--fast-ms", type=float, default=5.0, help="Typical query latency")
+    parser.add_argument("--slow-ms", type=float, default=250.0, help="Slow query latency")
+    parser.add_argument("--slow-ratio", type=float, default=0.05, help="Share of slow queries")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    durations = [
+        (args.slow_ms if rng.random() < args.slow_ratio else args.fast_ms) / 1000
+        for _ in range(args.requests)
+    ]
+
+    results = {
+        "config": vars(args),
+        "blocking": asyncio.run(run_load(blocking_handler, durations, args.concurrency)),
+        "run_db": asyncio.run(run_load(offloaded_handler, durations, args.concurrency)),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
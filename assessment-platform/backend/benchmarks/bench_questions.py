@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""Question-serving benchmark suite: get_question_batch and the HTTP routes.
+
+For every scale, seeds a synthetic bank on a local mongod (benchmarks/seed.py),
+then measures p50/p95/p99 latency and throughput for each SELECTION_STRATEGY
+and topic/subtopic filter mix:
+
+- service: get_question_batch called directly, one request at a time
+- http: POST /api/questions/fetch through the ASGI app, --concurrency in flight
+
+plus GET /api/topics/fetch-by-subject/{id} with the response cache bypassed.
+Results are written as JSON (tagged with the git commit) so runs can be diffed
+across commits.
+
+    MONGO_URI=mongodb://localhost:27017 python benchmarks/bench_questions.py \\
+        --scale 10k --scale 100k --output bench-results.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+
+import httpx  # noqa: E402
+
+from config import config  # noqa: E402
+from db import get_db, close_db  # noqa: E402
+import service  # noqa: E402
+from main import app  # noqa: E402
+from utils.http_cache import clear_http_cache  # noqa: E402
+from benchmarks.seed import DEFAULT_DB, load_taxonomy, parse_scale, seed_database  # noqa: E402
+from benchmarks.stats import summarize  # noqa: E402
+from benchmarks.synthetic import FILTER_MIXES, random_filters  # noqa: E402
+
+STRATEGIES = ("sample", "randomKey", "newest")
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_service(filters_list):
+    latencies, returned = [], 0
+    started = time.perf_counter()
+    for filters in filters_list:
+        t0 = time.perf_counter()
+        returned += service.get_question_batch(filters)["count"]
+        latencies.append((time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - started
+    return {**summarize(latencies, elapsed), "avg_returned": round(returned / len(latencies), 1)}
+
+
+async def bench_http(requests, concurrency, before_each=None):
+    """requests: list of (method, path, json body or None)"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one(method, path, body):
+            nonlocal errors
+            async with semaphore:
+                if before_each:
+                    before_each()
+                t0 = time.perf_counter()
+                response = await client.request(method, path, json=body)
+                latencies.append((time.perf_counter() - t0) * 1000)
+                if response.status_code != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(*request) for request in requests))
+        elapsed = time.perf_counter() - started
+
+    return {**summarize(latencies, elapsed), "errors": errors}
+
+
+def run_scale(scale, args):
+    db = get_db()
+    rng = random.Random(args.seed)
+    if args.reuse and db["questions"].estimated_document_count() == scale:
+        taxonomy = load_taxonomy(db)
+    else:
+        started = time.perf_counter()
+        taxonomy = seed_database(db, scale, rng)
+        print(f"seeded {scale} questions in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    results = []
+    for strategy in args.strategies:
+        config.SELECTION_STRATEGY = strategy
+        for mix in args.mixes:
+            scenario_rng = random.Random(f"{args.seed}-{mix}")
+            filters_list = [random_filters(scenario_rng, taxonomy, mix) for _ in range(args.queries)]
+            # Warm-up: connection pool, taxonomy and asset caches
+            bench_service(filters_list[:5])
+
+            row = {"scale": scale, "strategy": strategy, "mix": mix}
+            results.append({**row, "target": "service", **bench_service(filters_list)})
+            if not args.skip_http:
+                requests = [("POST", "/api/questions/fetch", f) for f in filters_list]
+                http = asyncio.run(bench_http(requests, args.concurrency))
+                results.append({**row, "target": "http", "concurrency": args.concurrency, **http})
+            print(f"{scale} {strategy} {mix} done", file=sys.stderr)
+
+    if not args.skip_http:
+        subject_ids = [str(s) for subjects in taxonomy.values() for s in subjects]
+        requests = [
+            ("GET", f"/api/topics/fetch-by-subject/{rng.choice(subject_ids)}", None)
+            for _ in range(args.queries)
+        ]
+        http = asyncio.run(bench_http(requests, args.concurrency, before_each=clear_http_cache))
+        results.append({
+            "scale": scale, "route": "/api/topics/fetch-by-subject/{id}", "target": "http",
+            "cache": "bypassed", "concurrency": args.concurrency, **http,
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Question-serving benchmark suite")
+    parser.add_argument(
+        "--scale", action="append", help="10k, 100k, 1m or a number of questions (repeatable; default 10k)"
+    )
+    parser.add_argument("--strategies", nargs="+", default=list(STRATEGIES), choices=STRATEGIES)
+    parser.add_argument("--mixes", nargs="+", default=list(FILTER_MIXES), choices=FILTER_MIXES)
+    parser.add_argument("--queries", type=int, default=100, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="In-flight HTTP requests")
+    parser.add_argument("--db", default=DEFAULT_DB, help="Scratch database (dropped and reseeded)")
+    parser.add_argument("--reuse", action="store_true", help="Skip seeding when the scale already matches")
+    parser.add_argument("--skip-http", action="store_true", help="Only benchmark get_question_batch")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results JSON here instead of stdout")
+    args = parser.parse_args()
+
+    config.MONGO_DB = args.db
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "results": [],
+    }
+    try:
+        for scale in args.scale or ["10k"]:
+            report["results"].extend(run_scale(parse_scale(scale), args))
+    finally:
+        close_db()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Compare SELECTION_STRATEGY=sample ($sample) with randomKey (indexed range seek).
+
+Seeds a synthetic collection in a separate database on a local mongod, then
+times select_questions under both strategies with the same filter mix.
+
+    MONGO_URI=mongodb://localhost:27017 python benchmarks/bench_selection.py --questions 1000000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+
+from config import config  # noqa: E402
+from db import get_db, close_db  # noqa: E402
+import service  # noqa: E402
+from benchmarks.seed import DEFAULT_DB, seed_database  # noqa: E402
+from benchmarks.stats import summarize  # noqa: E402
+from benchmarks.synthetic import random_filters  # noqa: E402
+
+
+def run_strategy(strategy, filters_list):
+    config.SELECTION_STRATEGY = strategy
+    latencies = []
+    returned = 0
+    for filters in filters_list:
+        started = time.perf_counter()
+        returned += len(service.select_questions(filters, filters["limit"]))
+        latencies.append((time.perf_counter() - started) * 1000)
+    return {**summarize(latencies), "avg_returned": round(returned / len(latencies), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--db", default=DEFAULT_DB, help="Scratch database (dropped and reseeded)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    config.MONGO_DB = args.db
+    rng = random.Random(args.seed)
+    try:
+        taxonomy = seed_database(get_db(), args.questions, rng)
+        filters_list = [random_filters(rng, taxonomy) for _ in range(args.queries)]
+        # Warm the cache/indexes once so neither strategy pays the cold start
+        run_strategy("sample", filters_list[:10])
+        results = {
+            "questions": args.questions,
+            "sample": run_strategy("sample", filters_list),
+            "randomKey": run_strategy("randomKey", filters_list),
+        }
+    finally:
+        close_db()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Microbenchmark: question payload serialization, before and after utils.serialization.
+
+"before" is the old path: recursive convert_objectids, then FastAPI's
+jsonable_encoder and json.dumps. "after" is a single orjson pass that writes
+ObjectIds as strings. Payloads are 25 projected questions with latex arrays.
+
+    python benchmarks/bench_serialization.py --iterations 2000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+
+from bson import ObjectId  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+from benchmarks.synthetic import build_taxonomy, generate_questions  # noqa: E402
+from service import build_batch_response  # noqa: E402
+from utils.serialization import dumps  # noqa: E402
+
+
+def legacy_convert_objectids(obj):
+    """The recursive converter service.py used before the single serialization path"""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    elif isinstance(obj, dict):
+        return {k: legacy_convert_objectids(v) for k, v in obj.items() if k != 'html'}
+    elif isinstance(obj, list):
+        return [legacy_convert_objectids(item) for item in obj]
+    return obj
+
+
+def projected(question, rng):
+    """Shape a synthetic question like QUESTION_PROJECTION output, with richer latex"""
+    body = question["question"]["body"]
+    body.pop("html", None)
+    body["latexes"] = [{"_id": ObjectId(), "latex": f"\\frac{{{i}}}{{x+{i}}}"} for i in range(rng.randrange(2, 6))]
+    for option in question["question"]["options"]:
+        option["d"]["latexes"] = [{"_id": ObjectId(), "latex": "\\sqrt{2}"}]
+    question["answer"]["explanation"]["latexes"] = [{"_id": ObjectId(), "latex": "x^2"}]
+    for key in ("isPublic", "contentHash", "randomKey", "createdAt"):
+        question.pop(key, None)
+    question["topicName"] = "Algebra"
+    return question
+
+
+def before(response):
+    response = {**response, "questions": [legacy_convert_objectids(q) for q in response["questions"]]}
+    return json.dumps(
+        jsonable_encoder(response), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def after(response):
+    return dumps(response)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--questions", type=int, default=25)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    questions = [projected(q, rng) for q in generate_questions(rng, build_taxonomy(rng), args.questions)]
+    response = build_batch_response({"difficulty": 1, "type": 0}, args.questions, questions)
+
+    assert json.loads(before(response)) == json.loads(after(response))
+
+    results = {"questions": args.questions, "payload_bytes": len(after(response))}
+    for name, func in (("before", before), ("after", after)):
+        seconds = min(timeit.repeat(lambda: func(response), number=args.iterations, repeat=3))
+        results[f"{name}_us_per_payload"] = round(seconds / args.iterations * 1e6, 1)
+    results["speedup"] = round(results["before_us_per_payload"] / results["after_us_per_payload"], 1)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Seed a scratch database on a local mongod with a synthetic question bank.
+
+Creates courses, subjects, topics (with subtopics), assets and questions with
+realistic tag arrays, latex and <tm-asset> references, then builds the
+indexes from indexes.py. Existing data in the target database is dropped.
+
+    MONGO_URI=mongodb://localhost:27017 python benchmarks/seed.py --scale 100k
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+
+from config import config  # noqa: E402
+from db import get_db, close_db  # noqa: E402
+from indexes import ensure_indexes  # noqa: E402
+from benchmarks.synthetic import (  # noqa: E402
+    asset_documents,
+    build_taxonomy,
+    generate_questions,
+    taxonomy_documents,
+)
+
+DEFAULT_DB = "questionbank_bench"
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+
+def parse_scale(value):
+    """Accept 10k / 100k / 1m or a plain number of questions"""
+    value = str(value).lower()
+    return SCALES[value] if value in SCALES else int(value)
+
+
+def seed_database(db, questions, rng, batch_size=10000, assets=2000):
+    for name in ("courses", "subjects", "topics", "assets", "questions"):
+        db[name].drop()
+
+    taxonomy = build_taxonomy(rng)
+    courses, subjects, topics = taxonomy_documents(taxonomy)
+    db["courses"].insert_many(courses)
+    db["subjects"].insert_many(subjects)
+    db["topics"].insert_many(topics)
+
+    asset_docs = asset_documents(assets)
+    db["assets"].insert_many(asset_docs)
+    asset_ids = [str(a["_id"]) for a in asset_docs]
+
+    batch = []
+    for doc in generate_questions(rng, taxonomy, questions, asset_ids=asset_ids):
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            db["questions"].insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        db["questions"].insert_many(batch, ordered=False)
+
+    ensure_indexes(db)
+    return taxonomy
+
+
+def load_taxonomy(db):
+    """Rebuild the {course: {subject: {topic: [subtopics]}}} map from a seeded database"""
+    course_of = {s["_id"]: s["courseId"] for s in db["subjects"].find({}, {"courseId": 1})}
+    taxonomy = {}
+    children = {}
+    for topic in db["topics"].find({}, {"subjectId": 1, "parentTopicId": 1}):
+        if topic.get("parentTopicId"):
+            children.setdefault(topic["parentTopicId"], []).append(topic["_id"])
+    for topic in db["topics"].find({"parentTopicId": None}, {"subjectId": 1}):
+        subject_id = topic["subjectId"]
+        subject = taxonomy.setdefault(course_of[subject_id], {}).setdefault(subject_id, {})
+        subject[topic["_id"]] = children.get(topic["_id"], [])
+    return taxonomy
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a synthetic question bank")
+    parser.add_argument("--scale", default="10k", help="10k, 100k, 1m or a number of questions")
+    parser.add_argument("--db", default=DEFAULT_DB, help="Scratch database (dropped and reseeded)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    config.MONGO_DB = args.db
+    started = time.perf_counter()
+    try:
+        seed_database(get_db(), parse_scale(args.scale), random.Random(args.seed))
+    finally:
+        close_db()
+    print(f"Seeded {args.db} with {parse_scale(args.scale)} questions in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+"""Latency summaries shared by the benchmarks"""
+
+import statistics
+
+
+def percentile(sorted_values, pct):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct))]
+
+
+def summarize(latencies_ms, elapsed_s=None):
+    """p50/p95/p99 of a list of latencies (ms), plus throughput if elapsed is given"""
+    values = sorted(latencies_ms)
+    summary = {
+        "requests": len(values),
+        "p50_ms": round(statistics.median(values), 2),
+        "p95_ms": round(percentile(values, 0.95), 2),
+        "p99_ms": round(percentile(values, 0.99), 2),
+    }
+    if elapsed_s:
+        summary["throughput_rps"] = round(len(values) / elapsed_s, 1)
+    return summary
@@ -0,0 +1,136 @@
+"""Synthetic question bank generator shared by the benchmarks"""
+
+import random
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from utils.content_hash import content_hash
+
+
+def build_taxonomy(rng, courses=3, subjects_per_course=4, topics_per_subject=12, subtopics_per_topic=4):
+    """Return {course_id: {subject_id: {topic_id: [subtopic_id, ...]}}}"""
+    taxonomy = {}
+    for _ in range(courses):
+        course = taxonomy.setdefault(ObjectId(), {})
+        for _ in range(subjects_per_course):
+            subject = course.setdefault(ObjectId(), {})
+            for _ in range(topics_per_subject):
+                subject[ObjectId()] = [ObjectId() for _ in range(subtopics_per_topic)]
+    return taxonomy
+
+
+def taxonomy_documents(taxonomy):
+    """Return (courses, subjects, topics) documents for a taxonomy"""
+    courses, subjects, topics = [], [], []
+    for c, (course_id, course_subjects) in enumerate(taxonomy.items()):
+        courses.append({"_id": course_id, "name": f"Course {c}", "slug": f"course-{c}"})
+        for s, (subject_id, subject_topics) in enumerate(course_subjects.items()):
+            subjects.append({"_id": subject_id, "name": f"Subject {c}.{s}", "courseId": course_id})
+            for t, (topic_id, subtopic_ids) in enumerate(subject_topics.items()):
+                topics.append({
+                    "_id": topic_id,
+                    "name": f"Topic {c}.{s}.{t}",
+                    "subjectId": subject_id,
+                    "parentTopicId": None,
+                    "priority": t,
+                    "availableQuestionTypes": list(range(7)),
+                })
+                for st, subtopic_id in enumerate(subtopic_ids):
+                    topics.append({
+                        "_id": subtopic_id,
+                        "name": f"Subtopic {c}.{s}.{t}.{st}",
+                        "subjectId": subject_id,
+                        "parentTopicId": topic_id,
+                        "priority": st,
+                    })
+    return courses, subjects, topics
+
+
+def asset_documents(count):
+    return [
+        {"_id": ObjectId(), "url": f"https://cdn.example.com/assets/{i}.png", "type": "image", "name": f"asset-{i}.png"}
+        for i in range(count)
+    ]
+
+
+def _latexes(rng, n):
+    return [
+        {"_id": ObjectId(), "latex": f"\\frac{{{rng.randrange(1, 99)}}}{{x+{i}}}"}
+        for i in range(rng.randrange(n + 1))
+    ]
+
+
+def generate_questions(rng, taxonomy, count, duplicate_ratio=0.02, asset_ids=None, asset_ratio=0.3):
+    """Yield question documents shaped like the production questions collection"""
+    tag_choices = [
+        (course_id, subject_id, topic_id, subtopics)
+        for course_id, subjects in taxonomy.items()
+        for subject_id, topics in subjects.items()
+        for topic_id, subtopics in topics.items()
+    ]
+    epoch = datetime(2020, 1, 1)
+
+    for i in range(count):
+        # Most questions carry one tag; some are cross-listed under 2-3 topics
+        tags = []
+        for _ in range(1 if rng.random() < 0.8 else rng.randrange(2, 4)):
+            course_id, subject_id, topic_id, subtopics = rng.choice(tag_choices)
+            tag = {"course_id": course_id, "subject_id": subject_id, "topic_id": topic_id}
+            if rng.random() < 0.7:
+                tag["subtopic_id"] = rng.choice(subtopics)
+            tags.append(tag)
+
+        # A small share of questions repeat an earlier question's text
+        n = rng.randrange(max(i, 1)) if rng.random() < duplicate_ratio else i
+        text = f"Question {n}: evaluate $$x^{{{n % 7}}}$$ for the given expression."
+        explanation = f"Because {n} works out."
+        if asset_ids and rng.random() < asset_ratio:
+            explanation += f' See the diagram: <tm-asset id="{rng.choice(asset_ids)}" />'
+
+        yield {
+            "_id": ObjectId(),
+            "isPublic": rng.random() < 0.95,
+            "type": rng.randrange(7),
+            "meta": {"difficulty": rng.randrange(3)},
+            "tags": tags,
+            "question": {
+                "body": {
+                    "text": text,
+                    "html": f"<p>{text}</p>",
+                    "latexes": [{"_id": ObjectId(), "latex": f"x^{{{n % 7}}}"}] + _latexes(rng, 3),
+                },
+                "options": [
+                    {"v": v, "d": {"text": f"Option {v} for {n}", "latexes": _latexes(rng, 1)}}
+                    for v in "abcd"
+                ],
+            },
+            "answer": {
+                "answer": [rng.randrange(4)],
+                "explanation": {"text": explanation, "latexes": _latexes(rng, 2)},
+            },
+            "contentHash": content_hash(text),
+            "randomKey": rng.random(),
+            "createdAt": epoch + timedelta(minutes=i),
+        }
+
+
+FILTER_MIXES = ("subject", "topics", "subtopics", "topics+subtopics")
+
+
+def random_filters(rng, taxonomy, mix="topics"):
+    """Pick a filter payload in the shape QuestionFilters.model_dump() produces"""
+    course_id = rng.choice(list(taxonomy))
+    subject_id = rng.choice(list(taxonomy[course_id]))
+    topics = taxonomy[course_id][subject_id]
+    topic_ids = rng.sample(list(topics), k=min(3, len(topics)))
+    subtopic_ids = [rng.choice(topics[t]) for t in rng.sample(list(topics), k=min(2, len(topics)))]
+    return {
+        "courseId": str(course_id),
+        "subjectId": str(subject_id),
+        "topicIds": [str(t) for t in topic_ids] if mix in ("topics", "topics+subtopics") else [],
+        "subtopicIds": [str(s) for s in subtopic_ids] if mix in ("subtopics", "topics+subtopics") else [],
+        "difficulty": rng.randrange(3),
+        "type": rng.randrange(7),
+        "limit": 25,
+    }
@@ -8,10 +8,48 @@ class Config:
     MONGO_DB = os.getenv("MONGO_DB", "questionbank")
     QUESTIONS_PER_REQUEST = int(os.getenv("QUESTIONS_PER_REQUEST", "25"))
     QUERY_TIMEOUT_MS = int(os.getenv("QUERY_TIMEOUT_MS", "5000"))
+    MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "20"))
+    MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "2"))
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "0"))
+    DB_THREADPOOL_SIZE = int(os.getenv("DB_THREADPOOL_SIZE", os.getenv("MONGO_MAX_POOL_SIZE", "20")))
     SELECTION_STRATEGY = os.getenv("SELECTION_STRATEGY", "sample")
+    RENDERED_QUESTIONS_ENABLED = os.getenv("RENDERED_QUESTIONS_ENABLED", "false").lower() == "true"
+    DEDUP_BACKFILL_ROUNDS = int(os.getenv("DEDUP_BACKFILL_ROUNDS", "2"))
     DIFFICULTY_SCALE = os.getenv("DIFFICULTY_SCALE", "zeroBased")
     PORT = int(os.getenv("PORT", "8000"))
+    QUESTION_POOL_ENABLED = os.getenv("QUESTION_POOL_ENABLED", "false").lower() == "true"
+    QUESTION_POOL_SIZE = int(os.getenv("QUESTION_POOL_SIZE", "100"))
+    QUESTION_POOL_LOW_WATER = int(os.getenv("QUESTION_POOL_LOW_WATER", "50"))
+    QUESTION_POOL_MAX_KEYS = int(os.getenv("QUESTION_POOL_MAX_KEYS", "500"))
+    QUESTION_POOL_IDLE_SECONDS = int(os.getenv("QUESTION_POOL_IDLE_SECONDS", "600"))
+    QUESTION_POOL_MAX_AGE_SECONDS = int(os.getenv("QUESTION_POOL_MAX_AGE_SECONDS", "900"))
+    QUESTION_POOL_SHORT_RETRY_SECONDS = int(os.getenv("QUESTION_POOL_SHORT_RETRY_SECONDS", "60"))
+    QUESTION_INDEX_COURSES = [cid.strip() for cid in os.getenv("QUESTION_INDEX_COURSES", "").split(",") if cid.strip()]
+    QUESTION_INDEX_REFRESH_SECONDS = int(os.getenv("QUESTION_INDEX_REFRESH_SECONDS", "30"))
+    QUESTION_INDEX_REBUILD_SECONDS = int(os.getenv("QUESTION_INDEX_REBUILD_SECONDS", "3600"))
+    QUESTION_INDEX_CHANGE_STREAM = os.getenv("QUESTION_INDEX_CHANGE_STREAM", "false").lower() == "true"
+    SESSION_SEEN_TTL_SECONDS = int(os.getenv("SESSION_SEEN_TTL_SECONDS", "7200"))
+    SESSION_SEEN_MAX_SESSIONS = int(os.getenv("SESSION_SEEN_MAX_SESSIONS", "100000"))
+    SESSION_SEEN_CAPACITY = int(os.getenv("SESSION_SEEN_CAPACITY", "2000"))
+    SESSION_SEEN_ERROR_RATE = float(os.getenv("SESSION_SEEN_ERROR_RATE", "0.01"))
+    HTTP_CACHE_TTL_SECONDS = int(os.getenv("HTTP_CACHE_TTL_SECONDS", "300"))
+    HTTP_CACHE_MAX_AGE_SECONDS = int(os.getenv("HTTP_CACHE_MAX_AGE_SECONDS", "300"))
+    HTTP_CACHE_MAX_ENTRIES = int(os.getenv("HTTP_CACHE_MAX_ENTRIES", "2000"))
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() == "true"
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+    AI_REVIEW_PROVIDER = os.getenv("AI_REVIEW_PROVIDER", "gemini")  # "gemini" or "stub"
+    AI_REVIEW_MODEL = os.getenv("AI_REVIEW_MODEL", "gemini-2.0-flash")
+    AI_REVIEW_MAX_CONCURRENCY = int(os.getenv("AI_REVIEW_MAX_CONCURRENCY", "8"))
+    AI_REVIEW_TIMEOUT_SECONDS = float(os.getenv("AI_REVIEW_TIMEOUT_SECONDS", "15"))
+    AI_REVIEW_DEADLINE_MS = int(os.getenv("AI_REVIEW_DEADLINE_MS", "2500"))
+    AI_REVIEW_CACHE_TTL_SECONDS = int(os.getenv("AI_REVIEW_CACHE_TTL_SECONDS", "3600"))
+    AI_REVIEW_CACHE_MAX_SIZE = int(os.getenv("AI_REVIEW_CACHE_MAX_SIZE", "5000"))
+    AI_REVIEW_ACCURACY_BUCKET = int(os.getenv("AI_REVIEW_ACCURACY_BUCKET", "10"))
+    TAXONOMY_CACHE_TTL_SECONDS = int(os.getenv("TAXONOMY_CACHE_TTL_SECONDS", "600"))
+    TAXONOMY_CACHE_MAX_SIZE = int(os.getenv("TAXONOMY_CACHE_MAX_SIZE", "20000"))
+    TAXONOMY_VERSION_CHECK_SECONDS = int(os.getenv("TAXONOMY_VERSION_CHECK_SECONDS", "0"))
+    ASSET_CACHE_TTL_SECONDS = int(os.getenv("ASSET_CACHE_TTL_SECONDS", "3600"))
+    ASSET_CACHE_MAX_SIZE = int(os.getenv("ASSET_CACHE_MAX_SIZE", "50000"))
     
     if not MONGO_URI:
         raise ValueError("MONGO_URI environment variable is required")
@@ -1,14 +1,35 @@
+import functools
+from anyio import CapacityLimiter, to_thread
 from pymongo import MongoClient
 from config import config
+from metrics import MongoCommandListener
 
 _client = None
+_limiter = None
 
 def get_db():
     global _client
     if _client is None:
-        _client = MongoClient(config.MONGO_URI, maxPoolSize=20, minPoolSize=2)
+        _client = MongoClient(
+            config.MONGO_URI,
+            maxPoolSize=config.MONGO_MAX_POOL_SIZE,
+            minPoolSize=config.MONGO_MIN_POOL_SIZE,
+            waitQueueTimeoutMS=config.MONGO_WAIT_QUEUE_TIMEOUT_MS or None,
+            event_listeners=[MongoCommandListener()] if config.METRICS_ENABLED else []
+        )
     return _client[config.MONGO_DB]
 
+async def run_db(func, *args, **kwargs):
+    """Run blocking pymongo work on a bounded worker thread pool.
+
+    Keeps the event loop free while a query is in flight; the pool size
+    (DB_THREADPOOL_SIZE) caps how many queries a worker runs at once.
+    """
+    global _limiter
+    if _limiter is None:
+        _limiter = CapacityLimiter(config.DB_THREADPOOL_SIZE)
+    return await to_thread.run_sync(functools.partial(func, *args, **kwargs), limiter=_limiter)
+
 def close_db():
     global _client
     if _client:
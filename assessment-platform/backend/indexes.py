@@ -0,0 +1,75 @@
+"""Index definitions for the collections the API queries"""
+from typing import Dict, List
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+# Common equality prefix of every build_match_filter shape
+_SELECTION_PREFIX = [
+    ("isPublic", ASCENDING),
+    ("type", ASCENDING),
+    ("meta.difficulty", ASCENDING),
+    ("tags.course_id", ASCENDING),
+]
+
+# Serves the randomKey range seek (SELECTION_STRATEGY=randomKey)
+RANDOM_KEY_INDEX = _SELECTION_PREFIX + [("randomKey", ASCENDING)]
+
+def _selection_indexes() -> List[IndexModel]:
+    return [
+        # tags.* bounds compound because they sit under one $elemMatch
+        IndexModel(
+            _SELECTION_PREFIX + [("tags.subject_id", ASCENDING), ("tags.topic_id", ASCENDING)],
+            name="selection_topic"
+        ),
+        IndexModel(
+            _SELECTION_PREFIX + [("tags.subject_id", ASCENDING), ("tags.subtopic_id", ASCENDING)],
+            name="selection_subtopic"
+        ),
+        IndexModel(RANDOM_KEY_INDEX, name="selection_random_key"),
+        IndexModel(
+            _SELECTION_PREFIX + [("createdAt", DESCENDING), ("_id", DESCENDING)],
+            name="selection_newest"
+        ),
+        IndexModel([("contentHash", ASCENDING)], name="content_hash"),
+    ]
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "questions": _selection_indexes() + [
+        # Incremental materialization and the in-memory question index pick up
+        # edits by updatedAt (deltas per course for the latter)
+        IndexModel([("updatedAt", ASCENDING)], name="updated_at"),
+        IndexModel([("tags.course_id", ASCENDING), ("updatedAt", ASCENDING)], name="course_updated_at"),
+    ],
+    # Same selection shapes as questions (RENDERED_QUESTIONS_ENABLED), plus the
+    # lookups that re-render questions after an asset or topic changes
+    "questions_rendered": _selection_indexes() + [
+        IndexModel([("assetIds", ASCENDING)], name="asset_ids"),
+        IndexModel([("tags.topic_id", ASCENDING)], name="tag_topic"),
+        IndexModel([("tags.subtopic_id", ASCENDING)], name="tag_subtopic"),
+    ],
+    "topics": [
+        # /subjects/{id}/topics and fetch-by-subject (parent topics, by priority)
+        IndexModel(
+            [("subjectId", ASCENDING), ("parentTopicId", ASCENDING), ("priority", ASCENDING)],
+            name="subject_topics"
+        ),
+        # /topics/{id}/subtopics and the fetch-by-subject $lookup
+        IndexModel([("parentTopicId", ASCENDING), ("priority", ASCENDING)], name="subtopics"),
+        # TAXONOMY_VERSION_CHECK_SECONDS polls the newest updatedAt
+        IndexModel([("updatedAt", DESCENDING)], name="updated_at"),
+    ],
+    # Asset resolution looks assets up by _id, which the default index serves;
+    # incremental materialization polls updatedAt
+    "assets": [
+        IndexModel([("updatedAt", ASCENDING)], name="updated_at"),
+    ],
+    "subjects": [
+        IndexModel([("courseId", ASCENDING)], name="course_subjects"),
+    ],
+}
+
+def ensure_indexes(db) -> Dict[str, List[str]]:
+    """Create every recommended index (a no-op for ones that already exist)"""
+    created = {}
+    for collection, models in INDEXES.items():
+        created[collection] = db[collection].create_indexes(models) if models else []
+    return created
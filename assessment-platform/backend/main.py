@@ -1,16 +1,23 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from routes import router
 from routes_ai import ai_router
 from db import close_db
+from question_pool import question_pool
+from question_index import question_index
 from config import config
+from metrics import metrics_middleware, render_prometheus
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    question_index.start()
     yield
     # Shutdown
+    question_index.close()
+    question_pool.close()
     close_db()
 
 app = FastAPI(
@@ -28,6 +35,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if config.METRICS_ENABLED:
+    app.middleware("http")(metrics_middleware)
+
 app.include_router(router)
 app.include_router(ai_router)
 
@@ -35,6 +45,11 @@ app.include_router(ai_router)
 async def health_check():
     return {"status": "ok"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics (empty unless METRICS_ENABLED)"""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=config.PORT)
@@ -0,0 +1,160 @@
+"""Per-stage latency instrumentation, Prometheus /metrics and Server-Timing.
+
+Everything is a no-op unless METRICS_ENABLED is set: stage() hands back a
+shared null context, and neither the middleware nor the Mongo command
+listener is installed.
+"""
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+from fastapi import Request
+from pymongo import monitoring
+from config import config
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+_HELP = {
+    "http_request_duration_seconds": "HTTP request latency by route",
+    "stage_duration_seconds": "Latency of instrumented request stages",
+    "mongo_command_duration_seconds": "MongoDB command latency by command name",
+    "mongo_commands_per_request": "MongoDB commands issued per HTTP request",
+}
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.sum += value
+            self.count += 1
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+
+# (metric name, (label name, label value)) -> Histogram
+_histograms: Dict[Tuple[str, Tuple[str, str]], Histogram] = {}
+_histograms_lock = threading.Lock()
+
+def observe(name: str, label: Tuple[str, str], value: float, buckets=LATENCY_BUCKETS):
+    key = (name, label)
+    histogram = _histograms.get(key)
+    if histogram is None:
+        with _histograms_lock:
+            histogram = _histograms.setdefault(key, Histogram(buckets))
+    histogram.observe(value)
+
+class RequestTimings:
+    """Stage durations and Mongo usage of one HTTP request"""
+    __slots__ = ("stages", "mongo_count", "mongo_seconds")
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self.mongo_count = 0
+        self.mongo_seconds = 0.0
+
+    def server_timing(self) -> str:
+        parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages.items()]
+        if self.mongo_count:
+            parts.append(f'mongo;dur={self.mongo_seconds * 1000:.1f};desc="{self.mongo_count} queries"')
+        return ", ".join(parts)
+
+# Propagates into db.run_db worker threads, which run in a copy of the context
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+_NULL_STAGE = nullcontext()
+
+@contextmanager
+def _timed_stage(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        observe("stage_duration_seconds", ("stage", name), elapsed)
+        timings = _current.get()
+        if timings is not None:
+            timings.stages[name] = timings.stages.get(name, 0.0) + elapsed
+
+def stage(name: str):
+    """Time a block as a named stage (histogram + Server-Timing entry)"""
+    if not config.METRICS_ENABLED:
+        return _NULL_STAGE
+    return _timed_stage(name)
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Count and time every Mongo command, overall and per request"""
+
+    def started(self, event):
+        pass
+
+    def _record(self, event):
+        seconds = event.duration_micros / 1e6
+        observe("mongo_command_duration_seconds", ("command", event.command_name), seconds)
+        timings = _current.get()
+        if timings is not None:
+            timings.mongo_count += 1
+            timings.mongo_seconds += seconds
+
+    def succeeded(self, event):
+        self._record(event)
+
+    def failed(self, event):
+        self._record(event)
+
+async def metrics_middleware(request: Request, call_next):
+    timings = RequestTimings()
+    token = _current.set(timings)
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        _current.reset(token)
+
+    route = request.scope.get("route")
+    path = getattr(route, "path", "unmatched")
+    observe("http_request_duration_seconds", ("route", path), time.perf_counter() - started)
+    observe("mongo_commands_per_request", ("route", path), timings.mongo_count, COUNT_BUCKETS)
+
+    server_timing = timings.server_timing()
+    if server_timing:
+        response.headers["Server-Timing"] = server_timing
+    return response
+
+def _format_bound(bound) -> str:
+    return repr(float(bound))
+
+def render_prometheus() -> str:
+    """All histograms in the Prometheus text exposition format"""
+    lines = []
+    by_name: Dict[str, list] = {}
+    for (name, label), histogram in sorted(_histograms.items()):
+        by_name.setdefault(name, []).append((label, histogram))
+
+    for name, series in by_name.items():
+        metric = f"questionbank_{name}"
+        lines.append(f"# HELP {metric} {_HELP.get(name, name)}")
+        lines.append(f"# TYPE {metric} histogram")
+        for (label_name, label_value), histogram in series:
+            label = f'{label_name}="{label_value}"'
+            with histogram._lock:
+                counts = list(histogram.counts)
+                total, count = histogram.sum, histogram.count
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{metric}_bucket{{{label},le="{_format_bound(bound)}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{{label},le="+Inf"}} {count}')
+            lines.append(f"{metric}_sum{{{label}}} {total}")
+            lines.append(f"{metric}_count{{{label}}} {count}")
+    return "\n".join(lines) + "\n"
@@ -10,6 +10,7 @@ class QuestionFilters(BaseModel):
     difficulty: int = Field(..., ge=0, le=2, description="0=Easy, 1=Medium, 2=Hard")
     type: int = Field(..., ge=0, le=6, description="0=MCQ, 1=Multiple MCQ, 2=Number, 3=Fill Blanks, 4=Assertion, 5=True/False, 6=Subjective")
     limit: Optional[int] = Field(None, ge=1, le=25, description="Number of questions to fetch (1-25, default 25)")
+    sessionId: Optional[str] = Field(None, min_length=1, max_length=128, description="Practice session id; questions already returned in this session are not repeated")
     
     @field_validator('courseId', 'subjectId')
     @classmethod
@@ -39,3 +40,36 @@ class QuestionFilters(BaseModel):
             }
         }
     }
+
+class QuestionBatchRequest(BaseModel):
+    sections: List[QuestionFilters] = Field(..., min_length=1, max_length=10, description="Filter sections fetched together (1-10)")
+    
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "sections": [
+                    {
+                        "courseId": "5e12bc386ed15e08c72f429b",
+                        "subjectId": "5e12bc3e6ed15e08c72f429c",
+                        "topicIds": ["5e12bca90a53d808cd8a072b"],
+                        "difficulty": 0,
+                        "type": 0,
+                        "limit": 10
+                    },
+                    {
+                        "courseId": "5e12bc386ed15e08c72f429b",
+                        "subjectId": "5e12bc3e6ed15e08c72f429c",
+                        "topicIds": ["5e12bca90a53d808cd8a072b"],
+                        "difficulty": 1,
+                        "type": 2,
+                        "limit": 10
+                    }
+                ]
+            }
+        }
+    }
+
+class QuestionExportFilters(QuestionFilters):
+    limit: Optional[int] = Field(None, ge=1, description="Maximum number of questions to export (default: all)")
+    cursor: Optional[str] = Field(None, pattern=r'^[a-fA-F0-9]{24}$', description="Resume after this question _id (the last one received)")
+    batchSize: int = Field(500, ge=1, le=5000, description="Questions read and written per batch")
@@ -0,0 +1,439 @@
+"""In-memory question index for hot courses.
+
+For every course in QUESTION_INDEX_COURSES the selectable questions are held
+as two compact columns (ids, text hash) plus a bitmap per filter value. A
+/api/questions/fetch request is
+answered by intersecting bitmaps with build_match_filter semantics, sampling
+ids in memory and fetching only those documents by _id, so the aggregation
+drops out of the hot path.
+
+Bitmaps are Python ints with one bit per row. Rows are append-only: a
+changed question gets a new row and its old row is cleared from the live
+bitmap. Loaded rows are sorted by _id, so a question's row is found by
+binary search; only rows appended since the last load sit in a small map.
+Periodic delta queries (new _id or newer updatedAt) keep an index
+fresh, optionally backed by a change stream for hard deletes and
+re-tagging; a full rebuild also runs every QUESTION_INDEX_REBUILD_SECONDS.
+"""
+import asyncio
+import hashlib
+import logging
+import random
+import threading
+import time
+from array import array
+from itertools import compress
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from bson import ObjectId
+from config import config
+from db import get_db, run_db
+
+logger = logging.getLogger(__name__)
+
+# Only what the index needs; body text just for questions without contentHash
+INDEX_PROJECTION = {
+    "_id": 1,
+    "isPublic": 1,
+    "type": 1,
+    "meta.difficulty": 1,
+    "tags": 1,
+    "contentHash": 1,
+    "question.body.text": 1,
+    "updatedAt": 1
+}
+
+
+def _bit_count(bitmap: int) -> int:
+    return bitmap.bit_count() if hasattr(bitmap, "bit_count") else bin(bitmap).count("1")
+
+def _small_int(value: Any) -> int:
+    return value if isinstance(value, int) and not isinstance(value, bool) and -32768 <= value < 32768 else -1
+
+def _text_hash(doc: Dict[str, Any]) -> int:
+    """64-bit hash of the dedup key the aggregation groups by (contentHash, else exact text)"""
+    key = doc.get("contentHash") or doc.get("question", {}).get("body", {}).get("text", "")
+    return int.from_bytes(hashlib.blake2b(str(key).encode("utf-8"), digest_size=8).digest(), "little")
+
+def _to_bitmap(rows: List[int]) -> int:
+    if not rows:
+        return 0
+    bits = bytearray(max(rows) // 8 + 1)
+    for row in rows:
+        bits[row >> 3] |= 1 << (row & 7)
+    return int.from_bytes(bits, "little")
+
+def _random_rows(words: array, count: int, wanted: int):
+    """Matched rows (set bits of 64-bit words) in uniformly random order, each at most once.
+
+    Nonzero words are listed in C. While few rows are wanted relative to
+    count, a random nonzero word and a random bit in it are probed (kept
+    only if set, so every row is equally likely); after that, or when few
+    rows match, the rest are enumerated and shuffled lazily, as far as the
+    caller reads.
+    """
+    nonzero = list(compress(range(len(words)), words))
+    yielded = set()
+    if wanted * 4 < count:
+        pick, getrandbits, n = random.random, random.getrandbits, len(nonzero)
+        while len(yielded) < count // 2:
+            i = nonzero[int(pick() * n)]
+            bit = getrandbits(6)
+            row = i << 6 | bit
+            if words[i] >> bit & 1 and row not in yielded:
+                yielded.add(row)
+                yield row
+    rest = []
+    for i in nonzero:
+        word, base = words[i], i << 6
+        while word:
+            low = word & -word
+            rest.append(base + low.bit_length() - 1)
+            word ^= low
+    if yielded:
+        rest = [row for row in rest if row not in yielded]
+    for i in range(len(rest)):
+        j = random.randrange(i, len(rest))
+        rest[i], rest[j] = rest[j], rest[i]
+        yield rest[i]
+
+class CourseIndex:
+    """Columns and bitmaps for one course's selectable questions"""
+
+    def __init__(self, course_id: ObjectId):
+        self.course_id = course_id
+        self.ids = bytearray()  # 12 bytes per row
+        self.text_hashes = array("Q")
+        self.bitmaps: Dict[Tuple, int] = {}
+        self.alive = 0
+        self.rows = 0
+        self.dead = 0
+        self.sorted_rows = 0  # rows [0, sorted_rows) are in _id order
+        self.appended: Dict[bytes, int] = {}  # rows added after load
+        self.max_id: Optional[ObjectId] = None
+        self.watermark = None  # newest updatedAt seen
+        self.loaded_at = 0.0
+        self.lock = threading.Lock()
+
+    def _course_tags(self, doc: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return [tag for tag in doc.get("tags") or [] if isinstance(tag, dict) and tag.get("course_id") == self.course_id]
+
+    def _track(self, doc: Dict[str, Any]):
+        if self.max_id is None or doc["_id"] > self.max_id:
+            self.max_id = doc["_id"]
+        updated = doc.get("updatedAt")
+        if updated is not None and (self.watermark is None or updated > self.watermark):
+            self.watermark = updated
+
+    def add(self, doc: Dict[str, Any], pending: Optional[Dict[Tuple, List[int]]] = None):
+        """Append doc as a new row if it is selectable in this course.
+
+        While loading, rows are collected in pending and turned into bitmaps
+        once (setting bits one at a time on a large int is quadratic).
+        """
+        tags = self._course_tags(doc)
+        if tags:
+            self._track(doc)
+        if doc.get("isPublic") is not True or not tags or not doc.get("question", {}).get("body", {}).get("text"):
+            return
+
+        row = self.rows
+        self.rows += 1
+        if pending is None:
+            self.appended[doc["_id"].binary] = row
+        self.ids += doc["_id"].binary
+        self.text_hashes.append(_text_hash(doc))
+
+        keys = {("type", _small_int(doc.get("type"))), ("difficulty", _small_int(doc.get("meta", {}).get("difficulty")))}
+        for tag in tags:
+            subject, topic, subtopic = tag.get("subject_id"), tag.get("topic_id"), tag.get("subtopic_id")
+            # (kind, None, id) answers filters without a subjectId; the subject
+            # is part of the key so one tag has to carry both, like $elemMatch
+            keys.add(("subject", subject))
+            if topic is not None:
+                keys.update({("topic", subject, topic), ("topic", None, topic)})
+            if subtopic is not None:
+                keys.update({("subtopic", subject, subtopic), ("subtopic", None, subtopic)})
+
+        if pending is not None:
+            for key in keys:
+                pending.setdefault(key, []).append(row)
+            return
+        bit = 1 << row
+        for key in keys:
+            self.bitmaps[key] = self.bitmaps.get(key, 0) | bit
+        self.alive |= bit
+
+    def _loaded_row(self, key: bytes) -> Optional[int]:
+        """Binary search of the loaded (sorted) rows"""
+        ids, low, high = self.ids, 0, self.sorted_rows
+        while low < high:
+            mid = (low + high) // 2
+            if ids[mid * 12:mid * 12 + 12] < key:
+                low = mid + 1
+            else:
+                high = mid
+        if low < self.sorted_rows and ids[low * 12:low * 12 + 12] == key:
+            return low
+        return None
+
+    def remove(self, question_id: ObjectId) -> bool:
+        key = question_id.binary
+        row = self.appended.pop(key, None)
+        if row is None:
+            row = self._loaded_row(key)
+            if row is None or not self.alive >> row & 1:
+                return False
+        self.alive &= ~(1 << row)
+        self.dead += 1
+        return True
+
+    def apply(self, doc: Dict[str, Any]):
+        """Replace the question's row with its current version"""
+        self.remove(doc["_id"])
+        self.add(doc)
+
+    def load(self, collection):
+        pending: Dict[Tuple, List[int]] = {}
+        cursor = collection.find(
+            {"isPublic": True, "tags.course_id": self.course_id, "question.body.text": {"$nin": [None, ""]}},
+            INDEX_PROJECTION,
+            batch_size=5000
+        )
+        try:
+            for doc in cursor:
+                self.add(doc, pending)
+        finally:
+            cursor.close()
+        self._sort_rows(pending)
+        self.bitmaps = {key: _to_bitmap(rows) for key, rows in pending.items()}
+        self.alive = (1 << self.rows) - 1
+        self.loaded_at = time.time()
+
+    def _sort_rows(self, pending: Dict[Tuple, List[int]]):
+        """Reorder the loaded rows by _id (the cursor isn't sorted, to keep its index choice free)"""
+        ids, rows = self.ids, self.rows
+        order = sorted(range(rows), key=lambda row: ids[row * 12:row * 12 + 12])
+        if order != list(range(rows)):
+            self.ids = bytearray().join(ids[row * 12:row * 12 + 12] for row in order)
+            self.text_hashes = array("Q", [self.text_hashes[row] for row in order])
+            position = array("I", bytes(4 * rows))
+            for new, old in enumerate(order):
+                position[old] = new
+            for key, key_rows in pending.items():
+                pending[key] = [position[row] for row in key_rows]
+        self.sorted_rows = rows
+
+    def delta_query(self) -> Dict[str, Any]:
+        """Questions inserted or updated since the last load/delta (unpublished ones included)"""
+        since = [{"_id": {"$gt": self.max_id}}] if self.max_id is not None else []
+        # Until some question carries updatedAt, any that gets one is new to us
+        since.append({"updatedAt": {"$gt": self.watermark} if self.watermark is not None else {"$exists": True}})
+        return {"tags.course_id": self.course_id, "$or": since}
+
+    def matching(self, filters: Dict[str, Any]) -> int:
+        """Bitmap of live rows that build_match_filter(filters) would match"""
+        get = self.bitmaps.get
+        matched = self.alive & get(("type", filters["type"]), 0) & get(("difficulty", filters["difficulty"]), 0)
+        if not matched:
+            return 0
+
+        subject = ObjectId(filters["subjectId"]) if filters.get("subjectId") else None
+        topic_ids = [ObjectId(tid) for tid in filters.get("topicIds") or [] if tid]
+        subtopic_ids = [ObjectId(sid) for sid in filters.get("subtopicIds") or [] if sid]
+        if topic_ids or subtopic_ids:
+            tagged = 0
+            for tid in topic_ids:
+                tagged |= get(("topic", subject, tid), 0)
+            for sid in subtopic_ids:
+                tagged |= get(("subtopic", subject, sid), 0)
+        elif subject is not None:
+            tagged = get(("subject", subject), 0)
+        else:
+            return matched
+        return matched & tagged
+
+    def sample(self, filters: Dict[str, Any], size: int, exclude: Optional[Callable[[ObjectId], bool]] = None) -> List[ObjectId]:
+        """Up to size random matching ids with distinct text, skipping excluded ones"""
+        with self.lock:
+            matched = self.matching(filters)
+            rows = self.rows
+        if not matched or size <= 0:
+            return []
+
+        words = array("Q", matched.to_bytes((rows + 63) // 64 * 8, "little"))
+        count = _bit_count(matched)
+        picked, seen_hashes = [], set()
+        # Oversampled for rows dropped as duplicates or excluded
+        for row in _random_rows(words, count, size * 2):
+            text_hash = self.text_hashes[row]
+            if text_hash in seen_hashes:
+                continue
+            seen_hashes.add(text_hash)
+            question_id = ObjectId(bytes(self.ids[row * 12:row * 12 + 12]))
+            if exclude and exclude(question_id):
+                continue
+            picked.append(question_id)
+            if len(picked) >= size:
+                break
+        return picked
+
+    def memory_bytes(self) -> int:
+        return (
+            len(self.ids)
+            + self.text_hashes.itemsize * len(self.text_hashes)
+            + sum((bitmap.bit_length() + 7) // 8 for bitmap in self.bitmaps.values())
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "liveRows": self.rows - self.dead,
+            "bitmaps": len(self.bitmaps),
+            "columnBytes": self.memory_bytes(),
+            "loadedAt": self.loaded_at
+        }
+
+def _course_key(course_id: Any) -> str:
+    """Courses are looked up by lowercase hex, however the id was written"""
+    return str(course_id).lower()
+
+class QuestionIndex:
+    def __init__(self, course_ids: List[str], refresh_seconds: float, rebuild_seconds: float, change_stream: bool):
+        self.course_ids = [ObjectId(cid) for cid in course_ids]
+        self.refresh_seconds = refresh_seconds
+        self.rebuild_seconds = rebuild_seconds
+        self.change_stream = change_stream
+        self._courses: Dict[str, CourseIndex] = {}
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._watch_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.loads = 0
+        self.deltas = 0
+        self.changes = 0
+        self.refresh_errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.course_ids)
+
+    def sample_ids(self, filters: Dict[str, Any], size: int, exclude: Optional[Callable[[ObjectId], bool]] = None) -> Optional[List[ObjectId]]:
+        """Ids to fetch for this request, or None if its course isn't indexed (yet)"""
+        course = self._courses.get(_course_key(filters["courseId"]))
+        if course is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return course.sample(filters, size, exclude)
+
+    def record_stale(self, course_id: str, question_ids: List[ObjectId]):
+        """Sampled ids no longer matched in MongoDB and the request went live.
+
+        They're dropped from the course index so later requests don't sample
+        them again; a delta or rebuild re-adds any that still qualify.
+        """
+        self.stale += 1
+        course = self._courses.get(_course_key(course_id))
+        if course is None:
+            return
+        with course.lock:
+            for question_id in question_ids:
+                course.remove(question_id)
+
+    def refresh(self, course_id: ObjectId):
+        """Blocking: full rebuild when due, otherwise apply the delta since the last pass"""
+        collection = get_db()["questions"]
+        course = self._courses.get(_course_key(course_id))
+        if (
+            course is None
+            or time.time() - course.loaded_at >= self.rebuild_seconds
+            # Rows are append-only; rebuild once a quarter are dead
+            or course.dead > max(1000, course.rows // 4)
+        ):
+            # Built off to the side and swapped in, so requests keep being served
+            course = CourseIndex(course_id)
+            course.load(collection)
+            self._courses[_course_key(course_id)] = course
+            self.loads += 1
+            return
+
+        changed = list(collection.find(course.delta_query(), INDEX_PROJECTION))
+        with course.lock:
+            for doc in changed:
+                course.apply(doc)
+        self.deltas += 1
+
+    def apply_change(self, change: Dict[str, Any]):
+        """Apply one change stream event to every course index"""
+        doc = change.get("fullDocument")
+        question_id = change.get("documentKey", {}).get("_id")
+        for course in list(self._courses.values()):
+            with course.lock:
+                if doc is not None:
+                    # Also drops questions re-tagged out of the course or unpublished
+                    course.apply(doc)
+                elif question_id is not None:
+                    course.remove(question_id)
+        self.changes += 1
+
+    async def _refresh_loop(self):
+        while True:
+            for course_id in self.course_ids:
+                try:
+                    await run_db(self.refresh, course_id)
+                except Exception as e:
+                    self.refresh_errors += 1
+                    logger.warning("Question index refresh error (%s): %s", course_id, e)
+            await asyncio.sleep(self.refresh_seconds)
+
+    def _watch(self):
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}}]
+        while not self._stop.is_set():
+            try:
+                with get_db()["questions"].watch(pipeline, full_document="updateLookup", max_await_time_ms=1000) as stream:
+                    while not self._stop.is_set():
+                        change = stream.try_next()
+                        if change is not None:
+                            self.apply_change(change)
+            except Exception as e:
+                logger.warning("Question index change stream error: %s", e)
+                self._stop.wait(5)
+
+    def start(self):
+        """Load the configured courses in the background and keep them fresh"""
+        if not self.enabled or self._refresh_task is not None:
+            return
+        self._stop.clear()
+        self._refresh_task = asyncio.create_task(self._refresh_loop())
+        if self.change_stream:
+            self._watch_thread = threading.Thread(target=self._watch, name="question-index-watch", daemon=True)
+            self._watch_thread.start()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "loads": self.loads,
+            "deltas": self.deltas,
+            "changes": self.changes,
+            "refreshErrors": self.refresh_errors,
+            "courses": {cid: course.stats() for cid, course in self._courses.items()}
+        }
+
+    def close(self):
+        self._stop.set()
+        if self._refresh_task:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+        self._courses.clear()
+
+question_index = QuestionIndex(
+    course_ids=config.QUESTION_INDEX_COURSES,
+    refresh_seconds=config.QUESTION_INDEX_REFRESH_SECONDS,
+    rebuild_seconds=config.QUESTION_INDEX_REBUILD_SECONDS,
+    change_stream=config.QUESTION_INDEX_CHANGE_STREAM
+)
@@ -0,0 +1,183 @@
+"""Prefetched question pools per filter combination.
+
+Hot (course, subject, topics, subtopics, difficulty, type) combinations keep
+a buffer of already rendered questions. Requests draw from the buffer and a
+background task refills it once it drops below the low-water mark. A pool
+that can't cover a request falls back to the live query.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional, Tuple
+from config import config
+from db import run_db
+from service import build_batch_response, fetch_questions, get_question_batch
+from session_store import session_store
+
+logger = logging.getLogger(__name__)
+
+def pool_key(filters: Dict[str, Any]) -> Tuple:
+    """Filter combination a pool is kept for (limit is per request, not per pool)"""
+    return (
+        filters["courseId"],
+        filters.get("subjectId"),
+        tuple(sorted(filters.get("topicIds") or [])),
+        tuple(sorted(filters.get("subtopicIds") or [])),
+        filters["difficulty"],
+        filters["type"]
+    )
+
+class _Pool:
+    __slots__ = ("filters", "buffer", "last_used", "refill_task", "short_until")
+
+    def __init__(self, filters: Dict[str, Any]):
+        self.filters = filters
+        self.buffer = deque()  # (expires_at, question)
+        self.last_used = time.monotonic()
+        self.refill_task: Optional[asyncio.Task] = None
+        # Set when a refill came back short: the matched set may be too small
+        # to pool, so until then requests go live instead of triggering refill
+        # after refill. The next refill after it passes decides again.
+        self.short_until = 0.0
+
+class QuestionPool:
+    def __init__(
+        self,
+        size: int,
+        low_water: int,
+        max_keys: int,
+        idle_seconds: float,
+        max_age_seconds: float,
+        short_retry_seconds: float
+    ):
+        self.size = size
+        self.low_water = low_water
+        self.max_keys = max_keys
+        self.idle_seconds = idle_seconds
+        self.max_age_seconds = max_age_seconds
+        self.short_retry_seconds = short_retry_seconds
+        self._pools: "OrderedDict[Tuple, _Pool]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.refills = 0
+        self.refill_errors = 0
+        self.evictions = 0
+
+    async def get_batch(self, filters: Dict[str, Any]) -> Dict[str, Any]:
+        """Serve a /api/questions/fetch request from the pool, or live on a miss"""
+        limit = filters.get("limit") or config.QUESTIONS_PER_REQUEST
+        pool = self._get_pool(filters)
+        self._drop_expired(pool)
+
+        questions = self._draw(pool, limit, filters.get("sessionId"))
+        if questions is not None:
+            self.hits += 1
+            session_store.mark_seen(filters.get("sessionId"), [q["_id"] for q in questions])
+            result = build_batch_response(filters, limit, questions)
+        else:
+            self.misses += 1
+            result = await run_db(get_question_batch, filters)
+
+        if len(pool.buffer) < self.low_water:
+            self._schedule_refill(pool)
+        return result
+
+    def _get_pool(self, filters: Dict[str, Any]) -> _Pool:
+        key = pool_key(filters)
+        pool = self._pools.get(key)
+        if pool is None:
+            # Pools are shared across sessions; refills must not mark anything seen
+            pool = self._pools[key] = _Pool({**filters, "limit": None, "sessionId": None})
+        self._pools.move_to_end(key)
+        pool.last_used = time.monotonic()
+        self._evict()
+        return pool
+
+    def _evict(self):
+        """Drop least recently used pools past max_keys or idle for too long"""
+        cutoff = time.monotonic() - self.idle_seconds
+        while self._pools:
+            key, pool = next(iter(self._pools.items()))
+            if len(self._pools) <= self.max_keys and pool.last_used >= cutoff:
+                break
+            del self._pools[key]
+            if pool.refill_task:
+                pool.refill_task.cancel()
+            self.evictions += 1
+
+    def _draw(self, pool: _Pool, limit: int, session_id: Optional[str]) -> Optional[List[Dict[str, Any]]]:
+        """Take limit questions the session hasn't seen, or None if the pool can't cover it"""
+        if len(pool.buffer) < limit:
+            return None
+        if not session_id:
+            return [pool.buffer.popleft()[1] for _ in range(limit)]
+
+        picked, kept = [], deque()
+        for entry in pool.buffer:
+            if len(picked) < limit and not session_store.seen(session_id, entry[1]["_id"]):
+                picked.append(entry[1])
+            else:
+                kept.append(entry)
+        if len(picked) < limit:
+            return None
+        pool.buffer = kept
+        return picked
+
+    def _drop_expired(self, pool: _Pool):
+        now = time.monotonic()
+        while pool.buffer and pool.buffer[0][0] < now:
+            pool.buffer.popleft()
+
+    def _schedule_refill(self, pool: _Pool):
+        if pool.short_until > time.monotonic():
+            return
+        if pool.refill_task is None or pool.refill_task.done():
+            pool.refill_task = asyncio.create_task(self._refill(pool))
+
+    async def _refill(self, pool: _Pool):
+        needed = self.size - len(pool.buffer)
+        if needed <= 0:
+            return
+        try:
+            questions = await run_db(fetch_questions, pool.filters, needed)
+        except Exception as e:
+            self.refill_errors += 1
+            logger.warning("Question pool refill error: %s", e)
+            return
+
+        self.refills += 1
+        # A full refill clears an earlier short one (e.g. during an index build)
+        pool.short_until = time.monotonic() + self.short_retry_seconds if len(questions) < needed else 0.0
+        buffered = {q["_id"] for _, q in pool.buffer}
+        expires_at = time.monotonic() + self.max_age_seconds
+        pool.buffer.extend((expires_at, q) for q in questions if q["_id"] not in buffered)
+
+    def stats(self) -> Dict[str, Any]:
+        requests = self.hits + self.misses
+        return {
+            "enabled": True,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / requests, 4) if requests else 0.0,
+            "refills": self.refills,
+            "refillErrors": self.refill_errors,
+            "evictions": self.evictions,
+            "keys": len(self._pools),
+            "bufferedQuestions": sum(len(p.buffer) for p in self._pools.values())
+        }
+
+    def close(self):
+        for pool in self._pools.values():
+            if pool.refill_task:
+                pool.refill_task.cancel()
+        self._pools.clear()
+
+question_pool = QuestionPool(
+    size=config.QUESTION_POOL_SIZE,
+    low_water=config.QUESTION_POOL_LOW_WATER,
+    max_keys=config.QUESTION_POOL_MAX_KEYS,
+    idle_seconds=config.QUESTION_POOL_IDLE_SECONDS,
+    max_age_seconds=config.QUESTION_POOL_MAX_AGE_SECONDS,
+    short_retry_seconds=config.QUESTION_POOL_SHORT_RETRY_SECONDS
+)
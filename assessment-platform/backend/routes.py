@@ -1,19 +1,24 @@
-from fastapi import APIRouter, HTTPException, status
-from models import QuestionFilters
-from service import get_question_batch
+import logging
+import threading
+from anyio import CancelScope
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from models import QuestionFilters, QuestionBatchRequest, QuestionExportFilters
+from service import get_question_batch, get_question_sections, iter_question_export
 from bson import ObjectId
-from db import get_db
+from pymongo.errors import PyMongoError
+from db import get_db, run_db
+from config import config
+from question_pool import question_pool
+from question_index import question_index
 from enums import QuestionType, Difficulty, QUESTION_TYPE_LABELS, DIFFICULTY_LABELS
+from utils.http_cache import cached_json_response
+from utils.serialization import BSONResponse
+from metrics import stage
 
-router = APIRouter(prefix="/api", tags=["questions"])
+logger = logging.getLogger(__name__)
 
-def convert_objectids(doc):
-    """Recursively convert all ObjectId fields to strings"""
-    if isinstance(doc, list):
-        return [convert_objectids(item) for item in doc]
-    elif isinstance(doc, dict):
-        return {key: str(val) if isinstance(val, ObjectId) else convert_objectids(val) for key, val in doc.items()}
-    return doc
+router = APIRouter(prefix="/api", tags=["questions"])
 
 @router.get("/enums/question-types")
 async def get_question_types():
@@ -38,19 +43,20 @@ async def get_difficulties():
     }
 
 @router.get("/courses")
-async def get_courses():
+async def get_courses(request: Request):
     """Get all available courses"""
-    db = get_db()
-    courses = list(db["courses"].find(
-        {"isHidden": {"$ne": True}},
-        {"_id": 1, "name": 1, "slug": 1, "category": 1}
-    ))
-    for c in courses:
-        c["_id"] = str(c["_id"])
-    return {"status": "success", "courses": courses}
+    async def load():
+        db = get_db()
+        courses = await run_db(list, db["courses"].find(
+            {"isHidden": {"$ne": True}},
+            {"_id": 1, "name": 1, "slug": 1, "category": 1}
+        ))
+        return {"status": "success", "courses": courses}
+    
+    return await cached_json_response(request, load)
 
 @router.get("/courses/{course_id}/subjects")
-async def get_subjects(course_id: str):
+async def get_subjects(request: Request, course_id: str):
     """Get subjects for a course"""
     try:
         if len(course_id) != 24:
@@ -59,16 +65,15 @@ async def get_subjects(course_id: str):
                 detail=f"Invalid course_id format. Expected 24-character hex string, got '{course_id}'"
             )
         
-        db = get_db()
-        subjects = list(db["subjects"].find(
-            {"courseId": ObjectId(course_id), "isArchived": {"$ne": True}},
-            {"_id": 1, "name": 1, "questionsCount": 1, "courseId": 1}
-        ))
-        for s in subjects:
-            s["_id"] = str(s["_id"])
-            if "courseId" in s:
-                s["courseId"] = str(s["courseId"])
-        return {"status": "success", "subjects": subjects}
+        async def load():
+            db = get_db()
+            subjects = await run_db(list, db["subjects"].find(
+                {"courseId": ObjectId(course_id), "isArchived": {"$ne": True}},
+                {"_id": 1, "name": 1, "questionsCount": 1, "courseId": 1}
+            ))
+            return {"status": "success", "subjects": subjects}
+        
+        return await cached_json_response(request, load)
     except HTTPException:
         raise
     except Exception as e:
@@ -78,7 +83,7 @@ async def get_subjects(course_id: str):
         )
 
 @router.get("/subjects/{subject_id}/topics")
-async def get_topics(subject_id: str):
+async def get_topics(request: Request, subject_id: str):
     """Get topics (parent topics only) for a subject"""
     try:
         if len(subject_id) != 24:
@@ -87,21 +92,20 @@ async def get_topics(subject_id: str):
                 detail=f"Invalid subject_id format. Expected 24-character hex string, got '{subject_id}'"
             )
         
-        db = get_db()
-        topics = list(db["topics"].find(
-            {
-                "subjectId": ObjectId(subject_id),
-                "parentTopicId": None,
-                "isArchived": {"$ne": True},
-                "availableQuestionTypes": {"$exists": True, "$ne": []}
-            },
-            {"_id": 1, "name": 1, "questionsCount": 1, "priority": 1, "subjectId": 1}
-        ).sort("priority", 1))
-        for t in topics:
-            t["_id"] = str(t["_id"])
-            if "subjectId" in t:
-                t["subjectId"] = str(t["subjectId"])
-        return {"status": "success", "topics": topics}
+        async def load():
+            db = get_db()
+            topics = await run_db(list, db["topics"].find(
+                {
+                    "subjectId": ObjectId(subject_id),
+                    "parentTopicId": None,
+                    "isArchived": {"$ne": True},
+                    "availableQuestionTypes": {"$exists": True, "$ne": []}
+                },
+                {"_id": 1, "name": 1, "questionsCount": 1, "priority": 1, "subjectId": 1}
+            ).sort("priority", 1))
+            return {"status": "success", "topics": topics}
+        
+        return await cached_json_response(request, load)
     except HTTPException:
         raise
     except Exception as e:
@@ -111,7 +115,7 @@ async def get_topics(subject_id: str):
         )
 
 @router.get("/topics/{topic_id}/subtopics")
-async def get_subtopics(topic_id: str):
+async def get_subtopics(request: Request, topic_id: str):
     """Get subtopics for a topic"""
     try:
         if len(topic_id) != 24:
@@ -120,19 +124,18 @@ async def get_subtopics(topic_id: str):
                 detail=f"Invalid topic_id format. Expected 24-character hex string, got '{topic_id}'"
             )
         
-        db = get_db()
-        subtopics = list(db["topics"].find(
-            {
-                "parentTopicId": ObjectId(topic_id),
-                "isArchived": {"$ne": True}
-            },
-            {"_id": 1, "name": 1, "questionsCount": 1, "priority": 1, "parentTopicId": 1}
-        ).sort("priority", 1))
-        for st in subtopics:
-            st["_id"] = str(st["_id"])
-            if "parentTopicId" in st:
-                st["parentTopicId"] = str(st["parentTopicId"])
-        return {"status": "success", "subtopics": subtopics}
+        async def load():
+            db = get_db()
+            subtopics = await run_db(list, db["topics"].find(
+                {
+                    "parentTopicId": ObjectId(topic_id),
+                    "isArchived": {"$ne": True}
+                },
+                {"_id": 1, "name": 1, "questionsCount": 1, "priority": 1, "parentTopicId": 1}
+            ).sort("priority", 1))
+            return {"status": "success", "subtopics": subtopics}
+        
+        return await cached_json_response(request, load)
     except HTTPException:
         raise
     except Exception as e:
@@ -142,7 +145,7 @@ async def get_subtopics(topic_id: str):
         )
 
 @router.get("/topics/fetch-by-subject/{subject_id}")
-async def get_topics_with_subtopics(subject_id: str):
+async def get_topics_with_subtopics(request: Request, subject_id: str):
     """Get all topics with embedded subtopics for a subject (Drona pattern)"""
     try:
         if len(subject_id) != 24:
@@ -151,42 +154,44 @@ async def get_topics_with_subtopics(subject_id: str):
                 detail=f"Invalid subject_id format. Expected 24-character hex string, got '{subject_id}'"
             )
         
-        db = get_db()
-        pipeline = [
-            {
-                "$match": {
-                    "subjectId": ObjectId(subject_id),
-                    "parentTopicId": None,
-                    "isArchived": {"$ne": True},
-                    "availableQuestionTypes": {"$exists": True, "$ne": []}
-                }
-            },
-            {
-                "$lookup": {
-                    "from": "topics",
-                    "localField": "_id",
-                    "foreignField": "parentTopicId",
-                    "as": "subtopics"
-                }
-            },
-            {
-                "$addFields": {
-                    "subtopics": {
-                        "$filter": {
-                            "input": "$subtopics",
-                            "as": "st",
-                            "cond": {"$ne": ["$$st.isArchived", True]}
+        async def load():
+            db = get_db()
+            pipeline = [
+                {
+                    "$match": {
+                        "subjectId": ObjectId(subject_id),
+                        "parentTopicId": None,
+                        "isArchived": {"$ne": True},
+                        "availableQuestionTypes": {"$exists": True, "$ne": []}
+                    }
+                },
+                {
+                    "$lookup": {
+                        "from": "topics",
+                        "localField": "_id",
+                        "foreignField": "parentTopicId",
+                        "as": "subtopics"
+                    }
+                },
+                {
+                    "$addFields": {
+                        "subtopics": {
+                            "$filter": {
+                                "input": "$subtopics",
+                                "as": "st",
+                                "cond": {"$ne": ["$$st.isArchived", True]}
+                            }
                         }
                     }
-                }
-            },
-            {"$sort": {"priority": 1}}
-        ]
+                },
+                {"$sort": {"priority": 1}}
+            ]
+            
+            topics = await run_db(lambda: list(db["topics"].aggregate(pipeline)))
+            
+            return {"status": "success", "topics": topics}
         
-        topics = list(db["topics"].aggregate(pipeline))
-        topics = convert_objectids(topics)
-        
-        return {"status": "success", "topics": topics}
+        return await cached_json_response(request, load)
     except HTTPException:
         raise
     except Exception as e:
@@ -200,7 +205,7 @@ async def get_asset(asset_id: str):
     """Get asset URL or data"""
     try:
         db = get_db()
-        asset = db["assets"].find_one({"_id": ObjectId(asset_id)})
+        asset = await run_db(db["assets"].find_one, {"_id": ObjectId(asset_id)})
         
         if not asset:
             raise HTTPException(status_code=404, detail="Asset not found")
@@ -226,8 +231,31 @@ async def get_asset(asset_id: str):
 async def fetch_questions(filters: QuestionFilters):
     """Fetch questions based on filters"""
     try:
-        result = get_question_batch(filters.model_dump())
-        return result
+        if config.QUESTION_POOL_ENABLED:
+            result = await question_pool.get_batch(filters.model_dump())
+        else:
+            result = await run_db(get_question_batch, filters.model_dump())
+        with stage("serialize"):
+            return BSONResponse(result)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error fetching questions: {str(e)}"
+        )
+
+
+@router.post("/questions/fetch-batch")
+async def fetch_question_sections(request: QuestionBatchRequest):
+    """Fetch several filter sections (e.g. a mixed mock test) in one round trip"""
+    try:
+        result = await get_question_sections([section.model_dump() for section in request.sections])
+        with stage("serialize"):
+            return BSONResponse(result)
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
@@ -238,3 +266,57 @@ async def fetch_questions(filters: QuestionFilters):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error fetching questions: {str(e)}"
         )
+
+@router.post("/questions/export")
+async def export_questions(filters: QuestionExportFilters):
+    """Stream every matching question as newline-delimited JSON"""
+    chunks = iter_question_export(
+        filters.model_dump(),
+        after=filters.cursor,
+        batch_size=filters.batchSize,
+        limit=filters.limit
+    )
+    
+    # A disconnect cancels the await, not the worker thread still inside next();
+    # the lock makes close() wait for it instead of hitting a running generator
+    lock = threading.Lock()
+    
+    def next_chunk():
+        with lock:
+            return next(chunks, None)
+    
+    def close():
+        with lock:
+            chunks.close()
+    
+    async def stream():
+        # One worker-thread hop per batch; the Mongo cursor never blocks the loop
+        try:
+            while True:
+                try:
+                    chunk = await run_db(next_chunk)
+                except PyMongoError:
+                    # Headers are already sent; end the stream, the client resumes from its last _id
+                    logger.exception("Question export failed mid-stream")
+                    break
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            # Shielded so a cancelled request still closes the cursor
+            with CancelScope(shield=True):
+                await run_db(close)
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@router.get("/questions/pool/stats")
+async def get_question_pool_stats():
+    """Hit rate and size of the prefetched question pools"""
+    if not config.QUESTION_POOL_ENABLED:
+        return {"status": "success", "pool": {"enabled": False}}
+    return {"status": "success", "pool": question_pool.stats()}
+
+@router.get("/questions/index/stats")
+async def get_question_index_stats():
+    """Hit counts and size of the in-memory question index"""
+    return {"status": "success", "index": question_index.stats()}
@@ -1,15 +1,13 @@
+import asyncio
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field
 from typing import List, Optional, Literal
-from google import genai
-from google.genai import types
-import os
+from config import config
+from routes_ai.llm import generate_review, review_cache_key
+from routes_ai.review_engine import ground_insights, needs_llm, rule_based_insights, wrong_questions
 
 router = APIRouter(prefix="/api/practice", tags=["ai-review"])
 
-# Initialize client
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-
 # --- 1. KEEPING YOUR EXACT INPUT SCHEMA ---
 class Question(BaseModel):
     questionText: str
@@ -29,6 +27,7 @@ class AIReviewRequest(BaseModel):
 class InsightItem(BaseModel):
     category: str = Field(description="Short category name (e.g., Knowledge Gap)")
     message: str = Field(description="Actionable advice under 2 sentences")
+    questionNumber: Optional[int] = Field(default=None, description="Number of the listed mistake this insight explains")
 
 class ReviewResponseSchema(BaseModel):
     insights: List[InsightItem]
@@ -36,17 +35,22 @@ class ReviewResponseSchema(BaseModel):
 @router.post("/ai-review")
 async def ai_review(request: AIReviewRequest):
     try:
+        # Tier 1: nothing wrong to explain -> instant rule-based insights
+        if not needs_llm(request):
+            return {"status": "success", "insights": rule_based_insights(request)}
+
+        # Tier 2: the LLM explains the mistakes
         # Prepare the context for the AI
         attempted = request.correctAnswers + request.wrongAnswers
         accuracy = (request.correctAnswers / attempted * 100) if attempted > 0 else 0
         
         # We format the string to be more descriptive for the AI, 
         # but this does not change the API input/output.
-        wrong_qs = [q for q in request.questions if q.status == 'wrong'][:3]
+        wrong_qs = wrong_questions(request)
         wrong_text = "\n".join([
-            f"Q: {q.questionText[:100]}...\n   User Chose: '{q.userAnswer}' (Incorrect)\n   Correct: '{q.correctAnswer}'"
-            for q in wrong_qs
-        ]) if wrong_qs else "No wrong answers available."
+            f"{n}. Q: {q.questionText[:100]}...\n   User Chose: '{q.userAnswer}' (Incorrect)\n   Correct: '{q.correctAnswer}'"
+            for n, q in enumerate(wrong_qs, 1)
+        ]) if wrong_qs else f"{request.wrongAnswers} wrong answers; the questions were not included."
         
         # High-performance prompt
         prompt = f"""
@@ -57,33 +61,35 @@ async def ai_review(request: AIReviewRequest):
         {wrong_text}
 
         TASK:
-        Provide exactly 2 actionable insights. 
-        If specific mistakes are listed above, explain the concept the user missed (a 'micro-lesson').
-        If no specific mistakes, provide general strategy advice.
+        Provide exactly 2 actionable insights.
+        If specific mistakes are listed above, the first must explain the concept behind
+        one of them (a 'micro-lesson'); set its questionNumber to that mistake's number.
+        If no specific mistakes are listed, provide strategy advice to improve accuracy.
 
         Constraint: Keep messages short (under 30 words).
         """
 
-        # Call Gemini with strict schema enforcement (Disables "thinking"/chatty filler)
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                response_mime_type="application/json",
-                response_schema=ReviewResponseSchema,
-                temperature=0.3,
-            )
-        )
-
-        # Parse the structured response
-        # We handle both raw text and parsed object for SDK safety
-        if hasattr(response, 'parsed'):
-            result = response.parsed
-        else:
-            result = ReviewResponseSchema.model_validate_json(response.text)
+        # Async, concurrency-limited and cached LLM call (see routes_ai/llm.py)
+        key = review_cache_key(accuracy, request.skippedQuestions, [
+            {"q": q.questionText[:100], "user": q.userAnswer, "correct": q.correctAnswer}
+            for q in wrong_qs
+        ])
+        # Past the deadline, answer with the rule-based insights; the LLM call keeps
+        # running in the background and lands in the review cache for the next request
+        deadline = config.AI_REVIEW_DEADLINE_MS / 1000 if config.AI_REVIEW_DEADLINE_MS > 0 else None
+        try:
+            result = await asyncio.wait_for(generate_review(key, prompt, ReviewResponseSchema), deadline)
+        except asyncio.TimeoutError:
+            print("AI Review: LLM missed the deadline, serving rule-based insights")
+            return {"status": "success", "insights": rule_based_insights(request)}
+        except ValueError as e:
+            # Output that doesn't fit ReviewResponseSchema (pydantic's ValidationError is a ValueError)
+            print(f"AI Review: unparseable LLM output, serving rule-based insights: {e}")
+            return {"status": "success", "insights": rule_based_insights(request)}
 
-        # Convert back to simple dicts to match your original output format
-        final_insights = [i.model_dump() for i in result.insights]
+        # Convert back to simple dicts to match your original output format,
+        # tied to the mistakes they explain (see review_engine.ground_insights)
+        final_insights = ground_insights(request, [i.model_dump() for i in result.insights])
 
         # Fallback if AI returns fewer than 2 items (rare with schema enforcement)
         if len(final_insights) < 2:
@@ -0,0 +1,127 @@
+"""Async LLM access for AI review: pluggable provider, concurrency cap, timeout and cache"""
+import asyncio
+import hashlib
+import json
+from typing import Any, Dict, List, Optional, Type
+from pydantic import BaseModel
+from config import config
+from metrics import stage
+from utils.cache import TTLCache
+
+class GeminiProvider:
+    """Google Gemini through the SDK's native async client"""
+
+    def __init__(self, api_key: Optional[str], model: str):
+        self.api_key = api_key
+        self.model = model
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            from google import genai
+            self._client = genai.Client(api_key=self.api_key)
+        return self._client
+
+    async def generate(self, prompt: str, schema: Type[BaseModel]) -> BaseModel:
+        from google.genai import types
+
+        # Strict schema enforcement (disables "thinking"/chatty filler)
+        response = await self._get_client().aio.models.generate_content(
+            model=self.model,
+            contents=prompt,
+            config=types.GenerateContentConfig(
+                response_mime_type="application/json",
+                response_schema=schema,
+                temperature=0.3,
+            )
+        )
+        # Handle both the parsed object and raw text for SDK safety
+        if getattr(response, "parsed", None) is not None:
+            return response.parsed
+        return schema.model_validate_json(response.text)
+
+class StubProvider:
+    """Deterministic offline provider for tests and local development"""
+
+    def __init__(self, response: Optional[Dict[str, Any]] = None, delay: float = 0.0):
+        self.response = response or {
+            "insights": [
+                {"category": "Knowledge Gap", "message": "Review the concept behind this question before retrying.", "questionNumber": 1},
+                {"category": "Strategy", "message": "Attempt every question; skipped ones can't earn marks."}
+            ]
+        }
+        self.delay = delay
+        self.calls = 0
+
+    async def generate(self, prompt: str, schema: Type[BaseModel]) -> BaseModel:
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return schema.model_validate(self.response)
+
+PROVIDERS = {
+    "gemini": lambda: GeminiProvider(config.GEMINI_API_KEY, config.AI_REVIEW_MODEL),
+    "stub": StubProvider,
+}
+
+_provider = None
+_semaphore = None
+_review_cache = TTLCache(max_size=config.AI_REVIEW_CACHE_MAX_SIZE, ttl=config.AI_REVIEW_CACHE_TTL_SECONDS)
+# cache key -> in-flight call, so identical concurrent requests share one LLM call
+_inflight: Dict[str, asyncio.Task] = {}
+
+def get_provider():
+    global _provider
+    if _provider is None:
+        if config.AI_REVIEW_PROVIDER not in PROVIDERS:
+            raise ValueError(f"Unknown AI_REVIEW_PROVIDER: {config.AI_REVIEW_PROVIDER}")
+        _provider = PROVIDERS[config.AI_REVIEW_PROVIDER]()
+    return _provider
+
+def set_provider(provider):
+    """Swap the provider (e.g. a StubProvider in tests) and drop cached reviews"""
+    global _provider
+    _provider = provider
+    _review_cache.clear()
+
+def review_cache_key(accuracy: float, skipped: int, wrong_answers: List[Dict[str, Any]]) -> str:
+    """Normalized hash of what the review depends on.
+
+    Accuracy is bucketed to AI_REVIEW_ACCURACY_BUCKET percent and question
+    texts/answers are whitespace-normalized and casefolded, so trivially
+    different requests share a cached review.
+    """
+    bucket = int(accuracy // config.AI_REVIEW_ACCURACY_BUCKET) if config.AI_REVIEW_ACCURACY_BUCKET > 0 else accuracy
+    normalized = [
+        {k: " ".join(str(v or "").split()).casefold() for k, v in answer.items()}
+        for answer in wrong_answers
+    ]
+    payload = json.dumps([bucket, skipped, normalized], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+async def _call(prompt: str, schema: Type[BaseModel]) -> BaseModel:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(config.AI_REVIEW_MAX_CONCURRENCY)
+    async with _semaphore:
+        with stage("gemini"):
+            return await get_provider().generate(prompt, schema)
+
+async def generate_review(key: str, prompt: str, schema: Type[BaseModel]) -> BaseModel:
+    """Cached, concurrency-limited LLM call; the timeout covers queueing for a slot too"""
+    cached = _review_cache.get(key)
+    if cached is not None:
+        return cached
+
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(asyncio.wait_for(_call(prompt, schema), config.AI_REVIEW_TIMEOUT_SECONDS))
+        _inflight[key] = task
+        task.add_done_callback(lambda t: _finish(key, t))
+    # Shield: one caller disconnecting must not cancel the call others wait on
+    return await asyncio.shield(task)
+
+def _finish(key: str, task: asyncio.Task):
+    _inflight.pop(key, None)
+    if not task.cancelled() and task.exception() is None:
+        _review_cache.set(key, task.result())
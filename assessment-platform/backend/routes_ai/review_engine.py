@@ -0,0 +1,103 @@
+"""Rule-based review tier: instant insights computed from the attempt's stats"""
+from typing import Any, Dict, List, Optional
+
+def wrong_questions(request, limit: Optional[int] = 3) -> List[Any]:
+    return [q for q in request.questions if q.status == 'wrong'][:limit]
+
+def wrong_count(request) -> int:
+    """Wrong answers in the attempt; the question list may hold only some of them"""
+    return max(request.wrongAnswers, len(wrong_questions(request, limit=None)))
+
+def needs_llm(request) -> bool:
+    """Only real mistakes are worth an LLM round trip; everything else is rule-based"""
+    return wrong_count(request) > 0
+
+def _shorten(text: str, length: int = 60) -> str:
+    text = " ".join(str(text or "").split())
+    return text if len(text) <= length else text[:length - 3].rstrip() + "..."
+
+def rule_based_insights(request) -> List[Dict[str, str]]:
+    """Exactly 2 insights in the same shape the LLM tier returns.
+
+    Used on its own when there are no wrong answers to explain, and as the
+    fallback when the LLM misses AI_REVIEW_DEADLINE_MS or answers with nothing usable.
+    """
+    total = request.totalQuestions or len(request.questions)
+    skipped = request.skippedQuestions
+    wrong = wrong_count(request)
+    attempted = max(request.correctAnswers + request.wrongAnswers, wrong)
+    accuracy = (request.correctAnswers / attempted * 100) if attempted > 0 else 0
+    skip_rate = (skipped / total * 100) if total > 0 else 0
+    insights = []
+
+    wrong_qs = wrong_questions(request, limit=1)
+    if wrong_qs:
+        q = wrong_qs[0]
+        insights.append({
+            "category": "Knowledge Gap",
+            "message": f"Revisit \"{_shorten(q.questionText)}\": the answer is '{_shorten(q.correctAnswer, 40)}'. Review the concept behind it before retrying."
+        })
+    elif wrong:
+        insights.append({
+            "category": "Knowledge Gap",
+            "message": f"{wrong} of {attempted} attempted answers were wrong. Review the concepts behind them before retrying."
+        })
+    elif total == 0:
+        insights.append({
+            "category": "Practice",
+            "message": "No answers were recorded for this attempt. Complete a practice test to get personalised insights."
+        })
+    elif attempted == 0:
+        insights.append({
+            "category": "Confidence Issue",
+            "message": f"You skipped all {skipped or total} questions. Attempt each one, even a best guess shows what you know."
+        })
+    else:
+        insights.append({
+            "category": "Strong Performance",
+            "message": f"All {attempted} attempted answers were correct. Your grasp of these topics is solid."
+        })
+
+    if attempted and skipped and insights[0]["category"] != "Confidence Issue":
+        insights.append({
+            "category": "Confidence Issue",
+            "message": f"You skipped {skipped} of {total} questions ({skip_rate:.0f}%). Attempt every question; skipped ones can't earn marks."
+        })
+    elif wrong:
+        insights.append({
+            "category": "Topic Weakness",
+            "message": f"Accuracy was {accuracy:.0f}% on attempted questions. Redo the ones you missed before moving on."
+        })
+    elif attempted == 0:
+        insights.append({
+            "category": "Practice",
+            "message": "Start with easier questions in this topic to build momentum."
+        })
+    else:
+        insights.append({
+            "category": "Practice",
+            "message": "Try a harder difficulty level to keep improving."
+        })
+
+    return insights
+
+def ground_insights(request, insights: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """Tie LLM insights to the mistakes they explain.
+
+    Insights naming a listed mistake (questionNumber) are prefixed with that
+    question; an out-of-range questionNumber is ignored and the insight kept
+    as general advice. Only an answer with no usable insight at all is
+    replaced by the rule-based insights.
+    """
+    wrong_qs = wrong_questions(request)
+    grounded = []
+    for insight in insights:
+        category = str(insight.get("category") or "").strip()
+        message = str(insight.get("message") or "").strip()
+        if not category or not message:
+            continue
+        number = insight.get("questionNumber")
+        if isinstance(number, int) and 1 <= number <= len(wrong_qs):
+            message = f"\"{_shorten(wrong_qs[number - 1].questionText)}\": {message}"
+        grounded.append({"category": category, "message": message})
+    return grounded or rule_based_insights(request)
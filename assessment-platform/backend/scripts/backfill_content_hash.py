@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""Compute questions.contentHash, the server-side dedup key used by fetch_questions.
+
+Only questions without a hash are touched unless --all is given, so the
+script can run repeatedly (e.g. from cron) to pick up new questions.
+
+    python scripts/backfill_content_hash.py --batch-size 1000
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import UpdateOne  # noqa: E402
+from db import get_db, close_db  # noqa: E402
+from utils.content_hash import content_hash  # noqa: E402
+
+
+def backfill(batch_size, recompute_all=False):
+    collection = get_db()["questions"]
+    query = {} if recompute_all else {"contentHash": {"$exists": False}}
+    cursor = collection.find(query, {"_id": 1, "question.body.text": 1}).batch_size(batch_size)
+
+    updated = 0
+    ops = []
+    for doc in cursor:
+        text = (doc.get("question") or {}).get("body", {}).get("text") or ""
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"contentHash": content_hash(text)}}))
+        if len(ops) >= batch_size:
+            updated += collection.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        updated += collection.bulk_write(ops, ordered=False).modified_count
+
+    collection.create_index("contentHash", name="content_hash")
+    return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill questions.contentHash")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--all", action="store_true", help="Recompute hashes for every question")
+    args = parser.parse_args()
+
+    try:
+        updated = backfill(args.batch_size, args.all)
+    finally:
+        close_db()
+    print(f"Updated {updated} questions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""Create the recommended indexes and check query plans for every build_match_filter shape.
+
+Each filter shape (course only, +subject, topics, subtopics, topics OR
+subtopics) is explained as a plain match, a randomKey seek and a newest
+sort. The script reports keys examined vs. documents returned and exits
+non-zero if any plan falls back to a COLLSCAN, so it can gate deploys.
+
+    python scripts/ensure_indexes.py                  # create indexes, then check plans
+    python scripts/ensure_indexes.py --check-only     # only check plans
+    python scripts/ensure_indexes.py --max-ratio 50   # also fail on poorly selective plans
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import get_db, close_db  # noqa: E402
+from indexes import ensure_indexes  # noqa: E402
+from service import build_match_filter  # noqa: E402
+
+
+def _find_sample_tag(db, args):
+    """Ids to build the filter shapes from: CLI arguments, else a real tagged question"""
+    if args.course_id:
+        return {
+            "course_id": args.course_id,
+            "subject_id": args.subject_id,
+            "topic_id": args.topic_id,
+            "subtopic_id": args.subtopic_id,
+            "type": args.type,
+            "difficulty": args.difficulty,
+        }
+
+    question = db["questions"].find_one(
+        {"isPublic": True, "tags.topic_id": {"$exists": True}, "tags.subtopic_id": {"$exists": True}},
+        {"tags": 1, "type": 1, "meta.difficulty": 1},
+    ) or db["questions"].find_one({"isPublic": True}, {"tags": 1, "type": 1, "meta.difficulty": 1})
+    if not question or not question.get("tags"):
+        return None
+
+    tag = question["tags"][0]
+    return {
+        "course_id": str(tag["course_id"]),
+        "subject_id": str(tag["subject_id"]) if tag.get("subject_id") else None,
+        "topic_id": str(tag["topic_id"]) if tag.get("topic_id") else None,
+        "subtopic_id": str(tag["subtopic_id"]) if tag.get("subtopic_id") else None,
+        "type": question.get("type", 0),
+        "difficulty": question.get("meta", {}).get("difficulty", 0),
+    }
+
+
+def filter_shapes(sample):
+    """Every filter shape build_match_filter can produce, as QuestionFilters dicts"""
+    base = {
+        "courseId": sample["course_id"],
+        "type": sample["type"],
+        "difficulty": sample["difficulty"],
+        "topicIds": [],
+        "subtopicIds": [],
+    }
+    topics = [sample["topic_id"]] if sample["topic_id"] else []
+    subtopics = [sample["subtopic_id"]] if sample["subtopic_id"] else []
+
+    shapes = {"course": base}
+    if sample["subject_id"]:
+        shapes["course+subject"] = {**base, "subjectId": sample["subject_id"]}
+    if topics:
+        shapes["subject+topics"] = {**base, "subjectId": sample["subject_id"], "topicIds": topics}
+        shapes["course+topics"] = {**base, "topicIds": topics}
+    if subtopics:
+        shapes["subject+subtopics"] = {**base, "subjectId": sample["subject_id"], "subtopicIds": subtopics}
+    if topics and subtopics:
+        shapes["subject+topics|subtopics"] = {
+            **base, "subjectId": sample["subject_id"], "topicIds": topics, "subtopicIds": subtopics
+        }
+    return shapes
+
+
+def _stages(plan):
+    """Yield every stage name in an explain plan tree (classic and SBE layouts)"""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _stages(value)
+
+
+def explain(collection, match, sort=None):
+    cursor = collection.find(match, {"_id": 1})
+    if sort:
+        cursor = cursor.sort(sort).limit(25)
+    plan = cursor.explain()
+    stats = plan.get("executionStats", {})
+    stages = set(_stages(plan.get("queryPlanner", {}).get("winningPlan", {})))
+    return {
+        "collscan": "COLLSCAN" in stages,
+        "keys": stats.get("totalKeysExamined", 0),
+        "docs": stats.get("totalDocsExamined", 0),
+        "returned": stats.get("nReturned", 0),
+    }
+
+
+def check_plans(db, sample, max_ratio=None):
+    collection = db["questions"]
+    failures = []
+    print(f"{'shape':<28} {'variant':<10} {'plan':<9} {'keys':>9} {'docs':>9} {'returned':>9}")
+
+    for name, filters in filter_shapes(sample).items():
+        match = build_match_filter(filters)
+        variants = {
+            "match": (match, None),
+            "randomKey": ({**match, "randomKey": {"$gte": 0.5}}, [("randomKey", 1)]),
+            "newest": (match, [("createdAt", -1), ("_id", -1)]),
+        }
+        for variant, (query, sort) in variants.items():
+            result = explain(collection, query, sort)
+            plan = "COLLSCAN" if result["collscan"] else "IXSCAN"
+            print(
+                f"{name:<28} {variant:<10} {plan:<9} "
+                f"{result['keys']:>9} {result['docs']:>9} {result['returned']:>9}"
+            )
+            if result["collscan"]:
+                failures.append(f"{name}/{variant}: COLLSCAN")
+            elif max_ratio and result["keys"] > max_ratio * max(result["returned"], 1):
+                failures.append(
+                    f"{name}/{variant}: examined {result['keys']} keys for {result['returned']} documents"
+                )
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create indexes and check question query plans")
+    parser.add_argument("--check-only", action="store_true", help="Don't create indexes")
+    parser.add_argument("--skip-check", action="store_true", help="Don't explain query plans")
+    parser.add_argument(
+        "--max-ratio",
+        type=float,
+        default=None,
+        help="Fail when keys examined exceed this multiple of documents returned",
+    )
+    parser.add_argument("--course-id", help="Course ObjectId for the filter shapes (default: from a sample question)")
+    parser.add_argument("--subject-id")
+    parser.add_argument("--topic-id")
+    parser.add_argument("--subtopic-id")
+    parser.add_argument("--type", type=int, default=0)
+    parser.add_argument("--difficulty", type=int, default=0)
+    args = parser.parse_args()
+
+    try:
+        db = get_db()
+        if not args.check_only:
+            for collection, names in ensure_indexes(db).items():
+                print(f"{collection}: {', '.join(names) if names else 'default _id index only'}")
+        if args.skip_check:
+            return
+
+        sample = _find_sample_tag(db, args)
+        if sample is None:
+            print("No tagged public question found; pass --course-id to check plans", file=sys.stderr)
+            sys.exit(1)
+
+        failures = check_plans(db, sample, args.max_ratio)
+    finally:
+        close_db()
+
+    if failures:
+        print("\nQuery plan regressions:", file=sys.stderr)
+        for failure in failures:
+            print(f"  {failure}", file=sys.stderr)
+        sys.exit(1)
+    print("\nAll filter shapes use an index")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""Maintain questions_rendered, the render-ready copy of questions served when
+RENDERED_QUESTIONS_ENABLED is set.
+
+Each rendered document holds the projected fields (no html) with
+<tm-asset> references already rewritten to <img> tags and topic/subtopic
+names attached, plus the selection fields (isPublic, type, difficulty, tags,
+randomKey, createdAt) and assetIds, the assets it references.
+
+An incremental run re-renders questions with a newer _id or updatedAt, and
+every question referencing an asset or topic whose updatedAt moved. The
+watermarks are stored in the materializations collection; with none stored
+yet (first run, or the state was dropped) it does a full build instead. --watch follows a
+change stream instead (needs a replica set), which also sees hard deletes;
+otherwise run --prune now and then to drop questions that no longer exist.
+
+    python scripts/materialize_questions.py --full     # (re)build everything
+    python scripts/materialize_questions.py            # incremental (full on first run), e.g. every minute from cron
+    python scripts/materialize_questions.py --prune    # incremental + drop deleted questions
+    python scripts/materialize_questions.py --watch    # incremental, then follow changes
+"""
+
+import argparse
+import datetime
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import DeleteOne, ReplaceOne  # noqa: E402
+from db import get_db, close_db  # noqa: E402
+from indexes import INDEXES  # noqa: E402
+from service import QUESTION_PROJECTION, RENDERED_COLLECTION, resolve_question_content  # noqa: E402
+from utils.asset_resolver import find_asset_ids, invalidate_asset_cache  # noqa: E402
+from utils.taxonomy import invalidate_taxonomy_cache  # noqa: E402
+
+STATE_COLLECTION = "materializations"
+
+SOURCE_PROJECTION = {
+    **QUESTION_PROJECTION,
+    "isPublic": 1,
+    "tags": 1,
+    "randomKey": 1,
+    "createdAt": 1,
+    "updatedAt": 1,
+}
+
+
+class Watermarks:
+    """Newest _id/updatedAt processed per source collection"""
+
+    def __init__(self, db):
+        self.db = db
+        stored = db[STATE_COLLECTION].find_one({"_id": RENDERED_COLLECTION})
+        self.stored = stored is not None
+        self.state = stored or {"_id": RENDERED_COLLECTION}
+
+    def since(self, source, by_id=False):
+        """Query for documents changed after the stored watermark"""
+        updated = self.state.get(f"{source}UpdatedAt")
+        # Until some document carries updatedAt, any that gets one is new to us
+        clauses = [{"updatedAt": {"$gt": updated} if updated is not None else {"$exists": True}}]
+        if by_id and self.state.get(f"{source}MaxId") is not None:
+            clauses.append({"_id": {"$gt": self.state[f"{source}MaxId"]}})
+        return {"$or": clauses}
+
+    def advance(self, source, doc, by_id=False):
+        key = f"{source}UpdatedAt"
+        if doc.get("updatedAt") is not None and (self.state.get(key) is None or doc["updatedAt"] > self.state[key]):
+            self.state[key] = doc["updatedAt"]
+        key = f"{source}MaxId"
+        if by_id and (self.state.get(key) is None or doc["_id"] > self.state[key]):
+            self.state[key] = doc["_id"]
+
+    def save(self):
+        self.state["materializedAt"] = datetime.datetime.now(datetime.timezone.utc)
+        self.db[STATE_COLLECTION].replace_one({"_id": RENDERED_COLLECTION}, self.state, upsert=True)
+
+
+def render(docs):
+    """Source documents -> questions_rendered documents (one asset and one topic lookup per batch)"""
+    asset_ids = [find_asset_ids(doc) for doc in docs]
+    resolve_question_content(docs)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    for doc, ids in zip(docs, asset_ids):
+        doc["assetIds"] = ids
+        doc["sourceUpdatedAt"] = doc.pop("updatedAt", None)
+        doc["renderedAt"] = now
+    return docs
+
+
+def materialize(db, query, batch_size, watermarks=None):
+    """Render every question matching query into questions_rendered"""
+    rendered = db[RENDERED_COLLECTION]
+    cursor = db["questions"].find(query, SOURCE_PROJECTION).batch_size(batch_size)
+
+    written = 0
+    batch = []
+    for doc in cursor:
+        if watermarks:
+            watermarks.advance("questions", doc, by_id=True)
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            written += _write(rendered, render(batch))
+            batch = []
+    if batch:
+        written += _write(rendered, render(batch))
+    return written
+
+
+def _write(rendered, docs):
+    rendered.bulk_write([ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in docs], ordered=False)
+    return len(docs)
+
+
+def rerender(db, ids, batch_size):
+    """Re-render the given question ids (their source may have been deleted meanwhile)"""
+    ids = list(ids)
+    written = 0
+    for start in range(0, len(ids), batch_size):
+        written += materialize(db, {"_id": {"$in": ids[start:start + batch_size]}}, batch_size)
+    return written
+
+
+def dependents(db, asset_ids=(), topic_ids=()):
+    """Rendered questions that embed one of the assets or topic names"""
+    clauses = []
+    if asset_ids:
+        clauses.append({"assetIds": {"$in": list(asset_ids)}})
+    if topic_ids:
+        topic_ids = list(topic_ids)
+        clauses += [{"tags.topic_id": {"$in": topic_ids}}, {"tags.subtopic_id": {"$in": topic_ids}}]
+    if not clauses:
+        return []
+    return [doc["_id"] for doc in db[RENDERED_COLLECTION].find({"$or": clauses}, {"_id": 1})]
+
+
+def _changed(db, source, watermarks):
+    changed = []
+    for doc in db[source].find(watermarks.since(source), {"_id": 1, "updatedAt": 1}):
+        watermarks.advance(source, doc)
+        changed.append(doc["_id"])
+    return changed
+
+
+def incremental(db, batch_size):
+    """Bring questions_rendered up to date with questions, assets and topics.
+
+    Without stored watermarks the since() queries would only see documents
+    carrying updatedAt, leaving most questions unrendered, so this falls
+    back to a full build.
+    """
+    watermarks = Watermarks(db)
+    if not watermarks.stored:
+        print("No stored watermarks; running a full build")
+        return {**full(db, batch_size), "full": True}
+    questions = materialize(db, watermarks.since("questions", by_id=True), batch_size, watermarks)
+
+    assets = _changed(db, "assets", watermarks)
+    topics = _changed(db, "topics", watermarks)
+    if assets:
+        invalidate_asset_cache()
+    if topics:
+        invalidate_taxonomy_cache()
+    # Rendered assetIds are strings, as they appear in <tm-asset id="...">
+    dependent = rerender(db, dependents(db, [str(aid) for aid in assets], topics), batch_size)
+
+    watermarks.save()
+    return {"questions": questions, "assets": len(assets), "topics": len(topics), "dependents": dependent}
+
+
+def full(db, batch_size):
+    """Render every question and reset the watermarks"""
+    db[STATE_COLLECTION].delete_one({"_id": RENDERED_COLLECTION})
+    watermarks = Watermarks(db)
+    questions = materialize(db, {}, batch_size, watermarks)
+    # Everything was just rendered with current assets and topics
+    _changed(db, "assets", watermarks)
+    _changed(db, "topics", watermarks)
+    watermarks.save()
+    return {"questions": questions}
+
+
+def prune(db, batch_size):
+    """Delete rendered questions whose source question no longer exists"""
+    rendered = db[RENDERED_COLLECTION]
+    deleted = 0
+    batch = []
+    for doc in rendered.find({}, {"_id": 1}).batch_size(batch_size):
+        batch.append(doc["_id"])
+        if len(batch) >= batch_size:
+            deleted += _prune_batch(db, batch)
+            batch = []
+    if batch:
+        deleted += _prune_batch(db, batch)
+    return deleted
+
+
+def _prune_batch(db, ids):
+    existing = {doc["_id"] for doc in db["questions"].find({"_id": {"$in": ids}}, {"_id": 1})}
+    gone = [DeleteOne({"_id": qid}) for qid in ids if qid not in existing]
+    if gone:
+        db[RENDERED_COLLECTION].bulk_write(gone, ordered=False)
+    return len(gone)
+
+
+def watch(db, batch_size):
+    """Apply question, asset and topic changes as they happen (runs until interrupted)"""
+    pipeline = [{"$match": {"ns.coll": {"$in": ["questions", "assets", "topics"]}}}]
+    with db.watch(pipeline) as stream:
+        for change in stream:
+            source = change["ns"]["coll"]
+            doc_id = change.get("documentKey", {}).get("_id")
+            if doc_id is None:
+                continue
+            if source == "questions":
+                if change["operationType"] == "delete":
+                    db[RENDERED_COLLECTION].delete_one({"_id": doc_id})
+                else:
+                    rerender(db, [doc_id], batch_size)
+            elif source == "assets":
+                invalidate_asset_cache()
+                rerender(db, dependents(db, asset_ids=[str(doc_id)]), batch_size)
+            else:
+                invalidate_taxonomy_cache()
+                rerender(db, dependents(db, topic_ids=[doc_id]), batch_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the questions_rendered collection")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--full", action="store_true", help="Re-render every question")
+    parser.add_argument("--prune", action="store_true", help="Also delete rendered questions that no longer exist")
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="After catching up, follow a change stream (needs a replica set)",
+    )
+    args = parser.parse_args()
+
+    db = get_db()
+    try:
+        db[RENDERED_COLLECTION].create_indexes(INDEXES[RENDERED_COLLECTION])
+        result = full(db, args.batch_size) if args.full else incremental(db, args.batch_size)
+        if args.prune or args.full or result.get("full"):
+            result["pruned"] = prune(db, args.batch_size)
+        print(result)
+        if args.watch:
+            watch(db, args.batch_size)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        close_db()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""Assign questions.randomKey, the sort key used by SELECTION_STRATEGY=randomKey.
+
+A full refresh reshuffles every key so the same neighbours don't keep being
+served together; run it periodically (e.g. nightly). --missing-only is cheap
+and meant to run often so newly added questions become selectable.
+
+    python scripts/refresh_random_keys.py
+    python scripts/refresh_random_keys.py --missing-only
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import get_db, close_db  # noqa: E402
+from indexes import RANDOM_KEY_INDEX  # noqa: E402
+
+
+def refresh(missing_only=False):
+    collection = get_db()["questions"]
+    query = {"randomKey": {"$exists": False}} if missing_only else {}
+    # Pipeline update: the server draws the random values, nothing crosses the wire
+    result = collection.update_many(query, [{"$set": {"randomKey": {"$rand": {}}}}])
+    collection.create_index(RANDOM_KEY_INDEX, name="selection_random_key")
+    return result.modified_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh questions.randomKey")
+    parser.add_argument(
+        "--missing-only",
+        action="store_true",
+        help="Only assign keys to questions that don't have one yet",
+    )
+    args = parser.parse_args()
+
+    try:
+        updated = refresh(args.missing_only)
+    finally:
+        close_db()
+    print(f"Updated {updated} questions")
+
+
+if __name__ == "__main__":
+    main()
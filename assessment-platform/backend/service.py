@@ -1,20 +1,16 @@
+import asyncio
+import random
 from bson import ObjectId
-from typing import List, Dict, Any
-from db import get_db
+from typing import List, Dict, Any, Iterator, Optional, Sequence, Tuple
+from db import get_db, run_db
 from config import config
 from enums import QuestionType, Difficulty
-from utils.asset_resolver import resolve_assets_in_question
-
-def convert_objectids(obj):
-    """Recursively convert ObjectId to string and remove html fields"""
-    if isinstance(obj, ObjectId):
-        return str(obj)
-    elif isinstance(obj, dict):
-        # Remove 'html' key if present
-        return {k: convert_objectids(v) for k, v in obj.items() if k != 'html'}
-    elif isinstance(obj, list):
-        return [convert_objectids(item) for item in obj]
-    return obj
+from utils.asset_resolver import resolve_assets_in_questions
+from utils.serialization import dumps
+from utils.taxonomy import attach_topic_names
+from session_store import session_store
+from question_index import question_index
+from metrics import stage
 
 def build_match_filter(filters: Dict[str, Any]) -> Dict[str, Any]:
     """Build MongoDB match filter based on drona.md logic"""
@@ -48,92 +44,225 @@ def build_match_filter(filters: Dict[str, Any]) -> Dict[str, Any]:
     match["tags"] = {"$elemMatch": tag_match}
     return match
 
-def fetch_questions(filters: Dict[str, Any], limit: int) -> List[Dict[str, Any]]:
-    """Fetch questions from MongoDB with filters"""
-    db = get_db()
-    collection = db["questions"]
-    
-    match = build_match_filter(filters)
-    
-    # Projection: Return required fields WITHOUT html
-    projection = {
-        "_id": 1,
-        "type": 1,
-        "question.body.text": 1,
-        "question.body.latexes.latex": 1,
-        "question.body.latexes._id": 1,
-        "question.options.d.text": 1,
-        "question.options.d.latexes.latex": 1,
-        "question.options.d.latexes._id": 1,
-        "question.options.v": 1,
-        "answer.answer": 1,
-        "answer.explanation.text": 1,
-        "answer.explanation.latexes.latex": 1,
-        "answer.explanation.latexes._id": 1,
-        "meta.difficulty": 1,
-        "tags": 1  # Include tags for topic name resolution
-    }
-    
-    # Fetch more to account for potential duplicates
-    fetch_limit = limit * 3
+# Projection: Return required fields WITHOUT html
+QUESTION_PROJECTION = {
+    "_id": 1,
+    "type": 1,
+    "question.body.text": 1,
+    "question.body.latexes.latex": 1,
+    "question.body.latexes._id": 1,
+    "question.options.d.text": 1,
+    "question.options.d.latexes.latex": 1,
+    "question.options.d.latexes._id": 1,
+    "question.options.v": 1,
+    "answer.answer": 1,
+    "answer.explanation.text": 1,
+    "answer.explanation.latexes.latex": 1,
+    "answer.explanation.latexes._id": 1,
+    "meta.difficulty": 1,
+    "tags": 1,  # Include tags for topic name resolution
+    "contentHash": 1  # Dedup key, stripped before the response
+}
+
+# Written by scripts/materialize_questions.py: the projected fields with
+# assets already resolved and topic names attached, plus the selection fields
+RENDERED_COLLECTION = "questions_rendered"
+RENDERED_PROJECTION = {**QUESTION_PROJECTION, "topicName": 1, "subtopicName": 1}
+
+def question_source() -> Tuple[str, Dict[str, Any]]:
+    """Collection to select from and its projection (RENDERED_QUESTIONS_ENABLED picks questions_rendered)"""
+    if config.RENDERED_QUESTIONS_ENABLED:
+        return RENDERED_COLLECTION, RENDERED_PROJECTION
+    return "questions", QUESTION_PROJECTION
+
+def build_selection_pipeline(
+    match: Dict[str, Any],
+    size: int,
+    collection: str = "questions",
+    projection: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """Build the selection pipeline; duplicates are collapsed server-side before projection"""
+    match = {"question.body.text": {"$nin": [None, ""]}, **match}
     
     if config.SELECTION_STRATEGY == "newest":
-        pipeline = [
+        selection = [
             {"$match": match},
             {"$sort": {"createdAt": -1, "_id": -1}},
-            {"$limit": fetch_limit},
-            {"$project": projection}
+            {"$limit": size}
+        ]
+    elif config.SELECTION_STRATEGY == "randomKey":
+        # Indexed range seek from a random pivot over the precomputed randomKey,
+        # wrapping around to the start of the key range when the tail runs short.
+        # $unionWith is only pulled from if the first branch yields < size docs.
+        pivot = random.random()
+        selection = [
+            {"$match": {**match, "randomKey": {"$gte": pivot}}},
+            {"$sort": {"randomKey": 1}},
+            {"$limit": size},
+            {"$unionWith": {"coll": collection, "pipeline": [
+                {"$match": {**match, "randomKey": {"$lt": pivot}}},
+                {"$sort": {"randomKey": 1}},
+                {"$limit": size}
+            ]}},
+            {"$limit": size}
         ]
     else:
-        pipeline = [
+        selection = [
             {"$match": match},
-            {"$sample": {"size": fetch_limit}},
-            {"$project": projection}
+            {"$sample": {"size": size}}
         ]
     
-    questions = list(collection.aggregate(
-        pipeline,
-        allowDiskUse=True,
-        maxTimeMS=config.QUERY_TIMEOUT_MS
-    ))
+    # Questions without a precomputed contentHash fall back to exact body text
+    dedup = [
+        {"$group": {
+            "_id": {"$ifNull": ["$contentHash", "$question.body.text"]},
+            "doc": {"$first": "$$ROOT"}
+        }},
+        {"$replaceRoot": {"newRoot": "$doc"}}
+    ]
+    if config.SELECTION_STRATEGY == "newest":
+        dedup.append({"$sort": {"createdAt": -1, "_id": -1}})
     
-    # Deduplicate by question text
-    seen = set()
-    unique_questions = []
-    for q in questions:
-        text = q.get("question", {}).get("body", {}).get("text", "")
-        if text and text not in seen:
-            seen.add(text)
-            unique_questions.append(q)
-            if len(unique_questions) >= limit:
-                break
-    
-    # Convert all ObjectIds to strings recursively
-    unique_questions = [convert_objectids(q) for q in unique_questions]
-    
-    # Resolve asset URLs in explanations
-    unique_questions = [resolve_assets_in_question(q) for q in unique_questions]
-    
-    # Add topic names for AI review
-    for question in unique_questions:
-        if 'tags' in question and question['tags']:
-            tag = question['tags'][0]
-            # Fetch topic name
-            if 'topic_id' in tag:
-                topic = db['topics'].find_one({'_id': ObjectId(tag['topic_id'])}, {'name': 1})
-                question['topicName'] = topic['name'] if topic else 'General'
-            # Fetch subtopic name
-            if 'subtopic_id' in tag:
-                subtopic = db['topics'].find_one({'_id': ObjectId(tag['subtopic_id'])}, {'name': 1})
-                question['subtopicName'] = subtopic['name'] if subtopic else None
-    
-    return unique_questions
+    return selection + dedup + [{"$limit": size}, {"$project": projection or QUESTION_PROJECTION}]
 
-def get_question_batch(filters: Dict[str, Any]) -> Dict[str, Any]:
-    """Get batch of questions with validation"""
-    limit = filters.get("limit") or config.QUESTIONS_PER_REQUEST
-    questions = fetch_questions(filters, limit)
+def _dedup_key(question: Dict[str, Any]) -> str:
+    return question.get("contentHash") or question.get("question", {}).get("body", {}).get("text", "")
+
+def _select_indexed(filters: Dict[str, Any], limit: int, session_id: Optional[str]) -> Optional[List[Dict[str, Any]]]:
+    """Sample ids from the in-memory question index and fetch just those documents.
+
+    None means the index can't answer (course not indexed, or an indexed
+    question no longer matches in MongoDB) and the aggregation should run.
+    """
+    exclude = (lambda qid: session_store.seen(session_id, qid)) if session_id else None
+    with stage("index"):
+        ids = question_index.sample_ids(filters, limit, exclude)
+    if ids is None:
+        return None
+    if not ids:
+        return []
+    
+    match = {
+        **build_match_filter(filters),
+        "question.body.text": {"$nin": [None, ""]},
+        "_id": {"$in": ids}
+    }
+    collection, projection = question_source()
+    with stage("select"):
+        found = {
+            q["_id"]: q
+            for q in get_db()[collection].find(match, projection, max_time_ms=config.QUERY_TIMEOUT_MS)
+        }
+    if len(found) < len(ids):
+        question_index.record_stale(filters["courseId"], [qid for qid in ids if qid not in found])
+        return None
+    return [found[qid] for qid in ids]
+
+def select_questions(
+    filters: Dict[str, Any],
+    limit: int,
+    session_id: Optional[str] = None,
+    exclude: Sequence[Dict[str, Any]] = ()
+) -> List[Dict[str, Any]]:
+    """Select up to limit unique raw question documents, backfilling short pages.
+
+    With a session_id, questions already served in that session are skipped;
+    they're excluded from follow-up rounds like duplicates are. exclude holds
+    questions already picked elsewhere (e.g. by another section); they and
+    their duplicates are left out from the first query on. Courses in
+    QUESTION_INDEX_COURSES are answered from the in-memory index when it can.
+    """
+    # The index samples at random, so it doesn't stand in for "newest"
+    if question_index.enabled and config.SELECTION_STRATEGY != "newest" and not exclude:
+        questions = _select_indexed(filters, limit, session_id)
+        if questions is not None:
+            return questions
+    
+    source, projection = question_source()
+    collection = get_db()[source]
+    match = build_match_filter(filters)
+    
+    questions = []
+    seen_keys = {_dedup_key(q) for q in exclude}
+    seen_ids = [q["_id"] for q in exclude]
+    seen_hashes = [q["contentHash"] for q in exclude if q.get("contentHash")]
+    seen_texts = [q["question"]["body"]["text"] for q in exclude]
+    
+    for _ in range(1 + config.DEDUP_BACKFILL_ROUNDS):
+        needed = limit - len(questions)
+        # Oversample when seen questions may be rejected from the round
+        size = needed * 2 if session_id else needed
+        round_match = match
+        if seen_ids:
+            # Follow-up query: exclude everything already picked
+            round_match = {
+                **match,
+                "_id": {"$nin": seen_ids},
+                "contentHash": {"$nin": seen_hashes},
+                "question.body.text": {"$nin": [None, ""] + seen_texts}
+            }
+        
+        with stage("select"):
+            batch = list(collection.aggregate(
+                build_selection_pipeline(round_match, size, source, projection),
+                allowDiskUse=True,
+                maxTimeMS=config.QUERY_TIMEOUT_MS
+            ))
+        
+        candidates = 0
+        with stage("dedup"):
+            for q in batch:
+                key = _dedup_key(q)
+                if key in seen_keys:
+                    continue
+                seen_keys.add(key)
+                seen_ids.append(q["_id"])
+                if q.get("contentHash"):
+                    seen_hashes.append(q["contentHash"])
+                seen_texts.append(q["question"]["body"]["text"])
+                candidates += 1
+                if not session_store.seen(session_id, q["_id"]):
+                    questions.append(q)
+        
+        # No new candidates means the matched set is exhausted
+        if len(questions) >= limit or not candidates:
+            break
+    
+    return questions[:limit]
+
+def resolve_question_content(questions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Resolve asset URLs and attach topic names in place (the work questions_rendered stores)"""
+    # Resolve asset URLs in bodies, options and explanations (one lookup per batch)
+    with stage("assets"):
+        questions = resolve_assets_in_questions(questions)
+    
+    # Add topic names for AI review (one bulk lookup, cached across requests)
+    with stage("topics"):
+        return attach_topic_names(questions)
+
+def render_questions(questions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Turn raw question documents into response-ready dicts.
+
+    ObjectIds are left in place; utils.serialization writes them as strings
+    in the single serialization pass. html is never projected. Documents
+    from questions_rendered are already resolved, so this is a pure fetch.
+    """
+    for q in questions:
+        q.pop("contentHash", None)
     
+    if config.RENDERED_QUESTIONS_ENABLED:
+        return questions
+    return resolve_question_content(questions)
+
+def fetch_questions(filters: Dict[str, Any], limit: int) -> List[Dict[str, Any]]:
+    """Fetch questions from MongoDB with filters"""
+    session_id = filters.get("sessionId")
+    questions = select_questions(filters, limit, session_id)
+    session_store.mark_seen(session_id, [q["_id"] for q in questions])
+    return render_questions(questions)
+
+def build_batch_response(filters: Dict[str, Any], limit: int, questions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Wrap selected questions in the /api/questions/fetch response shape"""
     return {
         "status": "success",
         "count": len(questions),
@@ -144,3 +273,98 @@ def get_question_batch(filters: Dict[str, Any]) -> Dict[str, Any]:
         },
         "questions": questions
     }
+
+def get_question_batch(filters: Dict[str, Any]) -> Dict[str, Any]:
+    """Get batch of questions with validation"""
+    limit = filters.get("limit") or config.QUESTIONS_PER_REQUEST
+    questions = fetch_questions(filters, limit)
+    return build_batch_response(filters, limit, questions)
+
+def iter_question_export(
+    filters: Dict[str, Any],
+    after: Optional[str] = None,
+    batch_size: int = 500,
+    limit: Optional[int] = None
+) -> Iterator[bytes]:
+    """Yield NDJSON chunks (one per cursor batch) of every matching question.
+
+    Questions are read in _id order, so the last exported _id is the keyset
+    token to resume from (after). Memory is bounded by batch_size.
+    """
+    match = build_match_filter(filters)
+    if after:
+        match["_id"] = {"$gt": ObjectId(after)}
+    
+    collection, projection = question_source()
+    cursor = get_db()[collection].find(
+        match,
+        projection,
+        sort=[("_id", 1)],
+        limit=limit or 0,
+        batch_size=batch_size
+    )
+    try:
+        batch = []
+        for q in cursor:
+            batch.append(q)
+            if len(batch) >= batch_size:
+                yield b"".join(dumps(q) + b"\n" for q in render_questions(batch))
+                batch = []
+        if batch:
+            yield b"".join(dumps(q) + b"\n" for q in render_questions(batch))
+    finally:
+        cursor.close()
+
+async def get_question_sections(sections: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Select several filter sections concurrently and render them in one pass.
+
+    Questions picked by an earlier section are dropped from later ones; a
+    section left short that way is topped up by a follow-up query excluding
+    everything picked so far. Asset/topic resolution runs once over the
+    combined result.
+    """
+    limits = [f.get("limit") or config.QUESTIONS_PER_REQUEST for f in sections]
+    selected = await asyncio.gather(*(
+        run_db(select_questions, f, limit, f.get("sessionId"))
+        for f, limit in zip(sections, limits)
+    ))
+    
+    seen_ids, seen_keys = set(), set()
+    deduped, dropped = [], []
+    for questions in selected:
+        unique = []
+        for q in questions:
+            key = _dedup_key(q)
+            if q["_id"] in seen_ids or key in seen_keys:
+                continue
+            seen_ids.add(q["_id"])
+            seen_keys.add(key)
+            unique.append(q)
+        deduped.append(unique)
+        dropped.append(len(questions) - len(unique))
+    
+    # One section at a time, so a backfill never repeats another section's pick
+    picked = [q for questions in deduped for q in questions]
+    for f, limit, questions, lost in zip(sections, limits, deduped, dropped):
+        if lost and len(questions) < limit:
+            extra = await run_db(select_questions, f, limit - len(questions), f.get("sessionId"), picked)
+            questions.extend(extra)
+            picked.extend(extra)
+    
+    for f, questions in zip(sections, deduped):
+        session_store.mark_seen(f.get("sessionId"), [q["_id"] for q in questions])
+    
+    # Rendering mutates the dicts in place, so the per-section lists stay valid
+    await run_db(render_questions, [q for questions in deduped for q in questions])
+    
+    section_results = []
+    for f, limit, questions in zip(sections, limits, deduped):
+        section = build_batch_response(f, limit, questions)
+        del section["status"]
+        section_results.append(section)
+    
+    return {
+        "status": "success",
+        "count": sum(len(questions) for questions in deduped),
+        "sections": section_results
+    }
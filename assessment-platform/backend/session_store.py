@@ -0,0 +1,70 @@
+"""Per-session seen-sets so a practice session never gets the same question twice.
+
+Each session keeps a fixed-size Bloom filter of served question ids, so memory
+per session stays constant and nothing grows a $nin list sent to Mongo. False
+positives only mean an unseen question is occasionally skipped.
+"""
+import hashlib
+import math
+import threading
+from typing import Iterable, Optional
+from config import config
+from utils.cache import TTLCache
+
+class BloomFilter:
+    __slots__ = ("size", "hashes", "bits")
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: str):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+class SessionSeenStore:
+    def __init__(self, max_sessions: int, ttl_seconds: float, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        # Re-set on every write, so the TTL counts from the session's last fetch
+        self._sessions = TTLCache(max_size=max_sessions, ttl=ttl_seconds)
+        self._lock = threading.Lock()
+
+    def seen(self, session_id: Optional[str], question_id) -> bool:
+        if not session_id:
+            return False
+        bloom = self._sessions.get(session_id)
+        return bloom is not None and str(question_id) in bloom
+
+    def mark_seen(self, session_id: Optional[str], question_ids: Iterable):
+        if not session_id:
+            return
+        with self._lock:
+            bloom = self._sessions.get(session_id)
+            if bloom is None:
+                bloom = BloomFilter(self.capacity, self.error_rate)
+            for qid in question_ids:
+                bloom.add(str(qid))
+            self._sessions.set(session_id, bloom)
+
+    def clear(self, session_id: str):
+        self._sessions.pop(session_id)
+
+session_store = SessionSeenStore(
+    max_sessions=config.SESSION_SEEN_MAX_SESSIONS,
+    ttl_seconds=config.SESSION_SEEN_TTL_SECONDS,
+    capacity=config.SESSION_SEEN_CAPACITY,
+    error_rate=config.SESSION_SEEN_ERROR_RATE
+)
@@ -1,3 +1,15 @@
-from .asset_resolver import resolve_assets_in_question, resolve_asset_urls
+from .asset_resolver import (
+    find_asset_ids, get_asset_urls, invalidate_asset_cache,
+    resolve_asset_urls, resolve_assets_in_question, resolve_assets_in_questions
+)
+from .http_cache import cached_json_response, clear_http_cache
+from .serialization import BSONResponse, dumps
+from .taxonomy import attach_topic_names, get_topics, invalidate_taxonomy_cache
 
-__all__ = ['resolve_assets_in_question', 'resolve_asset_urls']
+__all__ = [
+    'find_asset_ids', 'get_asset_urls', 'invalidate_asset_cache',
+    'resolve_asset_urls', 'resolve_assets_in_question', 'resolve_assets_in_questions',
+    'cached_json_response', 'clear_http_cache',
+    'BSONResponse', 'dumps',
+    'attach_topic_names', 'get_topics', 'invalidate_taxonomy_cache'
+]
@@ -1,46 +1,98 @@
 """Asset resolution utility"""
 import re
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
 from bson import ObjectId
+from config import config
 from db import get_db
+from utils.cache import TTLCache
 
-def resolve_asset_urls(text: str) -> str:
+ASSET_PATTERN = re.compile(r'<tm-asset id="([^"]+)"\s*/>')
+
+# asset id -> url ("" when the asset is missing, so it isn't re-queried)
+_asset_cache = TTLCache(
+    max_size=config.ASSET_CACHE_MAX_SIZE,
+    ttl=config.ASSET_CACHE_TTL_SECONDS
+)
+
+def invalidate_asset_cache():
+    """Drop every cached asset URL"""
+    _asset_cache.clear()
+
+def get_asset_urls(asset_ids: Iterable[str]) -> Dict[str, str]:
+    """Resolve asset ids to URLs with one $in query for cache misses"""
+    ids = set(asset_ids)
+    if not ids:
+        return {}
+
+    found = _asset_cache.get_many(ids)
+    missing = [aid for aid in ids if aid not in found and ObjectId.is_valid(aid)]
+    if missing:
+        fetched = {aid: "" for aid in missing}
+        for asset in get_db()["assets"].find(
+            {"_id": {"$in": [ObjectId(aid) for aid in missing]}},
+            {"_id": 1, "url": 1}
+        ):
+            fetched[str(asset["_id"])] = asset.get("url", "")
+        _asset_cache.set_many(fetched)
+        found.update(fetched)
+
+    return found
+
+def _replace_assets(text: str, asset_map: Dict[str, str]) -> str:
+    def replace_asset(match):
+        url = asset_map.get(match.group(1), "")
+        return f'<img src="{url}" alt="Explanation" />' if url else match.group(0)
+
+    return ASSET_PATTERN.sub(replace_asset, text)
+
+def resolve_asset_urls(text: str, asset_map: Optional[Dict[str, str]] = None) -> str:
     """Replace <tm-asset id="..."/> with actual URLs"""
     if not text or '<tm-asset' not in text:
         return text
-    
-    db = get_db()
-    pattern = r'<tm-asset id="([^"]+)"\s*/>'
-    asset_ids = re.findall(pattern, text)
-    
-    if asset_ids:
-        assets = list(db["assets"].find(
-            {"_id": {"$in": [ObjectId(aid) for aid in asset_ids]}},
-            {"_id": 1, "url": 1}
-        ))
-        asset_map = {str(a["_id"]): a.get("url", "") for a in assets}
-        
-        def replace_asset(match):
-            asset_id = match.group(1)
-            url = asset_map.get(asset_id, "")
-            return f'<img src="{url}" alt="Explanation" />' if url else match.group(0)
-        
-        text = re.sub(pattern, replace_asset, text)
-    
-    return text
+    if asset_map is None:
+        asset_map = get_asset_urls(ASSET_PATTERN.findall(text))
+    return _replace_assets(text, asset_map)
+
+def _text_fields(question: Dict[str, Any]) -> Iterator[Tuple[Dict[str, Any], str]]:
+    """Yield (container, key) for every text field that may hold assets"""
+    body = question.get("question", {}).get("body")
+    if isinstance(body, dict) and isinstance(body.get("text"), str):
+        yield body, "text"
+
+    for option in question.get("question", {}).get("options") or []:
+        d = option.get("d") if isinstance(option, dict) else None
+        if isinstance(d, dict) and isinstance(d.get("text"), str):
+            yield d, "text"
+
+    explanation = question.get("answer", {}).get("explanation")
+    if isinstance(explanation, dict) and isinstance(explanation.get("text"), str):
+        yield explanation, "text"
+
+def find_asset_ids(question: Dict[str, Any]) -> List[str]:
+    """Asset ids referenced anywhere in the question's text fields"""
+    return sorted({aid for container, key in _text_fields(question) for aid in ASSET_PATTERN.findall(container[key])})
+
+def resolve_assets_in_questions(questions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Resolve asset references across a batch of questions with a single lookup"""
+    fields = [
+        (container, key)
+        for question in questions
+        for container, key in _text_fields(question)
+        if '<tm-asset' in container[key]
+    ]
+    if not fields:
+        return questions
+
+    asset_ids = set()
+    for container, key in fields:
+        asset_ids.update(ASSET_PATTERN.findall(container[key]))
+    asset_map = get_asset_urls(asset_ids)
+
+    for container, key in fields:
+        container[key] = _replace_assets(container[key], asset_map)
+
+    return questions
 
 def resolve_assets_in_question(question: Dict[str, Any]) -> Dict[str, Any]:
     """Resolve all asset references in question"""
-    if "answer" in question and "explanation" in question["answer"]:
-        if "text" in question["answer"]["explanation"]:
-            question["answer"]["explanation"]["text"] = resolve_asset_urls(
-                question["answer"]["explanation"]["text"]
-            )
-    
-    if "question" in question and "body" in question["question"]:
-        if "text" in question["question"]["body"]:
-            question["question"]["body"]["text"] = resolve_asset_urls(
-                question["question"]["body"]["text"]
-            )
-    
-    return question
+    return resolve_assets_in_questions([question])[0]
@@ -0,0 +1,13 @@
+"""Normalized content hashing for question deduplication"""
+import hashlib
+import re
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_text(text: str) -> str:
+    """Casefold and collapse whitespace so trivially different copies compare equal"""
+    return _WHITESPACE.sub(" ", text or "").strip().casefold()
+
+def content_hash(text: str) -> str:
+    """Stable hash stored on questions as contentHash"""
+    return hashlib.sha1(normalize_text(text).encode("utf-8")).hexdigest()
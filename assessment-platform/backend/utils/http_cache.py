@@ -0,0 +1,50 @@
+"""HTTP response caching (server-side TTL, ETag, 304) for rarely changing routes"""
+import hashlib
+from typing import Any, Awaitable, Callable, Dict
+from fastapi import Request, Response
+from config import config
+from utils.cache import TTLCache
+from utils.serialization import dumps
+
+# cache key -> (serialized body, etag)
+_response_cache = TTLCache(
+    max_size=config.HTTP_CACHE_MAX_ENTRIES,
+    ttl=config.HTTP_CACHE_TTL_SECONDS
+)
+
+def clear_http_cache():
+    """Drop every cached response body"""
+    _response_cache.clear()
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+async def cached_json_response(
+    request: Request,
+    load: Callable[[], Awaitable[Dict[str, Any]]]
+) -> Response:
+    """Serve load()'s result with an ETag, reusing the serialized body for HTTP_CACHE_TTL_SECONDS.
+
+    Responses are keyed by request path; a matching If-None-Match gets a 304.
+    """
+    key = request.url.path
+    entry = _response_cache.get(key)
+    if entry is None:
+        body = dumps(await load())
+        entry = (body, f'"{hashlib.sha1(body).hexdigest()}"')
+        if config.HTTP_CACHE_TTL_SECONDS > 0:
+            _response_cache.set(key, entry)
+
+    body, etag = entry
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={config.HTTP_CACHE_MAX_AGE_SECONDS}"
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,25 @@
+"""Single JSON serialization path for BSON documents"""
+from typing import Any
+import orjson
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+
+def _default(obj):
+    # orjson handles datetime natively; ObjectId is the only BSON type we return
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps(content: Any) -> bytes:
+    """Serialize pymongo documents straight to JSON bytes, ObjectIds as strings"""
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+class BSONResponse(JSONResponse):
+    """JSONResponse that writes pymongo documents without a pre-conversion pass.
+
+    Return it directly from a route: FastAPI skips jsonable_encoder for
+    Response instances, so the payload is walked exactly once, by orjson.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
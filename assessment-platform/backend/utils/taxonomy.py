@@ -0,0 +1,92 @@
+"""Topic/subtopic name resolution backed by an in-process taxonomy cache"""
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+from bson import ObjectId
+from config import config
+from db import get_db
+from utils.cache import TTLCache
+
+# topic id (str) -> {"name", "parentTopicId", "subjectId"}, or None when the
+# topic does not exist (cached too, so dangling tag ids don't re-query)
+_topic_cache = TTLCache(
+    max_size=config.TAXONOMY_CACHE_MAX_SIZE,
+    ttl=config.TAXONOMY_CACHE_TTL_SECONDS
+)
+
+_version_lock = threading.Lock()
+_last_version_check = 0.0
+_last_version = None
+
+def invalidate_taxonomy_cache():
+    """Drop every cached topic entry"""
+    _topic_cache.clear()
+
+def _check_version(db):
+    """Clear the cache when the newest topics.updatedAt has moved.
+
+    Runs at most once every TAXONOMY_VERSION_CHECK_SECONDS; disabled at 0.
+    """
+    global _last_version_check, _last_version
+    interval = config.TAXONOMY_VERSION_CHECK_SECONDS
+    if interval <= 0:
+        return
+    now = time.monotonic()
+    with _version_lock:
+        if now - _last_version_check < interval:
+            return
+        _last_version_check = now
+    latest = db["topics"].find_one({}, {"updatedAt": 1}, sort=[("updatedAt", -1)])
+    version = latest.get("updatedAt") if latest else None
+    with _version_lock:
+        if _last_version is not None and version != _last_version:
+            invalidate_taxonomy_cache()
+        _last_version = version
+
+def get_topics(topic_ids: Iterable[Any]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Resolve topic ids to {name, parentTopicId, subjectId} with one $in for cache misses"""
+    ids = {str(tid) for tid in topic_ids if tid}
+    if not ids:
+        return {}
+
+    db = get_db()
+    _check_version(db)
+
+    found = _topic_cache.get_many(ids)
+    missing = [tid for tid in ids if tid not in found and ObjectId.is_valid(tid)]
+    if missing:
+        fetched = {tid: None for tid in missing}
+        for topic in db["topics"].find(
+            {"_id": {"$in": [ObjectId(tid) for tid in missing]}},
+            {"_id": 1, "name": 1, "parentTopicId": 1, "subjectId": 1}
+        ):
+            fetched[str(topic["_id"])] = {
+                "name": topic.get("name"),
+                "parentTopicId": str(topic["parentTopicId"]) if topic.get("parentTopicId") else None,
+                "subjectId": str(topic["subjectId"]) if topic.get("subjectId") else None
+            }
+        _topic_cache.set_many(fetched)
+        found.update(fetched)
+
+    return found
+
+def attach_topic_names(questions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Set topicName/subtopicName from each question's first tag"""
+    first_tags = [q["tags"][0] for q in questions if q.get("tags")]
+    topics = get_topics(
+        [tag.get("topic_id") for tag in first_tags] +
+        [tag.get("subtopic_id") for tag in first_tags]
+    )
+
+    for question in questions:
+        if not question.get("tags"):
+            continue
+        tag = question["tags"][0]
+        if "topic_id" in tag:
+            topic = topics.get(str(tag["topic_id"]))
+            question["topicName"] = topic["name"] if topic else "General"
+        if "subtopic_id" in tag:
+            subtopic = topics.get(str(tag["subtopic_id"]))
+            question["subtopicName"] = subtopic["name"] if subtopic else None
+
+    return questions
@@ -1,10 +1,50 @@
 #!/usr/bin/env python3
-"""Read a JSON file, run quality checks, and optionally send to a local LLM."""
+"""Stream a JSON / JSON Lines export, run quality checks, and optionally send to a local LLM."""
 
 import argparse
+import base64
+import contextlib
+import gzip
+import hashlib
+import heapq
 import json
+import math
+import os
+import queue
+import random
+import re
+import sqlite3
 import sys
+import threading
+import time
+import urllib.error
 import urllib.request
+from array import array
+from datetime import datetime, timezone
+from collections import Counter, deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+
+
+WRAPPER_KEYS = ("questions", "items", "data")
+_WHITESPACE = " \t\r\n"
+_NUMBER_TAIL = re.compile(r"[0-9.eE+\-]*\Z")
+# A decode error this close to the end of the buffer may be a token cut off
+# by the chunk boundary ("tru", "-Infinit", "\u00"); anything earlier is a real syntax error
+_TRUNCATION_SLACK = 16
+
+# Near-duplicate detection: 64 MinHash permutations in 8 LSH bands of 8 rows
+# (items sharing a band become candidates; ~0.77 Jaccard is the 50% point).
+# Fixed seed so worker processes produce comparable signatures.
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 8
+_MINHASH_MASKS = [random.Random(20240731 + i).getrandbits(64) for i in range(MINHASH_PERMUTATIONS)]
+# Slim items queued for the LLM pass before validation waits for it to catch up
+LLM_BACKLOG = 10000
+# Bump when the checks change so stored incremental state is not reused
+STATE_FORMAT = 4
+_BLANK_MARKER = re.compile(r"\{\{\s*blank\s*\}\}", re.IGNORECASE)
+_NON_WORD = re.compile(r"[\W_]+")
+_DIGITS = re.compile(r"\d+")
 
 
 def _stringify(value):
@@ -13,6 +53,14 @@ def _stringify(value):
     return str(value)
 
 
+def _item_id(item):
+    value = item.get("id") or item.get("_id") or ""
+    # Mongo extended JSON: {"_id": {"$oid": "..."}}
+    if isinstance(value, dict):
+        value = value.get("$oid", value)
+    return _stringify(value)
+
+
 def extract_question_fields(item):
     question_text = None
     options = None
@@ -43,91 +91,1364 @@ def extract_question_fields(item):
     return question_text, options, answer
 
 
-def flatten_questions(data):
-    if isinstance(data, list):
+class _JSONStream:
+    """Incremental reader: decodes one JSON value at a time from a text file."""
+
+    def __init__(self, fp, chunk_size=1 << 20):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        if self.eof:
+            return False
+        chunk = self.fp.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        if self.pos >= self.chunk_size:
+            self.buf = self.buf[self.pos :]
+            self.pos = 0
+        self.buf += chunk
+        return True
+
+    def _error(self, message):
+        return json.JSONDecodeError(message, self.buf, self.pos)
+
+    def peek(self):
+        """Next non-whitespace character, or "" at end of input."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, chars):
+        char = self.peek()
+        if not char or char not in chars:
+            raise self._error(f"Expecting one of {chars!r}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        if not self.peek():
+            raise self._error("Unexpected end of input")
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as exc:
+                # An unterminated string runs to the end of the buffer, wherever it started
+                cut_off = exc.msg.startswith("Unterminated string") or len(self.buf) - exc.pos <= _TRUNCATION_SLACK
+                if cut_off and self._fill():
+                    continue
+                raise
+            # A number cut off at the buffer edge ("12", "1.", "1e") still
+            # decodes to a prefix; read on to be sure
+            if _NUMBER_TAIL.match(self.buf, end) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+def _iter_array(stream):
+    stream.expect("[")
+    if stream.peek() == "]":
+        stream.pos += 1
+        return
+    while True:
+        yield stream.value()
+        if stream.expect(",]") == "]":
+            return
+
+
+def _iter_object(stream):
+    """Stream the list of a questions/items/data wrapper; any other object
+    (a Mongo-export document, a JSON Lines record) is itself an item."""
+    stream.expect("{")
+    doc = {}
+    wrapped = False
+    if stream.peek() == "}":
+        stream.pos += 1
+    else:
+        while True:
+            key = stream.value()
+            if not isinstance(key, str):
+                raise stream._error("Expecting property name")
+            stream.expect(":")
+            if key in WRAPPER_KEYS and not wrapped and stream.peek() == "[":
+                wrapped = True
+                yield from _iter_array(stream)
+            else:
+                doc[key] = stream.value()
+            if stream.expect(",}") == "}":
+                break
+    if not wrapped and doc:
+        yield doc
+
+
+def iter_json_items(fp, chunk_size=1 << 20):
+    """Yield question items from a file without loading it whole.
+
+    Accepts a top-level array, a {"questions"|"items"|"data": [...]} wrapper,
+    a single Mongo-export document (like sample.json), and JSON Lines or
+    concatenated documents (mongoexport's default output). Only the item being
+    decoded is held in memory.
+    """
+    stream = _JSONStream(fp, chunk_size)
+    while True:
+        char = stream.peek()
+        if not char:
+            return
+        if char == "[":
+            yield from _iter_array(stream)
+        elif char == "{":
+            yield from _iter_object(stream)
+        else:
+            raise stream._error("Expecting '[' or '{'")
+
+
+def slim_item(idx, item):
+    """The fields the LLM sees for one item."""
+    if not isinstance(item, dict):
+        return {"index": idx, "id": "", "question": "", "options": None, "answer": None}
+    question_text, options, answer = extract_question_fields(item)
+    return {
+        "index": idx,
+        "id": _item_id(item),
+        "question": _stringify(question_text).strip(),
+        "options": options,
+        "answer": answer,
+    }
+
+
+# Fields extract_question_fields, the state file and the LLM pass read
+MONGO_PROJECTION = {
+    "_id": 1,
+    "id": 1,
+    "card_type": 1,
+    "contents": 1,
+    "question": 1,
+    "options": 1,
+    "answer": 1,
+    "correctAnswer": 1,
+    "version": 1,
+    "u": 1,
+}
+
+
+def to_extended_json(value):
+    """Convert BSON values to mongoexport's relaxed JSON shape ({"$oid": ...},
+    {"$date": ...}), so Mongo documents look like file items downstream."""
+    if isinstance(value, dict):
+        return {key: to_extended_json(val) for key, val in value.items()}
+    if isinstance(value, list):
+        return [to_extended_json(val) for val in value]
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return {"$date": value.isoformat().replace("+00:00", "Z")}
+    type_name = type(value).__name__
+    if type_name == "ObjectId":
+        return {"$oid": str(value)}
+    return str(value)
+
+
+class SourceError(Exception):
+    """The card source (e.g. MongoDB) could not be read."""
+
+
+def iter_mongo_items(uri, database, collection, batch_size=1000, since_u=None, stats=None):
+    """Stream non-deleted cards from a collection through a projected cursor.
+
+    Sorted by _id so item indexes are stable between runs; since_u keeps only
+    cards updated after that watermark. The highest u seen is recorded in
+    stats["max_u"] for the next run's watermark. Raises SourceError when
+    pymongo is missing, the URI is invalid or the server fails.
+    """
+    try:
+        from pymongo import MongoClient
+        from pymongo.errors import PyMongoError
+    except ImportError:
+        raise SourceError("Reading from MongoDB requires pymongo (pip install pymongo)") from None
+
+    query = {"deleted": False}
+    if since_u is not None:
+        query["u"] = {"$gt": since_u}
+
+    client = None
+    try:
+        # An invalid URI raises InvalidURI / ConfigurationError here (a bad port a ValueError)
+        client = MongoClient(uri)
+        cursor = client[database][collection].find(query, MONGO_PROJECTION).sort("_id", 1).batch_size(batch_size)
+        for doc in cursor:
+            if stats is not None and isinstance(doc.get("u"), (int, float)):
+                stats["max_u"] = max(stats.get("max_u", doc["u"]), doc["u"])
+            yield to_extended_json(doc)
+    except (PyMongoError, ValueError) as exc:
+        raise SourceError(f"MongoDB error: {exc}") from exc
+    finally:
+        if client is not None:
+            client.close()
+
+
+def tap_items(items, stats, feed=None, limit=None):
+    """Pass items through unchanged, counting them and handing a slim copy
+    of the first `limit` (None = all) to feed for the LLM pass."""
+    for item in items:
+        if feed is not None and (limit is None or stats["items"] < limit):
+            feed(slim_item(stats["items"], item))
+        stats["items"] += 1
+        yield item
+
+
+_UNSET = object()
+
+
+class Card:
+    """An item normalized once; every rule reads these fields instead of the raw dict.
+
+    folded_options, folded_option_set, correct_answers and blank_count are
+    worked out the first time a rule reads them, so a card only pays for
+    what the rules compiled for its shape use.
+    """
+
+    __slots__ = (
+        "card_type",
+        "text",
+        "options",
+        "options_error",
+        "answer",
+        "shape",
+        "_raw_correct",
+        "_correct",
+        "_folded",
+        "_folded_set",
+        "_blank_count",
+    )
+
+    def __init__(self, item):
+        question_text, options, answer = extract_question_fields(item)
+        card_type = item.get("card_type")
+        card_type = card_type.upper() if type(card_type) is str else _stringify(card_type).upper()
+        text = question_text.strip() if type(question_text) is str else _stringify(question_text).strip()
+
+        options_error = None
+        if options is None:
+            options_error = "missing"
+            options = ()
+        elif type(options) is not list:
+            options_error = "not_list"
+            options = ()
+        else:
+            try:
+                options = tuple(map(str.strip, options))
+            except TypeError:
+                options = tuple(["" if opt is None else str(opt).strip() for opt in options])
+
+        contents = item.get("contents")
+        correct = contents.get("correct_answers") if type(contents) is dict else None
+        if correct is None:
+            correct = item.get("correct_answers")
+
+        self.card_type = card_type
+        self.text = text
+        self.options = options
+        self.options_error = options_error
+        self.answer = answer
+        self._raw_correct = correct
+        self._correct = _UNSET
+        self._folded = None
+        self._folded_set = None
+        self._blank_count = None
+        has_correct = bool(correct) if type(correct) is list else correct is not None
+        # Rules are compiled per shape, so a rule never runs on a card it can't apply to
+        self.shape = (card_type, options_error, has_correct, isinstance(answer, int))
+
+    @property
+    def folded_options(self):
+        if self._folded is None:
+            self._folded = tuple(map(str.casefold, self.options))
+        return self._folded
+
+    @property
+    def folded_option_set(self):
+        if self._folded_set is None:
+            self._folded_set = set(map(str.casefold, self.options))
+        return self._folded_set
+
+    @property
+    def correct_answers(self):
+        """Stripped correct answers as a tuple, or None when the card has none."""
+        if self._correct is _UNSET:
+            correct = self._raw_correct
+            if correct is not None:
+                if type(correct) is not list:
+                    correct = [correct]
+                try:
+                    correct = tuple(map(str.strip, correct))
+                except TypeError:
+                    correct = tuple([_stringify(val).strip() for val in correct])
+            self._correct = correct
+        return self._correct
+
+    @property
+    def blank_count(self):
+        if self._blank_count is None:
+            text = self.text
+            count = text.count("{{")
+            # Markers are almost always written exactly {{BLANK}}; only other spellings need the regex
+            if count and text.count("{{BLANK}}") != count:
+                count = len(_BLANK_MARKER.findall(text))
+            self._blank_count = count
+        return self._blank_count
+
+
+Rule = namedtuple("Rule", "name check card_types needs")
+RULES = []
+
+# What a rule can require of a card's shape (card_type, options_error, has
+# correct answers, integer answer)
+RULE_NEEDS = {
+    "options": lambda shape: shape[1] is None,
+    "options_missing": lambda shape: shape[1] == "missing",
+    "options_not_list": lambda shape: shape[1] == "not_list",
+    "correct_answers": lambda shape: shape[2],
+    "no_correct_answers": lambda shape: not shape[2],
+    "answer_index": lambda shape: shape[3],
+}
+
+
+def rule(name, card_types=None, needs=()):
+    """Register a check: check(card) returns an issue dict or None.
+
+    card_types limits the rule to those card_type values (None = every card)
+    and needs (RULE_NEEDS keys) to cards of that shape, so the check itself
+    doesn't re-test its preconditions. Rules run in registration order.
+    """
+    unknown = set(needs) - set(RULE_NEEDS)
+    if unknown:
+        raise ValueError(f"Unknown rule needs: {sorted(unknown)}")
+
+    def register(check):
+        RULES.append(Rule(name, check, frozenset(card_types) if card_types else None, tuple(needs)))
+        return check
+
+    return register
+
+
+@rule("options_type", needs=("options_not_list",))
+def _options_type(card):
+    return {"issue": "Options is not a list"}
+
+
+@rule("option_count", needs=("options",))
+def _option_count(card):
+    if len(card.options) < 2:
+        return {"issue": "Fewer than 2 options"}
+
+
+@rule("empty_options", needs=("options",))
+def _empty_options(card):
+    if "" in card.options:
+        return {"issue": "Empty option values", "positions": [pos for pos, val in enumerate(card.options) if not val]}
+
+
+@rule("duplicate_options", needs=("options",))
+def _duplicate_options(card):
+    if len(card.folded_option_set) != len(card.options):
+        normalized = [val for val in card.folded_options if val]
+        if len(set(normalized)) != len(normalized):
+            return {"issue": "Duplicate options"}
+
+
+@rule("answer_index", needs=("options", "answer_index"))
+def _answer_index(card):
+    if card.answer < 0 or card.answer >= len(card.options):
+        return {"issue": "Correct answer index out of range"}
+
+
+@rule("missing_options", needs=("options_missing",))
+def _missing_options(card):
+    return {"issue": "Missing options"}
+
+
+@rule("blank_present", card_types=("FILL_BLANKS",))
+def _blank_present(card):
+    if card.text and not card.blank_count:
+        return {"issue": "No {{BLANK}} in question"}
+
+
+@rule("correct_answers_present", card_types=("FILL_BLANKS",), needs=("no_correct_answers",))
+def _correct_answers_present(card):
+    return {"issue": "Missing correct answers"}
+
+
+@rule("blank_count", card_types=("FILL_BLANKS",), needs=("correct_answers",))
+def _blank_count(card):
+    if card.blank_count and card.blank_count != len(card.correct_answers):
+        return {
+            "issue": "Blank count does not match answers",
+            "blanks": card.blank_count,
+            "answers": len(card.correct_answers),
+        }
+
+
+@rule("answer_in_options", needs=("options", "correct_answers"))
+def _answer_in_options(card):
+    options = card.folded_option_set
+    missing = [val for val in card.correct_answers if val.casefold() not in options]
+    if missing:
+        return {"issue": "Correct answer not in options", "answers": missing}
+
+
+class RuleEngine:
+    """Runs the rules compiled for each card type and shape, optionally timing each rule."""
+
+    def __init__(self, rules=None, timed=False):
+        self.rules = RULES if rules is None else rules
+        self.timed = timed
+        self.timings = {}
+        self._compiled = {}
+
+    def compile(self, shape):
+        """(names, checks) of the rules for a card shape, built on first use."""
+        compiled = self._compiled.get(shape)
+        if compiled is None:
+            selected = [
+                r
+                for r in self.rules
+                if (r.card_types is None or shape[0] in r.card_types) and all(RULE_NEEDS[n](shape) for n in r.needs)
+            ]
+            compiled = (tuple(r.name for r in selected), tuple(r.check for r in selected))
+            self._compiled[shape] = compiled
+        return compiled
+
+    def run(self, card):
+        names, checks = self._compiled.get(card.shape) or self.compile(card.shape)
+        if not self.timed:
+            issues = []
+            for check in checks:
+                issue = check(card)
+                if issue:
+                    issues.append(issue)
+            return issues
+
+        issues = []
+        timings = self.timings
+        for name, check in zip(names, checks):
+            started = time.perf_counter()
+            issue = check(card)
+            elapsed = time.perf_counter() - started
+            entry = timings.get(name)
+            if entry is None:
+                entry = timings[name] = [0, 0.0]
+            entry[0] += 1
+            entry[1] += elapsed
+            if issue:
+                issues.append(issue)
+        return issues
+
+    def take_timings(self):
+        timings, self.timings = self.timings, {}
+        return timings
+
+    def merge_timings(self, timings):
+        for name, (calls, seconds) in timings.items():
+            entry = self.timings.setdefault(name, [0, 0.0])
+            entry[0] += calls
+            entry[1] += seconds
+
+
+_engines = {}
+
+
+def _engine(timed=False):
+    """Per-process default engine (worker processes build their own)."""
+    if timed not in _engines:
+        _engines[timed] = RuleEngine(timed=timed)
+    return _engines[timed]
+
+
+def check_item(item, with_signature=False, engine=None):
+    """Per-item checks with no cross-item state, so they can run in a worker process.
+
+    Returns None for non-objects, else (dedup_key, rule_issues, signature):
+    dedup_key is None for a missing question text, and the signature is only
+    computed for the near-duplicate pass.
+    """
+    if not isinstance(item, dict):
+        return None
+
+    card = Card(item)
+    issues = (engine or _engine()).run(card)
+
+    if not card.text:
+        return None, issues, None
+    signature = minhash_signature(card.text) if with_signature else None
+    return dedup_key(card.text), issues, signature
+
+
+def dedup_key(question_text):
+    """8-byte digest of the casefolded text; the exact-duplicate index holds these."""
+    return hashlib.blake2b(question_text.casefold().encode("utf-8"), digest_size=8).digest()
+
+
+class _Reuse:
+    """A check_item result carried over from the previous run's state."""
+
+    __slots__ = ("result",)
+
+    def __init__(self, result):
+        self.result = result
+
+
+def _check_entry(entry, with_signature, engine):
+    if isinstance(entry, _Reuse):
+        return entry.result
+    return check_item(entry, with_signature, engine)
+
+
+def _check_chunk(chunk, with_signature, timed):
+    engine = _engine(timed)
+    results = [_check_entry(entry, with_signature, engine) for entry in chunk]
+    return results, engine.take_timings()
+
+
+def _chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_checked(items, workers=1, with_signature=False, chunk_size=500, engine=None):
+    """Yield check_item results in input order, sharded across a process pool
+    when workers > 1. At most 2 chunks per worker are in flight, so a streamed
+    input is never read far ahead of the validator. Worker rule timings are
+    merged into engine."""
+    engine = engine or _engine()
+    if workers <= 1:
+        for item in items:
+            yield _check_entry(item, with_signature, engine)
+        return
+
+    def collect(future):
+        results, timings = future.result()
+        engine.merge_timings(timings)
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in _chunks(items, chunk_size):
+            pending.append(pool.submit(_check_chunk, chunk, with_signature, engine.timed))
+            if len(pending) >= workers * 2:
+                yield from collect(pending.popleft())
+        while pending:
+            yield from collect(pending.popleft())
+
+
+def near_duplicate_text(text):
+    """Casefold, drop {{BLANK}} markers and punctuation, collapse whitespace."""
+    text = _BLANK_MARKER.sub(" ", text.casefold())
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+
+def _shingle_hash(shingle):
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def minhash_signature(text, shingle_size=5):
+    """MinHash over character shingles; each permutation is an XOR mask, which
+    keeps the inner min() a C-level loop. Only the low 16 bits of each minimum
+    are kept (b-bit MinHash): similarity bias ~1e-5.
+
+    The MINHASH_PERMUTATIONS values are followed by 8-byte digests of the text
+    with its numbers masked and of the numbers alone, so texts differing only
+    in their numbers can be told apart: 160 bytes per signature."""
+    text = near_duplicate_text(text)
+    if not text:
+        return None
+    hashes = {_shingle_hash(text[pos : pos + shingle_size]) for pos in range(max(1, len(text) - shingle_size + 1))}
+    signature = array("H", (min(map(mask.__xor__, hashes)) & 0xFFFF for mask in _MINHASH_MASKS))
+    for part in (_DIGITS.sub("0", text), " ".join(_DIGITS.findall(text))):
+        signature.frombytes(hashlib.blake2b(part.encode("utf-8"), digest_size=8).digest())
+    return signature
+
+
+class NearDuplicateIndex:
+    """MinHash/LSH index over question texts.
+
+    Signatures are split into bands; an item is only compared with earlier
+    items sharing at least one band, so the pass stays sub-quadratic. Only
+    cluster representatives are indexed, each with one signature and one
+    bucket entry per band.
+
+    Texts that differ only in their numbers ("Question 5 ..." / "Question 6
+    ...") are different questions and never match. Such variants form a
+    group: only its first member is put in the buckets, and the others are
+    found through it by their numbers, so a numbered template repeated
+    thousands of times does not make every item compare with every other.
+    """
+
+    def __init__(self, threshold=0.8, bands=LSH_BANDS):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = MINHASH_PERMUTATIONS // bands
+        self.buckets = {}
+        self.signatures = {}
+        self.clusters = {}
+        # masked-text digest -> first representative with that text (the one in the buckets)
+        self.leaders = {}
+        # (masked-text digest, numbers digest) -> the group's other representatives
+        self.variants = {}
+
+    @staticmethod
+    def similarity(left, right):
+        count = MINHASH_PERMUTATIONS
+        return sum(1 for x, y in zip(left[:count], right[:count]) if x == y) / count
+
+    @staticmethod
+    def _digests(signature):
+        """(masked text, numbers) digests appended by minhash_signature."""
+        raw = signature[MINHASH_PERMUTATIONS:].tobytes()
+        return raw[:8], raw[8:]
+
+    def _member(self, masked, numbers):
+        """The representative whose text is masked with these numbers, or None."""
+        leader = self.leaders.get(masked)
+        if leader is not None and self._digests(self.signatures[leader])[1] == numbers:
+            return leader
+        return self.variants.get((masked, numbers))
+
+    def add(self, idx, signature):
+        """Return (representative index, similarity) for a near-duplicate,
+        otherwise index the item as a new representative and return None."""
+        masked, numbers = self._digests(signature)
+        best = None
+        same = self._member(masked, numbers)
+        if same is not None:
+            best = (same, self.similarity(signature, self.signatures[same]))
+
+        rows = self.rows
+        keys = [hash((band, signature[band * rows : (band + 1) * rows].tobytes())) for band in range(self.bands)]
+        compared = set()
+        # An exact copy of a representative needs no band lookup
+        for key in keys if best is None else ():
+            for candidate in self.buckets.get(key, ()):
+                if candidate in compared:
+                    continue
+                compared.add(candidate)
+                candidate_masked = self._digests(self.signatures[candidate])[0]
+                if candidate_masked == masked:
+                    continue
+                # The group member carrying the same numbers, if any, is tried
+                # first, so it wins a tie with the group's leader
+                member = self._member(candidate_masked, numbers)
+                for other in (candidate,) if member in (None, candidate) else (member, candidate):
+                    score = self.similarity(signature, self.signatures[other])
+                    if score >= self.threshold and (best is None or score > best[1]):
+                        best = (other, score)
+
+        if best is not None:
+            self.clusters.setdefault(best[0], []).append((idx, round(best[1], 3)))
+            return best
+
+        self.signatures[idx] = signature
+        if masked in self.leaders:
+            self.variants[(masked, numbers)] = idx
+            return None
+        self.leaders[masked] = idx
+        for key in keys:
+            self.buckets.setdefault(key, []).append(idx)
+        return None
+
+    def iter_clusters(self):
+        """Clusters largest first: representative index plus members with similarity."""
+        for representative, members in sorted(self.clusters.items(), key=lambda kv: (-len(kv[1]), kv[0])):
+            yield {
+                "representative": representative,
+                "size": len(members) + 1,
+                "members": [{"index": idx, "similarity": score} for idx, score in members],
+            }
+
+
+def _open_text(path, mode="r"):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _stamp(value):
+    """A numeric version/u as a float; NaN (which never compares equal) otherwise."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return math.nan
+
+
+_NO_HASH = bytes(10)
+# Row kinds: what check_item returned for the card
+_NOT_OBJECT, _NO_TEXT, _KEYED = 0, 1, 2
+
+
+class _StateTable:
+    """Per-card rows of the incremental state, kept in columns: flat arrays and
+    byte strings instead of an object per card."""
+
+    def __init__(self):
+        # utf-8 ids back to back; id_ends[row] is where row's id stops
+        self.id_bytes = bytearray()
+        self.id_ends = array("q")
+        self.versions = array("d")
+        self.updated = array("d")
+        self.hashes = bytearray()
+        self.kinds = bytearray()
+        self.keys = bytearray()
+        self.issues = []
+        self.signatures = []
+        self.seen = bytearray()
+        self._rows = None
+        self._cursor = 0
+
+    @classmethod
+    def from_json(cls, data):
+        table = cls()
+        table.id_bytes = data["ids"].encode("utf-8")
+        for name in ("id_ends", "versions", "updated"):
+            getattr(table, name).frombytes(base64.b64decode(data[name]))
+        for name in ("hashes", "kinds", "keys"):
+            setattr(table, name, base64.b64decode(data[name]))
+        table.issues = data["issues"]
+        table.signatures = [base64.b64decode(s) if s is not None else None for s in data["signatures"]]
+        rows = len(table)
+        widths = {"versions": 1, "updated": 1, "hashes": 10, "kinds": 1, "keys": 8, "issues": 1, "signatures": 1}
+        for name, width in widths.items():
+            if len(getattr(table, name)) != rows * width:
+                raise ValueError(f"column {name} does not match {rows} rows")
+        table.seen = bytearray(rows)
+        return table
+
+    def __len__(self):
+        return len(self.id_ends)
+
+    def card_id(self, row):
+        return self.id_bytes[self.id_ends[row - 1] if row else 0 : self.id_ends[row]].decode("utf-8")
+
+    def to_json(self):
+        """Columns as JSON values: the ids as one string, arrays and byte columns base64-encoded."""
+        data = {"ids": self.id_bytes.decode("utf-8")}
+        for name in ("id_ends", "versions", "updated", "hashes", "kinds", "keys"):
+            data[name] = base64.b64encode(getattr(self, name)).decode("ascii")
+        data["issues"] = self.issues
+        data["signatures"] = [base64.b64encode(s).decode("ascii") if s is not None else None for s in self.signatures]
         return data
-    if isinstance(data, dict):
-        for key in ("questions", "items", "data"):
-            value = data.get(key)
-            if isinstance(value, list):
-                return value
-    return []
 
+    def find(self, card_id):
+        """Row of card_id not matched yet, or None. Cards usually arrive in the
+        order they were stored, so the row after the last match is tried first."""
+        row = self._cursor
+        if row >= len(self) or self.card_id(row) != card_id or self.seen[row]:
+            if self._rows is None:
+                self._rows = {self.card_id(row): row for row in range(len(self))}
+            row = self._rows.get(card_id)
+            if row is None or self.seen[row]:
+                return None
+        self.seen[row] = 1
+        self._cursor = row + 1
+        return row
+
+    def append(self, card_id, version, updated, digest, result):
+        self.id_bytes += card_id.encode("utf-8")
+        self.id_ends.append(len(self.id_bytes))
+        self.versions.append(version)
+        self.updated.append(updated)
+        self.hashes += digest
+        if result is None:
+            key, issues, signature = None, None, None
+            self.kinds.append(_NOT_OBJECT)
+        else:
+            key, issues, signature = result
+            self.kinds.append(_KEYED if key is not None else _NO_TEXT)
+        self.keys += key if key is not None else bytes(8)
+        self.issues.append(issues or None)
+        self.signatures.append(signature.tobytes() if signature is not None else None)
+
+    def result(self, row):
+        """The stored check_item result of a row."""
+        kind = self.kinds[row]
+        if kind == _NOT_OBJECT:
+            return None
+        key = self.keys[row * 8 : row * 8 + 8] if kind == _KEYED else None
+        signature = self.signatures[row]
+        return key, self.issues[row] or [], array("H", signature) if signature is not None else None
+
+
+class StateError(Exception):
+    """The incremental state file exists but could not be read."""
+
+
+class ValidationState:
+    """Incremental-run state: per card id its version, u, content hash and check result.
+
+    Kept as one compact JSON file of columns (gzipped when the path ends in
+    .gz). A card whose version and u (updated) both match the previous run
+    reuses its stored check_item result without being re-checked; only cards
+    lacking a numeric version or u are hashed to tell whether they changed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.previous = _StateTable()
+        self.cards = _StateTable()
+        self.stats = {"unchanged": 0, "changed": 0, "new": 0, "removed": 0}
+        self._pending = deque()
+        try:
+            with _open_text(path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, EOFError, ValueError) as exc:
+            raise StateError(f"Unreadable state file {path}: {exc}") from exc
+        # State from an older rule set or layout is ignored: every card is re-checked
+        if isinstance(data, dict) and data.get("format") == STATE_FORMAT:
+            try:
+                self.previous = _StateTable.from_json(data)
+            except (KeyError, TypeError, ValueError) as exc:
+                raise StateError(f"Corrupt state file {path}: {exc!r}") from exc
+
+    @staticmethod
+    def content_hash(item):
+        canonical = json.dumps(item, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.blake2b(canonical.encode("utf-8"), digest_size=10).digest()
+
+    def track(self, items, with_signature=False):
+        """Yield items to check, swapping unchanged cards for their stored result."""
+        previous = self.previous
+        for idx, item in enumerate(items):
+            if isinstance(item, dict):
+                card_id = _item_id(item) or f"#{idx}"
+                version, updated = _stamp(item.get("version")), _stamp(item.get("u"))
+            else:
+                card_id, version, updated = f"#{idx}", math.nan, math.nan
+            stamped = not (math.isnan(version) or math.isnan(updated))
+            digest = _NO_HASH if stamped else self.content_hash(item)
+
+            row = previous.find(card_id)
+            self._pending.append((card_id, version, updated, digest))
+            if row is None:
+                self.stats["new"] += 1
+                yield item
+                continue
+            if stamped:
+                same = previous.versions[row] == version and previous.updated[row] == updated
+            else:
+                same = previous.hashes[row * 10 : row * 10 + 10] == digest
+            # Cards stored without a signature must be re-checked for the near pass
+            needs_signature = with_signature and previous.kinds[row] == _KEYED and previous.signatures[row] is None
+            if same and not needs_signature:
+                self.stats["unchanged"] += 1
+                yield _Reuse(previous.result(row))
+            else:
+                self.stats["changed"] += 1
+                yield item
+
+    def record(self, result):
+        """Store the check result of the next tracked card (results arrive in order)."""
+        self.cards.append(*self._pending.popleft(), result)
+
+    def save(self):
+        self.stats["removed"] = len(self.previous) - self.previous.seen.count(1)
+        if not (self.stats["changed"] or self.stats["new"] or self.stats["removed"]):
+            return
+        tmp_path = self.path + ".tmp" + (".gz" if self.path.endswith(".gz") else "")
+        # json.dumps (C encoder) is several times faster than streaming json.dump
+        payload = json.dumps(
+            {"format": STATE_FORMAT, **self.cards.to_json()}, ensure_ascii=False, separators=(",", ":")
+        )
+        with _open_text(tmp_path, "w") as f:
+            f.write(payload)
+        os.replace(tmp_path, self.path)
+
+
+def validate_questions(items, workers=1, dedup="exact", near_index=None, state=None, engine=None, report=None):
+    """Yield issues for an iterable of items; only the duplicate indexes are kept.
 
-def validate_questions(items):
-    issues = []
+    dedup: "exact" (casefolded text, the original behaviour), "near"
+    (MinHash/LSH, exact copies report similarity 1.0) or "both" (exact
+    first, near pass for the rest).
+
+    With a ValidationState, cards unchanged since the previous run reuse their
+    stored per-item results (and MinHash signatures); the duplicate indexes
+    are rebuilt from the stored keys, so the report is the full merged one.
+    With a ReportWriter tracking items, it is told as each result comes in.
+    """
     question_index = {}
+    exact = dedup in ("exact", "both")
+    near = dedup in ("near", "both")
+    if near and near_index is None:
+        near_index = NearDuplicateIndex()
 
-    for idx, item in enumerate(items):
-        if not isinstance(item, dict):
-            issues.append({"index": idx, "issue": "Item is not an object"})
-            continue
+    if state is not None:
+        items = state.track(items, with_signature=near)
 
-        question_text, options, answer = extract_question_fields(item)
-        question_text = _stringify(question_text).strip()
+    for idx, result in enumerate(iter_checked(items, workers, with_signature=near, engine=engine)):
+        if state is not None:
+            state.record(result)
+        if report is not None:
+            report.record()
+        if result is None:
+            yield {"index": idx, "issue": "Item is not an object"}
+            continue
 
-        if not question_text:
-            issues.append({"index": idx, "issue": "Missing question text"})
+        key, issues, signature = result
+        if key is None:
+            yield {"index": idx, "issue": "Missing question text"}
         else:
-            key = question_text.casefold()
-            if key in question_index:
-                issues.append(
-                    {
+            duplicate = False
+            if exact:
+                if key in question_index:
+                    duplicate = True
+                    yield {
                         "index": idx,
                         "issue": "Duplicate question text",
                         "duplicate_of": question_index[key],
                     }
-                )
-            else:
-                question_index[key] = idx
+                else:
+                    question_index[key] = idx
+            if near and not duplicate and signature is not None:
+                match = near_index.add(idx, signature)
+                if match is not None:
+                    yield {
+                        "index": idx,
+                        "issue": "Near-duplicate question text",
+                        "duplicate_of": match[0],
+                        "similarity": round(match[1], 3),
+                    }
 
-        if options is not None:
-            if not isinstance(options, list):
-                issues.append({"index": idx, "issue": "Options is not a list"})
-            else:
-                cleaned = [_stringify(opt).strip() for opt in options]
-                if len(cleaned) < 2:
-                    issues.append({"index": idx, "issue": "Fewer than 2 options"})
-                empty_positions = [pos for pos, val in enumerate(cleaned) if not val]
-                if empty_positions:
-                    issues.append(
-                        {
-                            "index": idx,
-                            "issue": "Empty option values",
-                            "positions": empty_positions,
-                        }
-                    )
-                normalized = [val.casefold() for val in cleaned if val]
-                if len(set(normalized)) != len(normalized):
-                    issues.append({"index": idx, "issue": "Duplicate options"})
-
-                if isinstance(answer, int) and (answer < 0 or answer >= len(cleaned)):
-                    issues.append(
-                        {
-                            "index": idx,
-                            "issue": "Correct answer index out of range",
-                        }
-                    )
-        else:
-            issues.append({"index": idx, "issue": "Missing options"})
+        for issue in issues:
+            yield {"index": idx, **issue}
 
-    return issues
+
+VERDICT_FORMAT = (
+    'Respond with JSON only, in the form {"verdicts": [{"key": <key>, "issues": ["<short issue>", ...]}]}, '
+    "with one entry per item. Use an empty issues list for an item without problems."
+)
 
 
 def build_prompt(payload, custom_prompt=None):
     if custom_prompt:
-        return f"{custom_prompt}\n\nJSON:\n{payload}"
+        return f"{custom_prompt}\n\n{VERDICT_FORMAT}\n\nJSON:\n{payload}"
     return (
-        "Evaluate the question data below for quality. Check:\n"
+        "Evaluate each question item below for quality. Check:\n"
         "- Options validity and duplication\n"
         "- Spelling/grammar issues in question text and options\n"
         "- Ambiguity or unclear wording\n"
         "- Any malformed fields\n\n"
-        "Return a concise list of issues with indices.\n\n"
+        f"{VERDICT_FORMAT}\n\n"
         f"JSON:\n{payload}"
     )
 
 
+_encode_compact = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+
+def _compact(value):
+    return _encode_compact(value)
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token) for batch budgeting."""
+    return len(text) // 4 + 1
+
+
+def verdict_cache_key(slim, model, custom_prompt=None):
+    """Content hash of what the verdict depends on: the item, model and prompt."""
+    content = [model, custom_prompt or "", slim["question"], slim["options"], slim["answer"]]
+    return hashlib.sha256(_compact(content).encode("utf-8")).hexdigest()
+
+
+def iter_batches(slim_items, token_budget, custom_prompt=None):
+    """Greedily pack items into batches whose prompt stays within token_budget.
+
+    Each batch is a list of (slim item, compact payload entry); an item larger
+    than the budget on its own is sent alone.
+    """
+    overhead = estimate_tokens(build_prompt("", custom_prompt))
+    batch, used = [], overhead
+    for slim in slim_items:
+        entry = {"key": len(batch), "question": slim["question"], "options": slim["options"], "answer": slim["answer"]}
+        cost = estimate_tokens(_compact(entry)) + 1
+        if batch and used + cost > token_budget:
+            yield batch
+            batch, used = [], overhead
+            entry["key"] = 0
+        batch.append((slim, entry))
+        used += cost
+    if batch:
+        yield batch
+
+
+class VerdictCache:
+    """On-disk per-item verdict cache (sqlite), keyed by verdict_cache_key.
+
+    Only used from the main thread; workers hand results back first.
+    """
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS verdicts (key TEXT PRIMARY KEY, verdict TEXT NOT NULL)")
+
+    def get(self, key):
+        row = self.conn.execute("SELECT verdict FROM verdicts WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_many(self, verdicts):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO verdicts (key, verdict) VALUES (?, ?)",
+            [(key, _compact(verdict)) for key, verdict in verdicts.items()],
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+class RetryableError(Exception):
+    pass
+
+
+def generate(endpoint, model, prompt, timeout):
+    """POST to an Ollama-style /api/generate and read the streamed NDJSON reply.
+
+    The timeout applies per read, so a long generation that keeps streaming
+    is not cut off.
+    """
+    body = json.dumps({"model": model, "prompt": prompt, "stream": True, "format": "json"}).encode("utf-8")
+    req = urllib.request.Request(
+        endpoint,
+        data=body,
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    parts = []
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            for line in resp:
+                if not line.strip():
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise RetryableError(chunk["error"])
+                parts.append(chunk.get("response", ""))
+                if chunk.get("done"):
+                    break
+    except urllib.error.HTTPError as exc:
+        if exc.code == 429 or exc.code >= 500:
+            raise RetryableError(f"HTTP {exc.code}") from exc
+        raise
+    except (urllib.error.URLError, OSError, json.JSONDecodeError) as exc:
+        raise RetryableError(str(exc)) from exc
+    return "".join(parts)
+
+
+def parse_verdicts(text, batch):
+    """Map the model's reply back to the batch: {position in batch: verdict}."""
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as exc:
+        raise RetryableError(f"Reply is not JSON: {exc}") from exc
+    if isinstance(data, dict):
+        data = data.get("verdicts", next((v for v in data.values() if isinstance(v, list)), []))
+    if not isinstance(data, list):
+        raise RetryableError("Reply has no verdict list")
+
+    verdicts = {}
+    for entry in data:
+        if not isinstance(entry, dict) or not isinstance(entry.get("key"), int):
+            continue
+        if 0 <= entry["key"] < len(batch):
+            issues = entry.get("issues") or []
+            if not isinstance(issues, list):
+                issues = [issues]
+            verdicts[entry["key"]] = {"issues": [_stringify(issue) for issue in issues]}
+    return verdicts
+
+
+def evaluate_batch(batch, args):
+    """Send one batch with retries and exponential backoff; returns {position: verdict}."""
+    payload = _compact([entry for _, entry in batch])
+    prompt = build_prompt(payload, args.prompt)
+    for attempt in range(args.retries + 1):
+        try:
+            return parse_verdicts(generate(args.endpoint, args.model, prompt, args.timeout), batch)
+        except RetryableError:
+            if attempt == args.retries:
+                raise
+            time.sleep(args.backoff * (2**attempt) + random.uniform(0, args.backoff))
+
+
+def evaluate_with_llm(slim_items, args, cache=None, on_verdict=None):
+    """Evaluate items in token-budgeted batches on a bounded thread pool.
+
+    slim_items is read lazily and at most 2 * concurrency batches are in
+    flight, so items can be fed while they are still being produced. Cached
+    verdicts are reused; new ones are written to the cache as each batch
+    completes. Every verdict goes to on_verdict(slim, verdict); returns stats.
+    """
+    stats = {"items": 0, "cached": 0, "evaluated": 0, "unanswered": 0, "batches": 0, "failed_batches": 0, "flagged": 0}
+
+    def record(slim, verdict):
+        if verdict["issues"]:
+            stats["flagged"] += 1
+        if on_verdict is not None:
+            on_verdict(slim, verdict)
+
+    def uncached():
+        for slim in slim_items:
+            stats["items"] += 1
+            slim["cache_key"] = verdict_cache_key(slim, args.model, args.prompt)
+            cached = cache.get(slim["cache_key"]) if cache else None
+            if cached is not None:
+                stats["cached"] += 1
+                record(slim, cached)
+            else:
+                yield slim
+
+    def collect(future, batch):
+        stats["batches"] += 1
+        try:
+            answered = future.result()
+        except Exception as exc:
+            stats["failed_batches"] += 1
+            stats["unanswered"] += len(batch)
+            print(f"Batch of {len(batch)} items failed: {exc}", file=sys.stderr)
+            return
+        fresh = {}
+        for position, (slim, _) in enumerate(batch):
+            verdict = answered.get(position)
+            if verdict is None:
+                stats["unanswered"] += 1
+                continue
+            record(slim, verdict)
+            fresh[slim["cache_key"]] = verdict
+        stats["evaluated"] += len(fresh)
+        if cache and fresh:
+            cache.set_many(fresh)
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = {}
+        for batch in iter_batches(uncached(), args.batch_tokens, args.prompt):
+            futures[pool.submit(evaluate_batch, batch, args)] = batch
+            if len(futures) >= 2 * args.concurrency:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(future, futures.pop(future))
+        for future in as_completed(futures):
+            collect(future, futures[future])
+    return stats
+
+
+_END = object()
+
+
+class LLMPass:
+    """Runs evaluate_with_llm on a background thread while validation feeds it.
+
+    feed() blocks while `backlog` items are queued, so memory stays bounded
+    however large the bank is. The verdict cache is opened on that thread
+    (sqlite connections are per-thread).
+    """
+
+    def __init__(self, args, on_verdict=None, backlog=LLM_BACKLOG):
+        self.queue = queue.Queue(maxsize=backlog)
+        self.stats = None
+        self.error = None
+        self._thread = threading.Thread(target=self._run, args=(args, on_verdict), daemon=True)
+        self._thread.start()
+
+    def _items(self):
+        while True:
+            slim = self.queue.get()
+            if slim is _END:
+                return
+            yield slim
+
+    def _run(self, args, on_verdict):
+        try:
+            cache = None if args.no_cache else VerdictCache(args.cache_file)
+            try:
+                self.stats = evaluate_with_llm(self._items(), args, cache, on_verdict)
+            finally:
+                if cache:
+                    cache.close()
+        except Exception as exc:
+            self.error = exc
+
+    def feed(self, slim):
+        # Stop queueing if the pass died; finish() reports why
+        while self._thread.is_alive():
+            try:
+                self.queue.put(slim, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def finish(self):
+        """Mark the end of the input, wait for the pass and return its stats."""
+        self.feed(_END)
+        self._thread.join()
+        if self.error is not None:
+            raise self.error
+        return self.stats
+
+
+class ReportWriter:
+    """Machine-readable report: every issue as JSON Lines plus summary files.
+
+    Issue lines are buffered and written in bulk, optionally gzipped, and
+    rolled over to a new shard once a shard reaches shard_bytes on disk.
+    """
+
+    def __init__(self, directory, compress=False, shard_bytes=0, buffer_bytes=1 << 20):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.compress = compress
+        self.shard_bytes = shard_bytes
+        self.buffer_bytes = buffer_bytes
+        self.shards = []
+        self.summary = {}
+        # (issue type, card type, topic) -> count; split per dimension in finish()
+        self.issue_counts = Counter()
+        self.items_by_card_type = Counter()
+        self.items_with_issues = 0
+        self._raw = None
+        self._file = None
+        self._buffer = []
+        self._buffered = 0
+        self._verdicts = None
+        self._pending = deque()
+        self._current = ("", "", "")
+        self._last_index = None
+
+    @staticmethod
+    def _describe(item):
+        if not isinstance(item, dict):
+            return "", "", ""
+        contents = item.get("contents") if isinstance(item.get("contents"), dict) else {}
+        return _item_id(item), _stringify(item.get("card_type")), _stringify(contents.get("topic", item.get("topic")))
+
+    def track(self, items):
+        """Pass items through, queueing each one's (id, card type, topic) until
+        the validator records its result, so its issues can carry them."""
+        for item in items:
+            meta = self._describe(item)
+            self.items_by_card_type[meta[1]] += 1
+            self._pending.append(meta)
+            yield item
+
+    def record(self):
+        """The validator moved on to the next tracked item (results arrive in order)."""
+        self._current = self._pending.popleft()
+
+    def write_issue(self, issue):
+        index = issue["index"]
+        if index != self._last_index:
+            self._last_index = index
+            self.items_with_issues += 1
+        card_id, card_type, topic = self._current
+        self.issue_counts[(issue["issue"], card_type, topic)] += 1
+
+        line = _encode_compact({"index": index, "id": card_id, "card_type": card_type, "topic": topic, **issue}) + "\n"
+        self._buffer.append(line)
+        self._buffered += len(line)
+        if self._buffered >= self.buffer_bytes:
+            self.flush()
+
+    def _open_shard(self):
+        name = f"issues-{len(self.shards):05d}.jsonl" + (".gz" if self.compress else "")
+        self._raw = open(os.path.join(self.directory, name), "wb")
+        self._file = gzip.GzipFile(fileobj=self._raw, mode="wb", compresslevel=6) if self.compress else self._raw
+        self.shards.append(name)
+
+    def _close_shard(self):
+        if self._file is not self._raw:
+            self._file.close()
+        self._raw.close()
+        self._raw = self._file = None
+
+    def flush(self):
+        if not self._buffer:
+            return
+        if self._file is None:
+            self._open_shard()
+        self._file.write("".join(self._buffer).encode("utf-8"))
+        self._buffer = []
+        self._buffered = 0
+        if self.shard_bytes and self._raw.tell() >= self.shard_bytes:
+            self._close_shard()
+
+    def write_json(self, name, value):
+        with open(os.path.join(self.directory, name), "w", encoding="utf-8") as f:
+            f.write(json.dumps(value, ensure_ascii=False, indent=2))
+
+    def finish(self, **extra):
+        """Flush the remaining issues and write summary.json."""
+        self.flush()
+        if self._file is not None:
+            self._close_shard()
+        by_type, by_card_type, by_topic = Counter(), Counter(), Counter()
+        for (issue_type, card_type, topic), count in self.issue_counts.items():
+            by_type[issue_type] += count
+            by_card_type[card_type] += count
+            by_topic[topic] += count
+        self.summary.update(extra)
+        self.summary.update(
+            {
+                "issues": sum(self.issue_counts.values()),
+                "items_with_issues": self.items_with_issues,
+                "issues_by_type": dict(by_type.most_common()),
+                "issues_by_card_type": dict(by_card_type.most_common()),
+                "issues_by_topic": dict(by_topic.most_common()),
+                "items_by_card_type": dict(self.items_by_card_type.most_common()),
+                "issue_shards": self.shards,
+            }
+        )
+        self.write_json("summary.json", self.summary)
+
+    def _open_verdicts(self):
+        self._verdicts = open(os.path.join(self.directory, "llm_verdicts.json"), "w", encoding="utf-8")
+        self._verdicts.write("{")
+
+    def write_verdict(self, slim, verdict):
+        """Append one LLM verdict to llm_verdicts.json, keyed by item id (#index for items without one)."""
+        separator = ","
+        if self._verdicts is None:
+            self._open_verdicts()
+            separator = ""
+        key = _compact(slim["id"] or f"#{slim['index']}")
+        value = _compact({"index": slim["index"], "issues": verdict["issues"]})
+        self._verdicts.write(f"{separator}{key}:{value}")
+
+    def finish_verdicts(self, llm_stats):
+        """Close llm_verdicts.json and add the LLM stats to the summary."""
+        if self._verdicts is None:
+            self._open_verdicts()
+        self._verdicts.write("}")
+        self._verdicts.close()
+        self.summary["llm"] = llm_stats
+        self.write_json("summary.json", self.summary)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Send JSON content to a local LLM endpoint for quality evaluation."
@@ -138,6 +1459,33 @@ def main():
         default="pushpak.EduBitsCards.json",
         help="Path to JSON file to evaluate",
     )
+    parser.add_argument(
+        "--mongo-uri",
+        default=None,
+        help="Read cards straight from MongoDB instead of a JSON file",
+    )
+    parser.add_argument(
+        "--mongo-db",
+        default="pushpak",
+        help="Database for --mongo-uri (default: pushpak)",
+    )
+    parser.add_argument(
+        "--collection",
+        default="EduBitsCards",
+        help="Collection for --mongo-uri (default: EduBitsCards)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1000,
+        help="Documents per cursor batch for --mongo-uri (default: 1000)",
+    )
+    parser.add_argument(
+        "--since-u",
+        type=float,
+        default=None,
+        help="With --mongo-uri, only cards whose u (updated) is greater than this watermark",
+    )
     parser.add_argument(
         "--model",
         default="llama3.2:1b",
@@ -156,84 +1504,217 @@ def main():
     parser.add_argument(
         "--max-items",
         type=int,
-        default=200,
-        help="Maximum number of items to send to the LLM (default: 200)",
+        default=0,
+        help="Maximum number of items to send to the LLM (default: 0, all)",
+    )
+    parser.add_argument(
+        "--batch-tokens",
+        type=int,
+        default=2000,
+        help="Approximate prompt token budget per LLM request (default: 2000)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="LLM requests in flight (default: 4)",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=3,
+        help="Retries per batch on timeouts, 429/5xx and unparseable replies (default: 3)",
+    )
+    parser.add_argument(
+        "--backoff",
+        type=float,
+        default=1.0,
+        help="Base seconds for exponential retry backoff (default: 1.0)",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=60,
+        help="Seconds to wait for each streamed chunk of a reply (default: 60)",
+    )
+    parser.add_argument(
+        "--cache-file",
+        default=".edubits_llm_cache.sqlite",
+        help="On-disk per-item verdict cache (default: .edubits_llm_cache.sqlite)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Evaluate every item, ignoring and not updating the verdict cache",
     )
     parser.add_argument(
         "--no-llm",
         action="store_true",
         help="Skip the LLM call and only run local checks",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Processes for the per-item checks (default: 1, in-process)",
+    )
+    parser.add_argument(
+        "--dedup",
+        choices=("exact", "near", "both"),
+        default="exact",
+        help="Duplicate detection: exact casefolded text, MinHash/LSH near-duplicates, or both (default: exact)",
+    )
+    parser.add_argument(
+        "--report-dir",
+        default=None,
+        help="Write every issue as JSON Lines plus summary.json (and llm_verdicts.json) here",
+    )
+    parser.add_argument(
+        "--report-gzip",
+        action="store_true",
+        help="Gzip the issue shards",
+    )
+    parser.add_argument(
+        "--shard-mb",
+        type=float,
+        default=0,
+        help="Start a new issue shard after this many MB on disk (default: 0, one file)",
+    )
+    parser.add_argument(
+        "--rule-timing",
+        action="store_true",
+        help="Time every validation rule and print the totals",
+    )
+    parser.add_argument(
+        "--state-file",
+        default=None,
+        help="Incremental mode: only re-check cards whose version or content changed since the run that wrote this file",
+    )
+    parser.add_argument(
+        "--near-threshold",
+        type=float,
+        default=0.8,
+        help="Estimated Jaccard similarity for near-duplicates (default: 0.8)",
+    )
 
     args = parser.parse_args()
+    if args.since_u is not None and not args.mongo_uri:
+        parser.error("--since-u requires --mongo-uri")
+    if args.since_u is not None and args.state_file:
+        parser.error("--since-u reads a partial bank; use --state-file for incremental full reports")
 
+    stats = {"items": 0}
+    shown_issues = []
+    issue_count = 0
+    near_index = NearDuplicateIndex(threshold=args.near_threshold)
     try:
-        with open(args.json_file, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        state = ValidationState(args.state_file) if args.state_file else None
+    except StateError as exc:
+        print(exc, file=sys.stderr)
+        sys.exit(1)
+    engine = RuleEngine(timed=args.rule_timing)
+    report = None
+    if args.report_dir:
+        report = ReportWriter(args.report_dir, args.report_gzip, int(args.shard_mb * 1024 * 1024))
+    # The 50 lowest-index flagged items, as a heap on -index
+    shown_flagged = []
+
+    def on_verdict(slim, verdict):
+        if report is not None:
+            report.write_verdict(slim, verdict)
+        if verdict["issues"]:
+            entry = (-slim["index"], {"index": slim["index"], "id": slim["id"], "issues": verdict["issues"]})
+            if len(shown_flagged) < 50:
+                heapq.heappush(shown_flagged, entry)
+            elif entry[0] > shown_flagged[0][0]:
+                heapq.heapreplace(shown_flagged, entry)
+
+    llm = None if args.no_llm else LLMPass(args, on_verdict)
+    try:
+        with contextlib.ExitStack() as stack:
+            if args.mongo_uri:
+                source = iter_mongo_items(
+                    args.mongo_uri, args.mongo_db, args.collection, args.batch_size, args.since_u, stats
+                )
+            else:
+                source = iter_json_items(stack.enter_context(open(args.json_file, "r", encoding="utf-8")))
+            if report is not None:
+                source = report.track(source)
+            items = tap_items(source, stats, llm and llm.feed, args.max_items or None)
+            for issue in validate_questions(items, args.workers, args.dedup, near_index, state, engine, report):
+                if report is not None:
+                    report.write_issue(issue)
+                issue_count += 1
+                if len(shown_issues) < 50:
+                    shown_issues.append(issue)
     except FileNotFoundError:
         print(f"File not found: {args.json_file}", file=sys.stderr)
         sys.exit(1)
     except json.JSONDecodeError as exc:
         print(f"Invalid JSON: {exc}", file=sys.stderr)
         sys.exit(1)
+    except SourceError as exc:
+        print(exc, file=sys.stderr)
+        sys.exit(1)
 
-    items = flatten_questions(data)
-    issues = validate_questions(items)
-
-    print(f"Loaded {len(items)} items")
-    print(f"Local issues found: {len(issues)}")
-    if issues:
-        print(json.dumps(issues[:50], ensure_ascii=False, indent=2))
-        if len(issues) > 50:
-            print(f"... {len(issues) - 50} more issues not shown")
-
-    if args.no_llm:
-        return
-
-    slim_items = []
-    for idx, item in enumerate(items[: args.max_items]):
-        question_text, options, answer = extract_question_fields(item)
-        slim_items.append(
-            {
-                "index": idx,
-                "id": _stringify(item.get("id") or item.get("_id") or ""),
-                "question": _stringify(question_text).strip(),
-                "options": options,
-                "answer": answer,
-            }
+    print(f"Loaded {stats['items']} items")
+    if stats.get("max_u") is not None:
+        print(f"Watermark (max u): {stats['max_u']}")
+    if state is not None:
+        state.save()
+        print(
+            "Incremental: {unchanged} unchanged, {changed} changed, {new} new, {removed} removed".format(
+                **state.stats
+            )
         )
+    print(f"Local issues found: {issue_count}")
+    if shown_issues:
+        print(json.dumps(shown_issues, ensure_ascii=False, indent=2))
+        if issue_count > 50:
+            print(f"... {issue_count - 50} more issues not shown")
+    if args.rule_timing:
+        print("Rule timings:")
+        for name, (calls, seconds) in sorted(engine.timings.items(), key=lambda kv: -kv[1][1]):
+            print(f"  {name:<24} {calls:>10} calls {seconds * 1000:>10.1f} ms {seconds / calls * 1e6:>8.2f} us/call")
+    clusters = []
+    if args.dedup != "exact":
+        clusters = list(near_index.iter_clusters())
+        print(f"Near-duplicate clusters: {len(clusters)}")
+        if clusters:
+            print(json.dumps(clusters[:20], ensure_ascii=False, indent=2))
+            if len(clusters) > 20:
+                print(f"... {len(clusters) - 20} more clusters not shown")
+    if report is not None:
+        if clusters:
+            report.write_json("near_duplicate_clusters.json", clusters)
+        report.finish(
+            source=args.mongo_uri and f"{args.mongo_db}.{args.collection}" or args.json_file,
+            items=stats["items"],
+            dedup=args.dedup,
+            near_duplicate_clusters=len(clusters),
+            rule_timings={name: {"calls": calls, "seconds": round(sec, 6)} for name, (calls, sec) in engine.timings.items()},
+        )
+        print(f"Report written to {args.report_dir}")
 
-    payload = json.dumps(slim_items, ensure_ascii=False, indent=2)
-    prompt = build_prompt(payload, args.prompt)
-
-    body = json.dumps(
-        {
-            "model": args.model,
-            "prompt": prompt,
-            "stream": False,
-        }
-    ).encode("utf-8")
+    if llm is None:
+        return
 
-    req = urllib.request.Request(
-        args.endpoint,
-        data=body,
-        headers={"Content-Type": "application/json"},
-        method="POST",
+    llm_stats = llm.finish()
+    print(
+        f"LLM verdicts: {llm_stats['cached'] + llm_stats['evaluated']} of {llm_stats['items']} items "
+        f"({llm_stats['cached']} cached, {llm_stats['evaluated']} evaluated in {llm_stats['batches']} batches, "
+        f"{llm_stats['unanswered']} unanswered)"
     )
-
-    try:
-        with urllib.request.urlopen(req, timeout=60) as resp:
-            response_text = resp.read().decode("utf-8")
-    except Exception as exc:
-        print(f"Request failed: {exc}", file=sys.stderr)
+    print(f"LLM flagged items: {llm_stats['flagged']}")
+    if shown_flagged:
+        print(json.dumps([entry for _, entry in sorted(shown_flagged, reverse=True)], ensure_ascii=False, indent=2))
+        if llm_stats["flagged"] > 50:
+            print(f"... {llm_stats['flagged'] - 50} more flagged items not shown")
+    if report is not None:
+        report.finish_verdicts(llm_stats)
+    if llm_stats["failed_batches"]:
         sys.exit(1)
 
-    try:
-        response_json = json.loads(response_text)
-        print(response_json.get("response", ""))
-    except json.JSONDecodeError:
-        print(response_text)
-
 
 if __name__ == "__main__":
     main()
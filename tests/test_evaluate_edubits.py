@@ -0,0 +1,735 @@
+import contextlib
+import gzip
+import http.server
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import evaluate_edubits  # noqa: E402
+from evaluate_edubits import (  # noqa: E402
+    RULES,
+    STATE_FORMAT,
+    Card,
+    NearDuplicateIndex,
+    ReportWriter,
+    RuleEngine,
+    SourceError,
+    StateError,
+    ValidationState,
+    check_item,
+    extract_question_fields,
+    iter_json_items,
+    iter_mongo_items,
+    minhash_signature,
+    rule,
+    validate_questions,
+)
+
+ITEMS = [
+    {"_id": {"$oid": "64b000000000000000000001"}, "type": "mcq", "q": "2 + 2 = ?", "ans": [4, 4.0, -1e-3]},
+    {"_id": {"$oid": "64b000000000000000000002"}, "type": "fib", "q": "Ünïcode \"quoted\" ___", "ok": True},
+    {"_id": {"$oid": "64b000000000000000000003"}, "n": 12345, "none": None, "nested": {"a": [[], {}]}},
+]
+
+
+def run_main(*argv):
+    """Run the CLI in-process; returns (exit code, stdout)."""
+    out = io.StringIO()
+    code = 0
+    with mock.patch.object(sys, "argv", ["evaluate_edubits.py", *argv]), contextlib.redirect_stdout(out):
+        with contextlib.redirect_stderr(io.StringIO()):
+            try:
+                evaluate_edubits.main()
+            except SystemExit as exc:
+                code = exc.code
+    return code, out.getvalue()
+
+
+def parse(text, chunk_size):
+    return list(iter_json_items(io.StringIO(text), chunk_size=chunk_size))
+
+
+class IterJsonItemsTest(unittest.TestCase):
+    """Every input is parsed at each small chunk size, so tokens (strings,
+    numbers, literals, structural characters) land across chunk boundaries."""
+
+    def assertParses(self, text, expected):
+        for chunk_size in range(1, 12):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(parse(text, chunk_size), expected)
+        self.assertEqual(parse(text, 1 << 20), expected)
+
+    def assertRejects(self, text):
+        for chunk_size in range(1, 12):
+            with self.subTest(chunk_size=chunk_size):
+                with self.assertRaises(json.JSONDecodeError):
+                    parse(text, chunk_size)
+
+    def test_array(self):
+        self.assertParses(json.dumps(ITEMS), ITEMS)
+        self.assertParses(json.dumps(ITEMS, indent=2), ITEMS)
+
+    def test_empty_array(self):
+        self.assertParses("[ ]", [])
+
+    def test_wrapper(self):
+        self.assertParses(json.dumps({"questions": ITEMS}), ITEMS)
+
+    def test_concatenated_objects(self):
+        self.assertParses("".join(json.dumps(item) for item in ITEMS), ITEMS)
+
+    def test_json_lines(self):
+        self.assertParses("\n".join(json.dumps(item) for item in ITEMS) + "\n", ITEMS)
+
+    def test_number_split_at_boundary(self):
+        self.assertParses("[1234567, 0.125, 1e10]", [1234567, 0.125, 1e10])
+        self.assertParses('{"n": 1234567}{"n": 2}', [{"n": 1234567}, {"n": 2}])
+
+    def test_trailing_whitespace(self):
+        self.assertParses(json.dumps(ITEMS) + " \n\t\r\n  ", ITEMS)
+        self.assertParses(json.dumps(ITEMS[0]) + "\n\n   ", ITEMS[:1])
+
+    def test_trailing_comma_rejected(self):
+        self.assertRejects(json.dumps(ITEMS)[:-1] + ",]")
+        self.assertRejects('{"a": 1,}')
+
+    def test_truncated_input_rejected(self):
+        text = json.dumps(ITEMS)
+        for cut in (1, len(text) // 2, len(text) - 1):
+            with self.subTest(cut=cut):
+                self.assertRejects(text[:cut])
+        self.assertRejects(json.dumps(ITEMS[0])[:-1])
+        self.assertRejects('[{"a": tru')
+
+    def test_syntax_error_stops_reading(self):
+        class CountingReader(io.StringIO):
+            reads = 0
+
+            def read(self, size=-1):
+                self.reads += 1
+                return super().read(size)
+
+        good = json.dumps(ITEMS[0])
+        text = "[" + ",".join([good] * 10 + ['{"q": "broken" "x": 1}'] + [good] * 5000) + "]"
+        for chunk_size in (64, 4096):
+            with self.subTest(chunk_size=chunk_size):
+                reader = CountingReader(text)
+                items = iter_json_items(reader, chunk_size=chunk_size)
+                with self.assertRaises(json.JSONDecodeError):
+                    for _ in items:
+                        pass
+                # The rest of the file is never read in
+                self.assertLess(reader.reads * chunk_size, len(good) * 11 + 2 * chunk_size + 64)
+
+    def test_garbage_rejected(self):
+        self.assertRejects("x")
+        self.assertRejects(json.dumps(ITEMS[0]) + " x")
+
+
+class IterMongoItemsTest(unittest.TestCase):
+    def test_server_error_raises(self):
+        try:
+            import pymongo  # noqa: F401
+        except ImportError:
+            self.skipTest("pymongo not installed")
+        uri = "mongodb://127.0.0.1:1/?serverSelectionTimeoutMS=100"
+        with self.assertRaises(SourceError):
+            list(iter_mongo_items(uri, "db", "cards"))
+
+    def test_invalid_uri_raises(self):
+        try:
+            import pymongo  # noqa: F401
+        except ImportError:
+            self.skipTest("pymongo not installed")
+        for uri in ("mongodb://", "http://localhost", "mongodb://localhost:notaport", "mongodb+srv://host/db?ssl=maybe"):
+            with self.subTest(uri=uri):
+                with self.assertRaises(SourceError):
+                    next(iter_mongo_items(uri, "db", "cards"))
+
+    def test_missing_pymongo_raises(self):
+        saved = sys.modules.get("pymongo")
+        sys.modules["pymongo"] = None
+        try:
+            with self.assertRaises(SourceError):
+                next(iter_mongo_items("mongodb://localhost", "db", "cards"))
+        finally:
+            if saved is None:
+                del sys.modules["pymongo"]
+            else:
+                sys.modules["pymongo"] = saved
+
+
+class StubGenerate:
+    """Local stand-in for an Ollama /api/generate: streams NDJSON verdicts that
+    flag every item whose question mentions "bad"; the first `fail` requests get a 500."""
+
+    def __init__(self, fail=0):
+        self.prompts = []
+        self.fail = fail
+        stub = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                stub.prompts.append(body["prompt"])
+                if stub.fail:
+                    stub.fail -= 1
+                    self.send_error(500)
+                    return
+                entries = json.loads(body["prompt"].rsplit("JSON:\n", 1)[1])
+                reply = json.dumps(
+                    {"verdicts": [{"key": e["key"], "issues": ["bad wording"] if "bad" in e["question"] else []} for e in entries]}
+                )
+                self.send_response(200)
+                self.end_headers()
+                half = len(reply) // 2
+                for part, done in ((reply[:half], False), (reply[half:], True)):
+                    self.wfile.write((json.dumps({"response": part, "done": done}) + "\n").encode("utf-8"))
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.endpoint = f"http://127.0.0.1:{self.server.server_address[1]}/api/generate"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def llm_cards(count):
+    return [
+        {"_id": {"$oid": f"64b{n:021d}"}, "question": f"{'bad' if n % 3 == 0 else 'good'} question {n}?", "options": ["a", "b"]}
+        for n in range(count)
+    ]
+
+
+class LLMPassTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        self.cards_file = os.path.join(self.tmp, "cards.json")
+        with open(self.cards_file, "w", encoding="utf-8") as f:
+            json.dump(llm_cards(30), f)
+
+    def run_llm(self, stub, *extra):
+        return run_main(
+            "--json_file", self.cards_file,
+            "--endpoint", stub.endpoint,
+            "--cache-file", os.path.join(self.tmp, "cache.sqlite"),
+            "--batch-tokens", "200",
+            "--concurrency", "2",
+            "--backoff", "0",
+            "--report-dir", os.path.join(self.tmp, "report"),
+            *extra,
+        )
+
+    def read_report(self, name):
+        with open(os.path.join(self.tmp, "report", name), encoding="utf-8") as f:
+            return json.load(f)
+
+    def test_batches_cache_and_verdicts(self):
+        stub = StubGenerate()
+        self.addCleanup(stub.close)
+        code, _ = self.run_llm(stub)
+        self.assertEqual(code, 0)
+
+        # Every item is sent once, in batches that stay within the token budget
+        sent = [json.loads(p.rsplit("JSON:\n", 1)[1]) for p in stub.prompts]
+        self.assertGreater(len(sent), 1)
+        self.assertEqual(sorted(e["question"] for batch in sent for e in batch), sorted(c["question"] for c in llm_cards(30)))
+        for prompt, batch in zip(stub.prompts, sent):
+            self.assertEqual([e["key"] for e in batch], list(range(len(batch))))
+            self.assertLessEqual(evaluate_edubits.estimate_tokens(prompt), 200 + len(batch))
+        stats = self.read_report("summary.json")["llm"]
+        self.assertEqual((stats["items"], stats["evaluated"], stats["cached"]), (30, 30, 0))
+        self.assertEqual((stats["batches"], stats["flagged"]), (len(sent), 10))
+
+        verdicts = self.read_report("llm_verdicts.json")
+        self.assertEqual(len(verdicts), 30)
+        for n, card in enumerate(llm_cards(30)):
+            entry = verdicts[card["_id"]["$oid"]]
+            self.assertEqual(entry["index"], n)
+            self.assertEqual(entry["issues"], ["bad wording"] if n % 3 == 0 else [])
+
+        # A rerun answers everything from the sqlite cache
+        requests = len(stub.prompts)
+        code, _ = self.run_llm(stub)
+        self.assertEqual(code, 0)
+        self.assertEqual(len(stub.prompts), requests)
+        stats = self.read_report("summary.json")["llm"]
+        self.assertEqual((stats["cached"], stats["evaluated"], stats["batches"]), (30, 0, 0))
+        self.assertEqual(self.read_report("llm_verdicts.json"), verdicts)
+
+    def test_failed_call_is_retried(self):
+        stub = StubGenerate(fail=2)
+        self.addCleanup(stub.close)
+        code, _ = self.run_llm(stub, "--concurrency", "1", "--retries", "2", "--no-cache")
+        self.assertEqual(code, 0)
+        stats = self.read_report("summary.json")["llm"]
+        self.assertEqual((stats["evaluated"], stats["failed_batches"]), (30, 0))
+        self.assertEqual(len(stub.prompts), stats["batches"] + 2)
+        # The failed prompt was sent again unchanged
+        self.assertEqual(stub.prompts[0], stub.prompts[2])
+
+    def test_batch_fails_after_retries(self):
+        stub = StubGenerate(fail=100)
+        self.addCleanup(stub.close)
+        code, _ = self.run_llm(stub, "--retries", "1", "--no-cache")
+        self.assertEqual(code, 1)
+        stats = self.read_report("summary.json")["llm"]
+        self.assertEqual((stats["evaluated"], stats["unanswered"]), (0, 30))
+        self.assertEqual(len(stub.prompts), 2 * stats["batches"])
+        self.assertEqual(self.read_report("llm_verdicts.json"), {})
+
+
+def state_cards():
+    """Stamped cards (version and u) plus one without stamps, which is compared by content hash."""
+    cards = [
+        {"_id": {"$oid": f"64c{n:021d}"}, "version": 1, "u": 1000 + n, "question": f"Question {n}?", "options": ["a", "b"], "answer": 0}
+        for n in range(5)
+    ]
+    cards[2]["options"] = ["a", "a"]
+    cards.append({"id": "plain", "question": "Unstamped question?", "options": ["x"]})
+    cards.append("not an object")
+    return cards
+
+
+class ValidationStateTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "state.json.gz")
+
+    def run_state(self, cards, dedup="both"):
+        """(issues, state stats, cards actually checked) of an incremental run."""
+        state = ValidationState(self.path)
+        with mock.patch.object(evaluate_edubits, "check_item", wraps=evaluate_edubits.check_item) as check:
+            issues = list(validate_questions(cards, dedup=dedup, state=state))
+        state.save()
+        return issues, state.stats, [call.args[0] for call in check.call_args_list]
+
+    def test_unchanged_rerun_reuses_everything(self):
+        cards = state_cards() + [dict(state_cards()[0], _id={"$oid": "64c999999999999999999999"})]
+        first, stats, checked = self.run_state(cards)
+        self.assertEqual(stats["new"], len(cards))
+        self.assertEqual(checked, cards)
+        self.assertIn("Duplicate question text", [issue["issue"] for issue in first])
+
+        issues, stats, checked = self.run_state(cards)
+        self.assertEqual(issues, first)
+        self.assertEqual(checked, [])
+        self.assertEqual(stats, {"unchanged": len(cards), "changed": 0, "new": 0, "removed": 0})
+
+    def test_edited_cards_are_rechecked(self):
+        cards = state_cards()
+        self.run_state(cards)
+        cards[2] = dict(cards[2], options=["a", "b"], u=2000)
+        cards[5] = dict(cards[5], options=["x", "y"])
+        # A changed body with the same version and u is trusted to be unchanged
+        cards[1] = dict(cards[1], options=["a"])
+        issues, stats, checked = self.run_state(cards)
+        self.assertEqual(checked, [cards[2], cards[5]])
+        self.assertEqual((stats["changed"], stats["unchanged"]), (2, 5))
+        self.assertEqual([issue for issue in issues if issue["index"] in (2, 5)], [])
+        # Same report as a full run, with card 1 as it was when its result was stored
+        expected = cards[:1] + state_cards()[1:2] + cards[2:]
+        self.assertEqual(issues, list(validate_questions(expected, dedup="both")))
+
+    def test_deleted_card(self):
+        cards = state_cards()
+        self.run_state(cards)
+        del cards[2]
+        issues, stats, checked = self.run_state(cards)
+        # The non-object has no id, so it is keyed by index: "#6" is gone and "#5" is new
+        self.assertEqual(stats, {"unchanged": len(cards) - 1, "changed": 0, "new": 1, "removed": 2})
+        self.assertEqual(checked, ["not an object"])
+        self.assertNotIn("Duplicate options", [issue["issue"] for issue in issues])
+        stored = ValidationState(self.path).previous
+        self.assertNotIn(state_cards()[2]["_id"]["$oid"], [stored.card_id(row) for row in range(len(stored))])
+        _, stats, _ = self.run_state(cards)
+        self.assertEqual(stats["removed"], 0)
+        self.assertEqual(stats["unchanged"], len(cards))
+
+    def test_older_format_rechecks_everything(self):
+        cards = state_cards()
+        self.run_state(cards)
+        with evaluate_edubits._open_text(self.path) as f:
+            data = json.load(f)
+        data["format"] = STATE_FORMAT - 1
+        with evaluate_edubits._open_text(self.path, "w") as f:
+            json.dump(data, f)
+        _, stats, checked = self.run_state(cards)
+        self.assertEqual(stats["new"], len(cards))
+        self.assertEqual(len(checked), len(cards))
+
+    def test_corrupt_file_raises(self):
+        self.run_state(state_cards())
+        with open(self.path, "rb") as f:
+            payload = f.read()
+        for name, corrupt in (("truncated", payload[: len(payload) // 2]), ("not gzip", b"{")):
+            with self.subTest(name):
+                with open(self.path, "wb") as f:
+                    f.write(corrupt)
+                with self.assertRaises(StateError):
+                    ValidationState(self.path)
+                code, _ = run_main("--json_file", os.devnull, "--no-llm", "--state-file", self.path)
+                self.assertEqual(code, 1)
+
+        plain = self.path[: -len(".gz")]
+        with open(plain, "w", encoding="utf-8") as f:
+            f.write('{"format": 3, "ids": "ab')
+        with self.assertRaises(StateError):
+            ValidationState(plain)
+
+        with evaluate_edubits._open_text(self.path, "w") as f:
+            json.dump({"format": STATE_FORMAT, "ids": ""}, f)
+        with self.assertRaises(StateError):
+            ValidationState(self.path)
+
+
+def legacy_issues(item):
+    """The per-item checks as they were before the rule engine, for old-schema items."""
+    _, options, answer = extract_question_fields(item)
+    if options is None:
+        return [{"issue": "Missing options"}]
+    if not isinstance(options, list):
+        return [{"issue": "Options is not a list"}]
+    issues = []
+    cleaned = ["" if opt is None else str(opt).strip() for opt in options]
+    if len(cleaned) < 2:
+        issues.append({"issue": "Fewer than 2 options"})
+    empty_positions = [pos for pos, val in enumerate(cleaned) if not val]
+    if empty_positions:
+        issues.append({"issue": "Empty option values", "positions": empty_positions})
+    normalized = [val.casefold() for val in cleaned if val]
+    if len(set(normalized)) != len(normalized):
+        issues.append({"issue": "Duplicate options"})
+    if isinstance(answer, int) and (answer < 0 or answer >= len(cleaned)):
+        issues.append({"issue": "Correct answer index out of range"})
+    return issues
+
+
+OLD_SCHEMA_OPTIONS = [None, "a, b", {"a": 1}, [], ["a"], ["a", "b"], [" a ", "A"], ["a", "", "  "], [None, "b"], [1, 2, 1], ["x", "ẞ", "ss"]]
+OLD_SCHEMA_ANSWERS = [None, 0, 1, 2, -1, True, "1", 1.0]
+
+
+def issue_names(item, engine=None):
+    return [issue["issue"] for issue in check_item(item, engine=engine)[1]]
+
+
+class RuleEngineTest(unittest.TestCase):
+    def test_old_schema_unchanged(self):
+        for options in OLD_SCHEMA_OPTIONS:
+            for answer in OLD_SCHEMA_ANSWERS:
+                for item in (
+                    {"question": "Q?", "options": options, "answer": answer},
+                    {"question": {"text": "Q?", "options": options}, "answer": {"answer": answer}},
+                    {"contents": {"question": "Q?", "options": options}, "correctAnswer": answer},
+                ):
+                    if options is None:
+                        item.pop("options", None)
+                    with self.subTest(item=item):
+                        self.assertEqual(check_item(item)[1], legacy_issues(item))
+
+    def test_each_rule(self):
+        cases = {
+            "options_type": {"question": "Q", "options": "a|b"},
+            "option_count": {"question": "Q", "options": ["a"]},
+            "empty_options": {"question": "Q", "options": ["a", " ", "b"]},
+            "duplicate_options": {"question": "Q", "options": ["Paris", "paris "]},
+            "answer_index": {"question": "Q", "options": ["a", "b"], "answer": 2},
+            "missing_options": {"question": "Q"},
+            "blank_present": {"card_type": "FILL_BLANKS", "question": "Q", "options": ["a", "b"], "correct_answers": ["a"]},
+            "correct_answers_present": {"card_type": "FILL_BLANKS", "question": "Q {{BLANK}}", "options": ["a", "b"]},
+            "blank_count": {"card_type": "fill_blanks", "contents": {"question": "{{BLANK}} {{ blank }}", "options": ["a", "b"], "correct_answers": ["a"]}},
+            "answer_in_options": {"question": "Q", "options": ["a", "b"], "correct_answers": ["A", " c "]},
+        }
+        self.assertEqual(sorted(cases), sorted(r.name for r in RULES))
+        for name, item in cases.items():
+            only = RuleEngine(rules=[r for r in RULES if r.name == name])
+            with self.subTest(name):
+                self.assertEqual(len(check_item(item, engine=only)[1]), 1)
+                # No other rule fires on the fixture
+                self.assertEqual(len(check_item(item)[1]), 1)
+
+        self.assertEqual(check_item(cases["empty_options"])[1], [{"issue": "Empty option values", "positions": [1]}])
+        self.assertEqual(
+            check_item(cases["blank_count"])[1], [{"issue": "Blank count does not match answers", "blanks": 2, "answers": 1}]
+        )
+        self.assertEqual(check_item(cases["answer_in_options"])[1], [{"issue": "Correct answer not in options", "answers": ["c"]}])
+
+    def test_fill_blanks_clean(self):
+        for correct in (["a", "b"], [" a", "B "]):
+            item = {"card_type": "FILL_BLANKS", "contents": {"question": "{{BLANK}} and {{BLANK}}", "options": ["a", "b"], "correct_answers": correct}}
+            self.assertEqual(issue_names(item), [])
+        # A single correct answer may be stored as a scalar
+        item = {"card_type": "FILL_BLANKS", "question": "{{Blank}}", "options": ["1", "2"], "correct_answers": 2}
+        self.assertEqual(issue_names(item), [])
+        # Blank rules only apply to FILL_BLANKS cards
+        self.assertEqual(issue_names({"card_type": "MCQ", "question": "Q", "options": ["a", "b"]}), [])
+
+    def test_odd_shapes(self):
+        self.assertIsNone(check_item(["not", "a", "dict"]))
+        self.assertEqual(check_item({"options": ["a", "b"]})[0], None)
+        self.assertEqual(issue_names({"question": "   ", "options": ["a", "b"]}), [])
+        self.assertEqual(check_item({"question": "   "})[1], [{"issue": "Missing options"}])
+        self.assertIsNotNone(check_item({"question": 42, "options": ["a", "b"]})[0])
+        self.assertEqual(issue_names({"card_type": 7, "contents": "text", "question": "Q", "options": [1, 2]}), [])
+        self.assertEqual(issue_names({"card_type": None, "question": "Q", "options": ["1", "2"], "correct_answers": [2, None]}), ["Correct answer not in options"])
+        self.assertEqual(issue_names({"card_type": "FILL_BLANKS", "question": "{{BLANK}}", "correct_answers": []}), ["Missing options", "Missing correct answers"])
+        self.assertEqual(issue_names({"card_type": "FILL_BLANKS", "question": "", "options": ["a", "b"], "correct_answers": ["a"]}), [])
+
+    def test_card_fields_are_lazy(self):
+        card = Card({"card_type": "mcq", "question": " Q {{BLANK}} ", "options": [" A", "b "], "correct_answers": "A"})
+        self.assertEqual((card.card_type, card.text, card.options), ("MCQ", "Q {{BLANK}}", ("A", "b")))
+        self.assertEqual(card.shape, ("MCQ", None, True, False))
+        self.assertIs(card._correct, evaluate_edubits._UNSET)
+        self.assertIsNone(card._folded)
+        self.assertIsNone(card._blank_count)
+
+        # MCQ rules never count blanks
+        RuleEngine().run(card)
+        self.assertIsNone(card._blank_count)
+        self.assertEqual(card._folded_set, {"a", "b"})
+        self.assertEqual(card.correct_answers, ("A",))
+        self.assertEqual(card.blank_count, 1)
+        self.assertEqual(card.folded_options, ("a", "b"))
+
+        card = Card({"question": "Q"})
+        self.assertEqual((card.options, card.options_error, card.correct_answers), ((), "missing", None))
+        self.assertEqual(Card({"question": "Q", "options": "a"}).options_error, "not_list")
+
+    def test_compiled_per_shape(self):
+        engine = RuleEngine()
+        mcq = Card({"card_type": "MCQ", "question": "Q", "options": ["a", "b"], "answer": 0})
+        blanks = Card({"card_type": "FILL_BLANKS", "question": "{{BLANK}}", "options": ["a", "b"], "correct_answers": ["a"]})
+        names, _ = engine.compile(mcq.shape)
+        self.assertEqual(names, ("option_count", "empty_options", "duplicate_options", "answer_index"))
+        names, _ = engine.compile(blanks.shape)
+        self.assertEqual(
+            names, ("option_count", "empty_options", "duplicate_options", "blank_present", "blank_count", "answer_in_options")
+        )
+        other = Card({"card_type": "MCQ", "question": "R", "options": ["c", "d"], "answer": 1})
+        self.assertIs(engine.compile(other.shape), engine.compile(mcq.shape))
+
+    def test_registry_and_timing(self):
+        with self.assertRaises(ValueError):
+            rule("bad", needs=("no_such_need",))
+        calls = []
+        rules = list(RULES)
+        try:
+            rule("long_text", card_types=("MCQ",))(lambda card: calls.append(card.text) or ({"issue": "Long"} if len(card.text) > 3 else None))
+            added = RULES[-1]
+        finally:
+            RULES[:] = rules
+        engine = RuleEngine(rules=rules + [added], timed=True)
+        self.assertEqual(issue_names({"card_type": "MCQ", "question": "Long?", "options": ["a", "b"]}, engine), ["Long"])
+        self.assertEqual(issue_names({"card_type": "FILL", "question": "Long?", "options": ["a", "b"]}, engine), [])
+        self.assertEqual(calls, ["Long?"])
+        self.assertEqual(engine.timings["long_text"][0], 1)
+        self.assertEqual(engine.timings["option_count"][0], 2)
+
+
+def report_cards(count):
+    cards = []
+    for n in range(count):
+        card = {
+            "_id": {"$oid": f"64d{n:021d}"},
+            "card_type": "FILL_BLANKS" if n % 2 else "MCQ",
+            "contents": {"topic": f"topic {n % 3}", "question": f"Question {n} {{{{BLANK}}}}", "options": ["a", "a"]},
+        }
+        cards.append(card)
+    cards.append({"id": "no-text", "options": ["a", "b"]})
+    return cards
+
+
+class ReportWriterTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+
+    def write_report(self, cards, **options):
+        report = ReportWriter(self.dir, **options)
+        issues = []
+        for issue in validate_questions(report.track(iter(cards)), report=report):
+            # Metadata of items already recorded is released as the validator moves on
+            self.assertLessEqual(len(report._pending), 1)
+            report.write_issue(issue)
+            issues.append(issue)
+        report.finish(items=len(cards))
+        return report, issues
+
+    def read_lines(self, report):
+        lines = []
+        for name in report.shards:
+            opener = gzip.open if name.endswith(".gz") else open
+            with opener(os.path.join(self.dir, name), "rt", encoding="utf-8") as f:
+                lines += [json.loads(line) for line in f]
+        return lines
+
+    def read_summary(self):
+        with open(os.path.join(self.dir, "summary.json"), encoding="utf-8") as f:
+            return json.load(f)
+
+    def test_issues_and_summary(self):
+        cards = report_cards(6)
+        report, issues = self.write_report(cards)
+        self.assertEqual(report.shards, ["issues-00000.jsonl"])
+        lines = self.read_lines(report)
+        self.assertEqual([{k: v for k, v in line.items() if k not in ("id", "card_type", "topic")} for line in lines], issues)
+        for line in lines:
+            card = cards[line["index"]]
+            self.assertEqual(line["id"], evaluate_edubits._item_id(card))
+            self.assertEqual(line["card_type"], card.get("card_type", ""))
+            self.assertEqual(line["topic"], card.get("contents", {}).get("topic", ""))
+
+        summary = self.read_summary()
+        self.assertEqual(summary["items"], 7)
+        self.assertEqual(summary["issues"], len(issues))
+        self.assertEqual(summary["items_with_issues"], 7)
+        # Cards with text have duplicate options; FILL_BLANKS cards also lack correct answers
+        self.assertEqual(
+            summary["issues_by_type"], {"Duplicate options": 6, "Missing correct answers": 3, "Missing question text": 1}
+        )
+        self.assertEqual(summary["issues_by_card_type"], {"FILL_BLANKS": 6, "MCQ": 3, "": 1})
+        self.assertEqual(summary["issues_by_topic"], {"topic 0": 3, "topic 1": 3, "topic 2": 3, "": 1})
+        self.assertEqual(summary["items_by_card_type"], {"MCQ": 3, "FILL_BLANKS": 3, "": 1})
+        self.assertEqual(summary["issue_shards"], report.shards)
+
+    def test_gzip_shards(self):
+        cards = report_cards(200)
+        plain, issues = self.write_report(cards)
+        expected = self.read_lines(plain)
+
+        # Compressed bytes reach the file in blocks, so only a tiny shard size rotates on every flush
+        report, _ = self.write_report(cards, compress=True, shard_bytes=1, buffer_bytes=2000)
+        self.assertGreater(len(report.shards), 2)
+        self.assertTrue(all(name.endswith(".jsonl.gz") for name in report.shards))
+        self.assertEqual(report.shards, [f"issues-{n:05d}.jsonl.gz" for n in range(len(report.shards))])
+        self.assertEqual(self.read_lines(report), expected)
+        self.assertEqual(self.read_summary()["issue_shards"], report.shards)
+
+    def test_shard_rotation(self):
+        report, issues = self.write_report(report_cards(100), shard_bytes=2000, buffer_bytes=300)
+        self.assertGreater(len(report.shards), 2)
+        sizes = [os.path.getsize(os.path.join(self.dir, name)) for name in report.shards]
+        # A shard closes once a flush takes it past shard_bytes
+        self.assertTrue(all(2000 <= size < 2000 + 300 + 200 for size in sizes[:-1]))
+        self.assertEqual(len(self.read_lines(report)), len(issues))
+
+    def test_no_issues(self):
+        report, issues = self.write_report([{"question": "Q", "options": ["a", "b"]}])
+        self.assertEqual((issues, report.shards), ([], []))
+        self.assertEqual(self.read_summary()["issues"], 0)
+
+
+NEAR_PAIRS = [
+    (
+        "Which planet in our solar system is known as the red planet because of iron oxide on its surface?",
+        "Which planet in our solar system is known as the red planet because of iron oxide on it's surface?",
+    ),
+    (
+        "In 1492, which explorer sailed across the Atlantic Ocean and reached the Americas for Spain?",
+        "in 1492 which explorer sailed across the atlantic ocean and reached the americas for spain",
+    ),
+    ("The {{BLANK}} is the powerhouse of the cell.", "The {{ blank }} is the powerhouse of the cell!"),
+]
+DISTINCT_PAIRS = [
+    ("Question number 5: what is the capital of France?", "Question number 6: what is the capital of France?"),
+    ("What is 12 + 30 in base 10?", "What is 12 + 31 in base 10?"),
+    ("Which planet is known as the red planet?", "What is the boiling point of water at sea level?"),
+]
+
+
+def near_cards(count):
+    """Questions with near-duplicate, numbered and exact-copy variants mixed in."""
+    cards = []
+    for n in range(count):
+        base = f"Which scientist first described topic {n // 4} in a famous paper about physics and chemistry?"
+        text = [base, base.replace("famous", "famous,").upper(), base.replace(f"topic {n // 4}", f"topic {n // 4 + 1000}"), base][n % 4]
+        cards.append({"id": f"c{n}", "question": text, "options": ["a", "b"]})
+    return cards
+
+
+class NearDuplicateTest(unittest.TestCase):
+    def match(self, left, right, threshold=0.8):
+        index = NearDuplicateIndex(threshold=threshold)
+        self.assertIsNone(index.add(0, minhash_signature(left)))
+        return index.add(1, minhash_signature(right))
+
+    def test_near_pairs_match(self):
+        for left, right in NEAR_PAIRS:
+            with self.subTest(left=left):
+                representative, score = self.match(left, right)
+                self.assertEqual(representative, 0)
+                self.assertGreaterEqual(score, 0.8)
+        self.assertEqual(self.match(NEAR_PAIRS[0][0], NEAR_PAIRS[0][0]), (0, 1.0))
+
+    def test_distinct_pairs_do_not_match(self):
+        for left, right in DISTINCT_PAIRS:
+            with self.subTest(left=left):
+                self.assertIsNone(self.match(left, right))
+                # Even at a threshold every pair passes
+                self.assertIsNone(self.match(left, right, threshold=0.0))
+
+    def test_numbers_plus_other_edits_still_match(self):
+        left = "Which planet in our solar system is known as the red planet because of iron oxide on its 1 surface?"
+        right = "Which planet in our solar system is known as the red planet because of iron oxide on it's 2 surface?"
+        self.assertIsNotNone(self.match(left, right))
+
+    def test_numbered_template(self):
+        template = "Question number {}: which planet in our solar system is known as the red planet?"
+        index = NearDuplicateIndex()
+        for n in range(500):
+            self.assertIsNone(index.add(n, minhash_signature(template.format(n))))
+        # One group: only its first member sits in the buckets
+        self.assertEqual(sum(map(len, index.buckets.values())), index.bands)
+        self.assertEqual(index.add(500, minhash_signature(template.format(7))), (7, 1.0))
+        # A reworded copy is matched with the member that has its number
+        representative, _ = index.add(501, minhash_signature(template.format(42).replace("which", "what")))
+        self.assertEqual(representative, 42)
+
+    def test_clusters(self):
+        issues = list(validate_questions(near_cards(8), dedup="near"))
+        near = [(issue["index"], issue["duplicate_of"]) for issue in issues if issue["issue"] == "Near-duplicate question text"]
+        self.assertEqual(near, [(1, 0), (3, 0), (5, 4), (7, 4)])
+        self.assertEqual(min(issue["similarity"] for issue in issues), 1.0)
+
+    def test_workers_give_identical_output(self):
+        cards = near_cards(1200)
+        expected = list(validate_questions(cards, workers=1, dedup="both"))
+        self.assertTrue(any(issue["issue"] == "Near-duplicate question text" for issue in expected))
+        self.assertEqual(list(validate_questions(cards, workers=3, dedup="both")), expected)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            cards_file = os.path.join(tmp, "cards.json")
+            with open(cards_file, "w", encoding="utf-8") as f:
+                json.dump(cards, f)
+            outputs = []
+            for workers in ("1", "3"):
+                report_dir = os.path.join(tmp, workers)
+                code, out = run_main(
+                    "--json_file", cards_file, "--no-llm", "--dedup", "both", "--workers", workers, "--report-dir", report_dir
+                )
+                self.assertEqual(code, 0)
+                files = {}
+                for name in sorted(os.listdir(report_dir)):
+                    with open(os.path.join(report_dir, name), encoding="utf-8") as f:
+                        files[name] = f.read()
+                outputs.append((out.replace(report_dir, ""), files))
+            self.assertEqual(outputs[0], outputs[1])
+
+
+if __name__ == "__main__":
+    unittest.main()